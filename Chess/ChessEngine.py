@@ -4,8 +4,238 @@ also responsible for determining the legality of moves and updating the game sta
 '''
 import random
 
+'''
+Zobrist keys for hashing positions, seeded so that every process (and every run) agrees on them
+'''
+zobristRandom = random.Random(31082025)
+zobristPieceKeys = {piece: [[zobristRandom.getrandbits(64) for col in range(8)] for row in range(8)]
+    for piece in ("wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")}
+zobristCastleKeys = [zobristRandom.getrandbits(64) for i in range(16)]
+# Indexed by the 4 castling right bits
+zobristEnpassantKeys = [zobristRandom.getrandbits(64) for col in range(8)]
+# Indexed by the file of the en passant square
+zobristBlackToMove = zobristRandom.getrandbits(64)
+
+PROMOTION_FLAG = 1 << 12
+ENPASSANT_FLAG = 1 << 13
+CASTLE_FLAG = 1 << 14
+MOVE_ID_MASK = (1 << 12) - 1
+# Move.packed flags above the start and end squares, the squares alone identify a move
+
+WKS, BKS, WQS, BQS = 1, 2, 4, 8
+# Castling right bits, in the same order as CastleRights.index()
+castleMask = [WKS | BKS | WQS | BQS] * 64
+# Castling rights left after a move touches a square (king or rook leaving, rook being captured)
+castleMask[60] &= ~(WKS | WQS)
+castleMask[63] &= ~WKS
+castleMask[56] &= ~WQS
+castleMask[4] &= ~(BKS | BQS)
+castleMask[7] &= ~BKS
+castleMask[0] &= ~BQS
+enpassantSquares = [()] + [(sq >> 3, sq & 7) for sq in range(64)]
+# En passant square tuples by square + 1 (0 for none), so undo can restore one without building a tuple
+
+'''
+Evaluation tables, GameState keeps running totals of them for each side so the search can score a position
+without scanning the board
+'''
+# Rank the pieces by point value TODO adjust weights
+pieceScores = {"K": 0, "Q": 10, "R": 5, "B": 3, "N": 3, "P": 1}
+knightScores = [
+    [1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 2, 2, 2, 2, 2, 2, 1],
+    [1, 2, 3, 3, 3, 3, 2, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 2, 3, 3, 3, 3, 2, 1],
+    [1, 2, 2, 2, 2, 2, 2, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1]
+    ]
+
+bishopScores = [
+    [4, 3, 2, 1, 1, 2, 3, 4],
+    [3, 4, 3, 2, 2, 3, 4, 3],
+    [2, 3, 4, 3, 3, 4, 3, 2],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [2, 3, 4, 3, 3, 4, 3, 2],
+    [3, 4, 3, 2, 2, 3, 4, 3],
+    [4, 3, 2, 1, 1, 2, 3, 4]
+    ]
+
+queenScores = [
+    [1, 1, 1, 3, 1, 1, 1, 1],
+    [1, 2, 3, 3, 3, 1, 1, 1],
+    [1, 4, 3, 3, 3, 4, 2, 1],
+    [1, 2, 3, 3, 3, 2, 2, 1],
+    [1, 2, 3, 3, 3, 2, 2, 1],
+    [1, 4, 3, 3, 3, 4, 2, 1],
+    [1, 1, 2, 3, 3, 1, 1, 1],
+    [1, 1, 1, 3, 1, 1, 1, 1]
+    ]
+
+rookScores = [
+    [4, 3, 4, 4, 4, 4, 3, 4],
+    [4, 4, 4, 4, 4, 4, 4, 4],
+    [1, 1, 2, 3, 3, 2, 1, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 1, 2, 2, 2, 2, 2, 1],
+    [4, 4, 4, 4, 4, 4, 4, 4],
+    [4, 3, 4, 4, 4, 4, 3, 4]
+    ]
+
+whitePawnScores = [
+    [8, 8, 8, 8, 8, 8, 8, 8],
+    [8, 8, 8, 8, 8, 8, 8, 8],
+    [5, 6, 6, 7, 7, 6, 6, 5],
+    [2, 3, 3, 5, 5, 3, 3, 2],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [1, 1, 2, 3, 3, 2, 1, 1],
+    [1, 1, 1, 0, 0, 1, 1, 1],
+    [0, 0, 0, 0, 0, 0, 0, 0]
+]
+
+blackPawnScores = [
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [1, 1, 1, 0, 0, 1, 1, 1],
+    [1, 1, 2, 3, 3, 2, 1, 1],
+    [1, 2, 3, 4, 4, 3, 2, 1],
+    [2, 3, 3, 5, 5, 3, 3, 2],
+    [5, 6, 6, 7, 7, 6, 6, 5],
+    [8, 8, 8, 8, 8, 8, 8, 8],
+    [8, 8, 8, 8, 8, 8, 8, 8]
+]
+
+piecePositionScores = {"N": knightScores, "Q": queenScores, "B": bishopScores, "R": rookScores, "bP": blackPawnScores, "wP": whitePawnScores}
+
+pieceSquareScores = {color + piece: piecePositionScores[color + piece if piece == "P" else piece] if piece != "K" else [[0] * 8 for row in range(8)]
+    for color in "wb" for piece in "PNBRQK"}
+# Positional score of every piece on every square, kings aren't scored positionally
+
+'''
+Split a FEN string into an 8x8 board, whether white is to move, the castling right bits, the en passant square,
+the halfmove clock and the fullmove number. Missing fields after the board take their start position values
+'''
+def parseFen(fen):
+    fields = fen.split()
+    rows = fields[0].split("/")
+    if len(rows) != 8:
+        raise ValueError("FEN board needs 8 rows: " + fen)
+    board = []
+    for rowText in rows:
+        row = []
+        for char in rowText:
+            if char.isdigit():
+                row.extend(["--"] * int(char))
+            elif char.upper() in "PNBRQK":
+                row.append(("w" if char.isupper() else "b") + char.upper())
+            else:
+                raise ValueError("Unknown piece " + char + " in FEN: " + fen)
+        if len(row) != 8:
+            raise ValueError("FEN row " + rowText + " doesn't have 8 squares")
+        board.append(row)
+
+    whiteToMove = len(fields) < 2 or fields[1] == "w"
+    castling = fields[2] if len(fields) > 2 else "-"
+    castleRights = CastleRights("K" in castling, "k" in castling, "Q" in castling, "q" in castling).index()
+    enpassant = ()
+    if len(fields) > 3 and fields[3] != "-":
+        enpassant = (Move.ranksToRows[fields[3][1]], Move.filesToCols[fields[3][0]])
+    halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+    fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+    return board, whiteToMove, castleRights, enpassant, halfmoveClock, fullmoveNumber
+
+'''
+FEN string of the current position, for GameState and bitboardEngine.BitboardGameState alike
+'''
+def toFen(gs):
+    rows = []
+    for row in gs.board:
+        rowText = ""
+        empty = 0
+        for square in row:
+            if square == "--":
+                empty += 1
+                continue
+            if empty:
+                rowText += str(empty)
+                empty = 0
+            rowText += square[1] if square[0] == "w" else square[1].lower()
+        if empty:
+            rowText += str(empty)
+        rows.append(rowText)
+    castling = "".join(letter for bit, letter in ((WKS, "K"), (WQS, "Q"), (BKS, "k"), (BQS, "q")) if gs.castleRights & bit)
+    enpassant = "-"
+    if gs.enpassantPossible != ():
+        enpassant = Move.colsToFiles[gs.enpassantPossible[1]] + Move.rowsToRanks[gs.enpassantPossible[0]]
+    ply = gs.startPly + len(gs.moveLog)
+    return " ".join(["/".join(rows), "w" if gs.whiteToMove else "b", castling or "-", enpassant, str(gs.halfmoveClock), str(ply // 2 + 1)])
+
+'''
+Split an EPD line into a FEN and a dict of its operations. Quoted operands are kept as a string (id "WAC.001"),
+others as a list of tokens (bm Qg6 Qh5). The hmvc and fmvn operations become the FEN clocks
+'''
+def parseEpd(line):
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("EPD needs board, side to move, castling and en passant fields: " + line)
+    operations = {}
+    operation = ""
+    inQuotes = False
+    for char in (fields[4] if len(fields) > 4 else "") + ";":
+        if char == '"':
+            inQuotes = not inQuotes
+        if char == ";" and not inQuotes:
+            parts = operation.split(None, 1)
+            if parts:
+                operand = parts[1].strip() if len(parts) > 1 else ""
+                if operand.startswith('"') and operand.endswith('"'):
+                    operations[parts[0]] = operand[1:-1]
+                else:
+                    operations[parts[0]] = operand.split()
+            operation = ""
+        else:
+            operation += char
+    halfmoveClock = operations.get("hmvc", ["0"])[0]
+    fullmoveNumber = operations.get("fmvn", ["1"])[0]
+    return " ".join(fields[:4] + [halfmoveClock, fullmoveNumber]), operations
+
+'''
+Find the legal move written in standard algebraic notation (Nbd7, exd5, O-O, e8=Q, Qxh7+ ...).
+Raises ValueError when no legal move or more than one matches. The engine only promotes to a queen,
+so any promotion piece matches the queen promotion
+'''
+def sanToMove(gs, san, validMoves=None):
+    if validMoves is None:
+        validMoves = gs.get_valid_moves()
+    text = san.rstrip("+#!?").replace("0", "O")
+    if text in ("O-O", "O-O-O"):
+        candidates = [move for move in validMoves if move.isCastleMove and (move.endCol == 6) == (text == "O-O")]
+    else:
+        text = text.split("=")[0].replace("x", "").replace("-", "")
+        if len(text) > 2 and text[0] in Move.filesToCols and text[-1] in "QRBN":
+            # Promotion written without the =, like e8Q
+            text = text[:-1]
+        piece = "P"
+        if text[:1] in ("N", "B", "R", "Q", "K"):
+            piece = text[0]
+            text = text[1:]
+        target = text[-2:]
+        if len(target) != 2 or target[0] not in Move.filesToCols or target[1] not in Move.ranksToRows:
+            raise ValueError("Can't read the target square of " + san)
+        endRow = Move.ranksToRows[target[1]]
+        endCol = Move.filesToCols[target[0]]
+        disambiguation = text[:-2]
+        candidates = [move for move in validMoves if move.pieceMoved[1] == piece and move.endRow == endRow and move.endCol == endCol and
+            all(move.startCol == Move.filesToCols[char] if char in Move.filesToCols else move.startRow == Move.ranksToRows.get(char)
+                for char in disambiguation)]
+    if len(candidates) != 1:
+        raise ValueError(san + (" is ambiguous" if candidates else " is not a legal move") + " in " + toFen(gs))
+    return candidates[0]
+
 class GameState():
-    def __init__(self):
+    def __init__(self, fen=None):
         # Board representation is 8x8, char1 = color, char2 = piece type
         self.board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
@@ -29,64 +259,146 @@ class GameState():
         self.checks = []
         self.checkMate = False
         self.staleMate = False
+        self.repetitionDraw = False
+        self.fiftyMoveDraw = False
         self.enpassantPossible = ()
         # Coordinates for the square where en passant capture is possible
-        self.currentCastlingRight = CastleRights(True, True, True, True)
-        self.castleRightsLog = [CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks, 
-        self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)]
+        self.castleRights = WKS | BKS | WQS | BQS
+        # Castling right bits
+        self.halfmoveClock = 0
+        # Plies since the last capture or pawn move
+        self.startPly = 0
+        # Plies played before this position was set up, for the FEN fullmove number
+        if fen is not None:
+            # Set up a position other than the start position
+            self.board, self.whiteToMove, self.castleRights, self.enpassantPossible, self.halfmoveClock, fullmoveNumber = parseFen(fen)
+            self.startPly = 2 * (fullmoveNumber - 1) + (0 if self.whiteToMove else 1)
+            for row in range(8):
+                for col in range(8):
+                    if self.board[row][col] == "wK":
+                        self.whiteKingLocation = (row, col)
+                    elif self.board[row][col] == "bK":
+                        self.blackKingLocation = (row, col)
+        self.zobristKey = self.computeZobristKey()
+        # Hash of the current position, updated incrementally in make_move
+        self.zobristLog = []
+        # Hash of the position before each move in the move log
+        self.stateLog = []
+        # State before each move in the move log packed into an int: castling bits, en passant square + 1 (0 for none) << 4
+        # and the halfmove clock << 11. The captured piece is kept on the Move
+        self.nullMoveLog = []
+        # En passant square and halfmove clock before each null move still on the board
+        self.material, self.positionScore = self.computeEvaluation()
+        # Running material and piece square totals indexed by color (0 white, 1 black), updated in make_move and undo_move
+        self.pieceCount = sum(piece != "--" for row in self.board for piece in row)
+        # Pieces of both sides on the board, kings and pawns included, updated in make_move and undo_move
+
+    '''
+    Castling rights as a CastleRights object, built from the castling bits each time it is read
+    '''
+    @property
+    def currentCastlingRight(self):
+        rights = self.castleRights
+        return CastleRights(bool(rights & WKS), bool(rights & BKS), bool(rights & WQS), bool(rights & BQS))
 
     '''
     Takes a Move as a parameter and executes it 
     (will not work for castling, pawn promotion, and en-passant)
     '''
     def make_move(self, move):
+        packed = move.packed
+        startRow = packed >> 3 & 7
+        startCol = packed & 7
+        endRow = packed >> 9 & 7
+        endCol = packed >> 6 & 7
+        self.zobristLog.append(self.zobristKey)
+        enpassant = self.enpassantPossible
+        self.stateLog.append(self.castleRights | (enpassant[0] * 8 + enpassant[1] + 1 if enpassant != () else 0) << 4 |
+            self.halfmoveClock << 11)
+        key = self.zobristKey ^ zobristPieceKeys[move.pieceMoved][startRow][startCol]
+        if enpassant != ():
+            key ^= zobristEnpassantKeys[enpassant[1]]
+
+        side = 0 if move.pieceMoved[0] == 'w' else 1
         # Check for en passant before updating the board
-        if move.pieceMoved[1] == "P" and move.startCol != move.endCol:
-            if self.board[move.endRow][move.endCol] == '--':
+        if move.pieceMoved[1] == "P" and startCol != endCol:
+            if self.board[endRow][endCol] == '--':
                 # Remove the pawn being captured (it's on the previous row, same col as end)
-                if move.pieceMoved[0] == 'w':
-                    self.board[move.endRow + 1][move.endCol] = '--'
-                else:
-                    self.board[move.endRow - 1][move.endCol] = '--'
+                capturedRow = endRow + 1 if side == 0 else endRow - 1
+                capturedPawn = self.board[capturedRow][endCol]
+                self.board[capturedRow][endCol] = '--'
+                key ^= zobristPieceKeys[capturedPawn][capturedRow][endCol]
+                self.material[1 - side] -= pieceScores["P"]
+                self.positionScore[1 - side] -= pieceSquareScores[capturedPawn][capturedRow][endCol]
+                self.pieceCount -= 1
 
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        captured = self.board[endRow][endCol]
+        if captured != '--':
+            key ^= zobristPieceKeys[captured][endRow][endCol]
+            self.material[1 - side] -= pieceScores[captured[1]]
+            self.positionScore[1 - side] -= pieceSquareScores[captured][endRow][endCol]
+            self.pieceCount -= 1
+        if captured != '--' or move.pieceMoved[1] == "P":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        self.board[startRow][startCol] = "--"
+        self.board[endRow][endCol] = move.pieceMoved
         self.moveLog.append(move)
         self.whiteToMove = not self.whiteToMove
         # Updating the king's location
 
         if move.pieceMoved == "wK":
-            self.whiteKingLocation = (move.endRow, move.endCol)
+            self.whiteKingLocation = (endRow, endCol)
 
         elif move.pieceMoved == "bK":
-            self.blackKingLocation = (move.endRow, move.endCol)
+            self.blackKingLocation = (endRow, endCol)
         
         # Pawn promotion
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + 'Q'
+        if packed & PROMOTION_FLAG:
+            self.board[endRow][endCol] = move.pieceMoved[0] + 'Q'
             # Grab the color of the pawn and then make it a queen
+            self.material[side] += pieceScores["Q"] - pieceScores["P"]
+        self.positionScore[side] += (pieceSquareScores[self.board[endRow][endCol]][endRow][endCol] -
+            pieceSquareScores[move.pieceMoved][startRow][startCol])
 
-        if move.pieceMoved[1] == "P" and abs(move.startRow - move.endRow) == 2:
+        if move.pieceMoved[1] == "P" and abs(startRow - endRow) == 2:
             # Only on two square pawn advances
-            self.enpassantPossible = ((move.endRow + move.startRow) // 2, move.endCol)
+            self.enpassantPossible = ((endRow + startRow) // 2, endCol)
         else:
             self.enpassantPossible = ()
         
         # Castle move
-        if (move.pieceMoved[1] == "K" and abs(move.endCol - move.startCol) > 1):
-            if move.endCol - move.startCol == 2: # Kingside castle move
+        if (move.pieceMoved[1] == "K" and abs(endCol - startCol) > 1):
+            if endCol - startCol == 2: # Kingside castle move
         
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][7]
-                self.board[move.endRow][7] = '--'
+                self.board[endRow][endCol - 1] = self.board[endRow][7]
+                self.board[endRow][7] = '--'
+                rookStartCol, rookEndCol = 7, endCol - 1
             
             else: # Queenside castle move
-                self.board[move.endRow][move.endCol+1] = self.board[move.endRow][0]
-                self.board[move.endRow][0] = '--'
+                self.board[endRow][endCol+1] = self.board[endRow][0]
+                self.board[endRow][0] = '--'
+                rookStartCol, rookEndCol = 0, endCol + 1
+            rookScores = pieceSquareScores[move.pieceMoved[0] + "R"][endRow]
+            self.positionScore[side] += rookScores[rookEndCol] - rookScores[rookStartCol]
         
-        # Update castling rights - whenever it is a rook or king move
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks, 
-        self.currentCastlingRight.wqs, self.currentCastlingRight.bqs))
+        # Update castling rights - whenever a king or rook leaves its square or a rook is captured
+        oldCastleRights = self.castleRights
+        self.castleRights &= castleMask[packed & 63] & castleMask[packed >> 6 & 63]
+
+        # Hash in the piece on its end square, the castling rook, new rights, en passant square and side to move
+        key ^= zobristPieceKeys[self.board[endRow][endCol]][endRow][endCol]
+        if (move.pieceMoved[1] == "K" and abs(endCol - startCol) > 1):
+            rook = move.pieceMoved[0] + "R"
+            if endCol - startCol == 2:
+                key ^= zobristPieceKeys[rook][endRow][7] ^ zobristPieceKeys[rook][endRow][endCol - 1]
+            else:
+                key ^= zobristPieceKeys[rook][endRow][0] ^ zobristPieceKeys[rook][endRow][endCol + 1]
+        key ^= zobristCastleKeys[oldCastleRights] ^ zobristCastleKeys[self.castleRights]
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        self.zobristKey = key ^ zobristBlackToMove
 
     '''
     Undo the previous move
@@ -95,92 +407,136 @@ class GameState():
         if len(self.moveLog) != 0:
             # Make sure there exists a move to undo
             move = self.moveLog.pop()
+            packed = move.packed
+            startRow = packed >> 3 & 7
+            startCol = packed & 7
+            endRow = packed >> 9 & 7
+            endCol = packed >> 6 & 7
 
             is_enpassant = (move.pieceMoved[1] == "P" and 
-                       move.startCol != move.endCol and 
-                       move.pieceCaptured == '--')
+                       startCol != endCol and 
+                       (move.pieceCaptured == '--' or packed & ENPASSANT_FLAG))
+
+            side = 0 if move.pieceMoved[0] == 'w' else 1
+            self.positionScore[side] -= (pieceSquareScores[self.board[endRow][endCol]][endRow][endCol] -
+                pieceSquareScores[move.pieceMoved][startRow][startCol])
+            if packed & PROMOTION_FLAG:
+                self.material[side] -= pieceScores["Q"] - pieceScores["P"]
+            if move.pieceCaptured != '--' and not is_enpassant:
+                self.material[1 - side] += pieceScores[move.pieceCaptured[1]]
+                self.positionScore[1 - side] += pieceSquareScores[move.pieceCaptured][endRow][endCol]
+                self.pieceCount += 1
 
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            self.board[startRow][startCol] = move.pieceMoved
+            self.board[endRow][endCol] = move.pieceCaptured
             self.whiteToMove = not self.whiteToMove
             # Switch turns back
 
             if move.pieceMoved == "wK":
-                self.whiteKingLocation = (move.startRow, move.startCol)
+                self.whiteKingLocation = (startRow, startCol)
             elif move.pieceMoved == "bK":
-                self.blackKingLocation = (move.startRow, move.startCol)
+                self.blackKingLocation = (startRow, startCol)
 
             if is_enpassant:
                 # Undo en passant move
-                self.board[move.endRow][move.endCol] = '--'
+                self.board[endRow][endCol] = '--'
                 if move.pieceMoved[0] == 'w':
-                    self.board[move.endRow + 1][move.endCol] = 'bP'
+                    self.board[endRow + 1][endCol] = 'bP'
+                    self.positionScore[1] += pieceSquareScores['bP'][endRow + 1][endCol]
 
                 else:
-                    self.board[move.endRow - 1][move.endCol] = 'wP'
+                    self.board[endRow - 1][endCol] = 'wP'
+                    self.positionScore[0] += pieceSquareScores['wP'][endRow - 1][endCol]
+                self.material[1 - side] += pieceScores["P"]
+                self.pieceCount += 1
 
-                self.enpassantPossible = (move.endRow, move.endCol)
-        
-            
-            if move.pieceMoved[1] == "P" and abs(move.startRow - move.endRow) == 2:
-                # Undo 2-square pawn advance
-                self.enpassantPossible = ()
-
-            # Undo castling rights
-            self.castleRightsLog.pop()
-            self.currentCastlingRight = self.castleRightsLog[-1]
+            # Restore castling rights, en passant square and halfmove clock
+            state = self.stateLog.pop()
+            self.castleRights = state & 15
+            self.enpassantPossible = enpassantSquares[state >> 4 & 127]
+            self.halfmoveClock = state >> 11
+            self.zobristKey = self.zobristLog.pop()
 
             # Undo the castle move
-            if (move.pieceMoved[1] == "K" and abs(move.endCol - move.startCol) > 1):
-                if move.endCol - move.startCol == 2:
-                    self.board[move.endRow][7] = self.board[move.endRow][move.endCol - 1]
-                    self.board[move.endRow][move.endCol - 1] = '--'
+            if (move.pieceMoved[1] == "K" and abs(endCol - startCol) > 1):
+                if endCol - startCol == 2:
+                    self.board[endRow][7] = self.board[endRow][endCol - 1]
+                    self.board[endRow][endCol - 1] = '--'
+                    rookStartCol, rookEndCol = 7, endCol - 1
                 else:
-                    self.board[move.endRow][0] = self.board[move.endRow][move.endCol+1]
-                    self.board[move.endRow][move.endCol+1] = '--'
+                    self.board[endRow][0] = self.board[endRow][endCol+1]
+                    self.board[endRow][endCol+1] = '--'
+                    rookStartCol, rookEndCol = 0, endCol + 1
+                rookScores = pieceSquareScores[move.pieceMoved[0] + "R"][endRow]
+                self.positionScore[side] -= rookScores[rookEndCol] - rookScores[rookStartCol]
 
         self.checkMate = False
         self.staleMate = False
+        self.repetitionDraw = False
+        self.fiftyMoveDraw = False
 
     '''
-    Updating if castling is possible given the inputted move
+    Pass the turn without moving, for null move pruning in the search. Only undo_null_move can take it back,
+    and it has to before any undo_move
     '''
-    def updateCastleRights(self, move):
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRight.wks = False
-            self.currentCastlingRight.wqs = False
+    def make_null_move(self):
+        self.zobristLog.append(self.zobristKey)
+        self.nullMoveLog.append((self.enpassantPossible, self.halfmoveClock))
+        key = self.zobristKey ^ zobristBlackToMove
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        self.zobristKey = key
+        self.enpassantPossible = ()
+        self.halfmoveClock = 0
+        # Nothing before a null move counts as a repetition
+        self.whiteToMove = not self.whiteToMove
 
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRight.bks = False
-            self.currentCastlingRight.bqs = False
+    def undo_null_move(self):
+        self.enpassantPossible, self.halfmoveClock = self.nullMoveLog.pop()
+        self.zobristKey = self.zobristLog.pop()
+        self.whiteToMove = not self.whiteToMove
+
+    '''
+    Whether the side to move has a knight, bishop, rook or queen. With only king and pawns left zugzwang is common,
+    so the search doesn't try null moves
+    '''
+    def hasNonPawnMaterial(self):
+        color = "w" if self.whiteToMove else "b"
+        return any(piece[0] == color and piece[1] in "NBRQ" for row in self.board for piece in row)
 
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7:
-                if move.startCol == 0: # Left rook
-                    self.currentCastlingRight.wqs = False
-                elif move.startCol == 7: # Right rook
-                    self.currentCastlingRight.wks = False
+    '''
+    Material and piece square totals for each side counted from scratch, [white, black] each
+    (make_move and undo_move keep self.material and self.positionScore up to date, this is for initialization and debugging)
+    '''
+    def computeEvaluation(self):
+        material = [0, 0]
+        positionScore = [0, 0]
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    side = 0 if piece[0] == "w" else 1
+                    material[side] += pieceScores[piece[1]]
+                    positionScore[side] += pieceSquareScores[piece][row][col]
+        return material, positionScore
 
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0:
-                if move.startCol == 0: # Left rook
-                    self.currentCastlingRight.bqs = False
-                elif move.startCol == 7: # Right rook
-                    self.currentCastlingRight.bks = False
-        
-        if move.pieceCaptured == 'wR':
-            if move.endRow == 7:
-                if move.endCol == 0:  # Left rook captured
-                    self.currentCastlingRight.wqs = False
-                elif move.endCol == 7:  # Right rook captured
-                    self.currentCastlingRight.wks = False
-    
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0:
-                if move.endCol == 0:  # Left rook captured
-                    self.currentCastlingRight.bqs = False
-                elif move.endCol == 7:  # Right rook captured
-                    self.currentCastlingRight.bks = False
+    '''
+    Compute the Zobrist hash of the current position from scratch
+    (make_move keeps self.zobristKey up to date incrementally, this is for initialization and debugging)
+    '''
+    def computeZobristKey(self):
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    key ^= zobristPieceKeys[piece][row][col]
+        key ^= zobristCastleKeys[self.castleRights]
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        if not self.whiteToMove:
+            key ^= zobristBlackToMove
+        return key
 
     '''
     Getting all of the valid moves considering checks
@@ -188,8 +544,6 @@ class GameState():
     def get_valid_moves(self):
         moves = []
         self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
-        tempCastleRights = CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks, self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)
-        # Copy the current castling rights
         if self.whiteToMove:
             kingRow = self.whiteKingLocation[0]
             kingCol = self.whiteKingLocation[1]
@@ -209,26 +563,22 @@ class GameState():
                 checkCol = check[1]
                 pieceChecking = self.board[checkRow][checkCol]
                 # Location of the enemy piece causing the check
-                validSquares = []
+                validSquares = set()
                 # Valid squares that pieces can move to
                 if pieceChecking[1] == "N":
                     # If attacking is a knight, the player must capture the knight or move king
-                    validSquares = [(checkRow, checkCol)]
+                    validSquares.add((checkRow, checkCol))
                 else:
                     for i in range(1, 8):
                         validSquare = (kingRow + check[2] * i, kingCol + check[3] * i)
                         # Where check[2] and check[3] are the check directions
-                        validSquares.append(validSquare)
+                        validSquares.add(validSquare)
 
                         if validSquare[0] == checkRow and validSquare[1] == checkCol:
                             break
-                for i in range(len(moves) -1, -1, -1):
-                    # Getting rid of moves that don't block check or move king
-                    if moves[i].pieceMoved[1] != "K":
-                        # Move doesn't move king so it must block or capture
-                        if not (moves[i].endRow, moves[i].endCol) in validSquares:
-                            # Move doesn't block check or capture piece
-                            moves.remove(moves[i])
+                moves = [move for move in moves if move.pieceMoved[1] == "K" or move.isEnpassantMove or (move.endRow, move.endCol) in validSquares]
+                # Getting rid of moves that don't block check or move king, in one pass instead of removing them one by one.
+                # En passant was already checked on the board
             else:
                 # 2X check, king has to move
                 self.getKingMoves(kingRow, kingCol, moves)
@@ -245,10 +595,35 @@ class GameState():
         else:
             self.checkMate = False
             self.staleMate = False
-        
-        self.currentCastlingRight = tempCastleRights
+        self.fiftyMoveDraw = self.halfmoveClock >= 100 and not self.checkMate
+        # A mate on the hundredth ply still counts
+        self.repetitionDraw = self.repetitionCount() >= 2
+
         return moves
     
+    '''
+    Legal captures and promotions only, for the quiescence search. Quiet moves are never built.
+    When in check every legal move is returned instead, since all evasions have to be looked at
+    '''
+    def get_capture_moves(self):
+        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
+        if self.in_check:
+            return self.get_valid_moves()
+        return self.get_all_possible_moves(capturesOnly=True)
+
+    '''
+    How many times the current position was on the board before. Only the last halfmoveClock plies are looked at,
+    nothing before a capture or pawn move can come back, and only every other one has the same side to move
+    '''
+    def repetitionCount(self):
+        key = self.zobristKey
+        log = self.zobristLog
+        count = 0
+        for i in range(len(log) - 2, max(len(log) - self.halfmoveClock, 0) - 1, -2):
+            if log[i] == key:
+                count += 1
+        return count
+
     '''
     Determine if the current player is in check
     '''
@@ -260,22 +635,62 @@ class GameState():
             return self.squareUnderAttack(self.blackKingLocation[0], self.blackKingLocation[1])
 
     '''
-    Determine if there is a square under attack
+    Determine if there is a square under attack by the opponent of the side to move
     '''
     def squareUnderAttack(self, row, col):
-        self.whiteToMove = not self.whiteToMove
-        oppMoves = self.get_all_possible_moves(includeCastling=False)
-        self.whiteToMove = not self.whiteToMove
-    
-        for move in oppMoves:
-            if move.endRow == row and move.endCol == col:
+        return self.isSquareAttacked(row, col, "b" if self.whiteToMove else "w")
+
+    '''
+    Whether enemyColor attacks the square at row, col. Looks outward from the square for pawns, knights and the king
+    on their offsets and for sliders along the 8 lines, without generating any moves.
+    The defending king is looked through, so this also tells whether that king would be safe on the square
+    '''
+    def isSquareAttacked(self, row, col, enemyColor):
+        board = self.board
+        pawnRow = row + 1 if enemyColor == "w" else row - 1
+        # Enemy pawns attack towards the defending side
+        if 0 <= pawnRow < 8:
+            enemyPawn = enemyColor + "P"
+            if (col > 0 and board[pawnRow][col - 1] == enemyPawn) or (col < 7 and board[pawnRow][col + 1] == enemyPawn):
+                return True
+
+        enemyKnight = enemyColor + "N"
+        for dRow, dCol in ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)):
+            endRow = row + dRow
+            endCol = col + dCol
+            if 0 <= endRow < 8 and 0 <= endCol < 8 and board[endRow][endCol] == enemyKnight:
                 return True
+
+        enemyKing = enemyColor + "K"
+        for dRow, dCol in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+            endRow = row + dRow
+            endCol = col + dCol
+            if 0 <= endRow < 8 and 0 <= endCol < 8 and board[endRow][endCol] == enemyKing:
+                return True
+
+        for dRow, dCol in ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)):
+            sliders = "RQ" if dRow == 0 or dCol == 0 else "BQ"
+            # Rooks and queens along rows and columns, bishops and queens along diagonals
+            endRow = row + dRow
+            endCol = col + dCol
+            while 0 <= endRow < 8 and 0 <= endCol < 8:
+                piece = board[endRow][endCol]
+                if piece != "--":
+                    if piece[0] == enemyColor:
+                        if piece[1] in sliders:
+                            return True
+                        break
+                    elif piece[1] != "K":
+                        break
+                    # Only the defending king is looked through
+                endRow += dRow
+                endCol += dCol
         return False
 
     '''
     All moves without considering checks
     '''
-    def get_all_possible_moves(self, includeCastling=True):
+    def get_all_possible_moves(self, includeCastling=True, capturesOnly=False):
         moves = []
         for row in range(len(self.board)):
             for col in range(len(self.board[row])):
@@ -283,9 +698,9 @@ class GameState():
                 if (turn == "w" and self.whiteToMove) or (turn == "b" and not self.whiteToMove):
                     piece = self.board[row][col][1]
                     if piece == "K":
-                        self.getKingMoves(row, col, moves, includeCastling=includeCastling)
+                        self.getKingMoves(row, col, moves, includeCastling=includeCastling, capturesOnly=capturesOnly)
                     else:
-                        self.moveFunctions[piece](row, col, moves)
+                        self.moveFunctions[piece](row, col, moves, capturesOnly)
                     
         return moves
     
@@ -294,7 +709,7 @@ class GameState():
     of valid moves
     '''
 
-    def getPawnMoves(self, row, col, moves):
+    def getPawnMoves(self, row, col, moves, capturesOnly=False):
         piecePinned = False
         pinDirection = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -303,68 +718,88 @@ class GameState():
                 pinDirection = (self.pins[i][2], self.pins[i][3])
                 self.pins.remove(self.pins[i])
                 break
+        startSq = row * 8 + col
+        pawn = self.board[row][col]
+        promotion = PROMOTION_FLAG if row == (1 if self.whiteToMove else 6) else 0
+        # Pawns one step from the last row promote whichever way they move
 
         if self.whiteToMove:
-            # Single move forward
-            if self.board[row - 1][col] == "--":
+            # Single move forward (only promotions when generating captures)
+            if self.board[row - 1][col] == "--" and (not capturesOnly or row - 1 == 0):
                 if not piecePinned or pinDirection == (-1, 0):
-                    moves.append(Move((row, col), (row - 1, col), self.board))
+                    moves.append(Move(startSq | (startSq - 8) << 6 | promotion, pawn, "--"))
                     if row == 6 and self.board[row - 2][col] == "--":
-                        moves.append(Move((row, col), (row - 2, col), self.board))
+                        moves.append(Move(startSq | (startSq - 16) << 6, pawn, "--"))
             
             # Captures to the left
             if col - 1 >= 0:
                 if self.board[row - 1][col - 1][0] == "b":
                     if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((row, col), (row - 1, col - 1), self.board))
+                        moves.append(Move(startSq | (startSq - 9) << 6 | promotion, pawn, self.board[row - 1][col - 1]))
                 # En passant to the left
                 if (row - 1, col - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((row, col), (row - 1, col - 1), self.board, isEnpassantMove=True))
+                    if (not piecePinned or pinDirection == (-1, -1)) and self.isLegalEnpassant(row, col, row - 1, col - 1):
+                        moves.append(Move(startSq | (startSq - 9) << 6 | ENPASSANT_FLAG, pawn, "bP"))
 
             # Captures to the right
             if col + 1 <= 7:
                 if self.board[row - 1][col + 1][0] == "b":
                     if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((row, col), (row - 1, col + 1), self.board))
+                        moves.append(Move(startSq | (startSq - 7) << 6 | promotion, pawn, self.board[row - 1][col + 1]))
                 # En passant to the right
                 if (row - 1, col + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((row, col), (row - 1, col + 1), self.board, isEnpassantMove=True))
+                    if (not piecePinned or pinDirection == (-1, 1)) and self.isLegalEnpassant(row, col, row - 1, col + 1):
+                        moves.append(Move(startSq | (startSq - 7) << 6 | ENPASSANT_FLAG, pawn, "bP"))
 
         else:  # Black to move
-            # Single move forward
-            if self.board[row + 1][col] == "--":
+            # Single move forward (only promotions when generating captures)
+            if self.board[row + 1][col] == "--" and (not capturesOnly or row + 1 == 7):
                 if not piecePinned or pinDirection == (1, 0):
-                    moves.append(Move((row, col), (row + 1, col), self.board))
+                    moves.append(Move(startSq | (startSq + 8) << 6 | promotion, pawn, "--"))
                     if row == 1 and self.board[row + 2][col] == "--":
-                        moves.append(Move((row, col), (row + 2, col), self.board))
+                        moves.append(Move(startSq | (startSq + 16) << 6, pawn, "--"))
 
             # Captures to the left
             if col - 1 >= 0:
                 if self.board[row + 1][col - 1][0] == "w":
                     if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((row, col), (row + 1, col - 1), self.board))
+                        moves.append(Move(startSq | (startSq + 7) << 6 | promotion, pawn, self.board[row + 1][col - 1]))
                 # En passant to the left
                 if (row + 1, col - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((row, col), (row + 1, col - 1), self.board, isEnpassantMove=True))
+                    if (not piecePinned or pinDirection == (1, -1)) and self.isLegalEnpassant(row, col, row + 1, col - 1):
+                        moves.append(Move(startSq | (startSq + 7) << 6 | ENPASSANT_FLAG, pawn, "wP"))
 
             # Captures to the right
             if col + 1 <= 7:
                 if self.board[row + 1][col + 1][0] == "w":
                     if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((row, col), (row + 1, col + 1), self.board))
+                        moves.append(Move(startSq | (startSq + 9) << 6 | promotion, pawn, self.board[row + 1][col + 1]))
                 # En passant to the right
                 if (row + 1, col + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((row, col), (row + 1, col + 1), self.board, isEnpassantMove=True))
+                    if (not piecePinned or pinDirection == (1, 1)) and self.isLegalEnpassant(row, col, row + 1, col + 1):
+                        moves.append(Move(startSq | (startSq + 9) << 6 | ENPASSANT_FLAG, pawn, "wP"))
+
+    '''
+    En passant removes two pawns from the same row, which can expose the king along that row
+    (or capture the pawn giving check), so play it on the board and look for checks
+    '''
+    def isLegalEnpassant(self, row, col, endRow, endCol):
+        pawn = self.board[row][col]
+        captured = self.board[row][endCol]
+        self.board[row][col] = "--"
+        self.board[row][endCol] = "--"
+        self.board[endRow][endCol] = pawn
+        inCheck = self.checkForPinsAndChecks()[0]
+        self.board[row][col] = pawn
+        self.board[row][endCol] = captured
+        self.board[endRow][endCol] = "--"
+        return not inCheck
 
     '''
     Get all of the rook moves for a rook at row, col, and add the moves to the list
     of valid moves
     '''
-    def getRookMoves(self, row, col, moves):
+    def getRookMoves(self, row, col, moves, capturesOnly=False):
         piecePinned = False
         pinDirection = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -377,6 +812,8 @@ class GameState():
                     break
         directions = ((-1, 0), (0, -1), (1, 0), (0, 1))
         enemyColor = "b" if self.whiteToMove else "w"
+        startSq = row * 8 + col
+        piece = self.board[row][col]
 
         for dir in directions:
             for i in range(1, 8):
@@ -389,10 +826,11 @@ class GameState():
                         endPiece = self.board[endRow][endCol]
                         if endPiece == "--":
                             # Valid empty space
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
+                            if not capturesOnly:
+                                moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
                         elif endPiece[0] == enemyColor:
                             # Valid enemy piece
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
+                            moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
                             break
                         else:
                             # Invalid friendly piece
@@ -401,7 +839,7 @@ class GameState():
                     # Off the board
                     break
 
-    def getBishopMoves(self, row, col, moves):
+    def getBishopMoves(self, row, col, moves, capturesOnly=False):
         piecePinned = False
         pinDirection = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -413,6 +851,8 @@ class GameState():
         
         directions = ((-1, -1), (-1, 1), (1, -1), (1, 1))
         enemyColor = "b" if self.whiteToMove else "w"
+        startSq = row * 8 + col
+        piece = self.board[row][col]
 
         for dir in directions:
             for i in range(1, 8):
@@ -425,11 +865,12 @@ class GameState():
 
                         if endPiece == "--":
                             # Valid empty space
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
+                            if not capturesOnly:
+                                moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
 
                         elif endPiece[0] == enemyColor:
                             # Valid enemy piece
-                            moves.append(Move((row, col), (endRow, endCol), self.board))
+                            moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
                             break
                         else:
                             # Friendly piece invalid
@@ -438,7 +879,7 @@ class GameState():
                     # Off the board
                     break
 
-    def getKnightMoves(self, row, col, moves):
+    def getKnightMoves(self, row, col, moves, capturesOnly=False):
         # Note that the pin direction does not matter for a knight
         piecePinned = False
         for i in range(len(self.pins) -1, -1, -1):
@@ -448,6 +889,8 @@ class GameState():
                 break
         knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
         allyColor = "w" if self.whiteToMove else "b"
+        startSq = row * 8 + col
+        piece = self.board[row][col]
 
         for aMove in knightMoves:
             endRow = row + aMove[0]
@@ -456,13 +899,13 @@ class GameState():
             if 0 <= endRow < 8 and 0 <= endCol < 8:
                 if not piecePinned:  
                     endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != allyColor:
+                    if endPiece[0] != allyColor and (not capturesOnly or endPiece != "--"):
                         # Not an ally piece, either empty or enemy
-                        moves.append(Move((row, col), (endRow, endCol), self.board))
+                        moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
 
-    def getQueenMoves(self, row, col, moves):
-        self.getRookMoves(row, col, moves)
-        self.getBishopMoves(row, col, moves)
+    def getQueenMoves(self, row, col, moves, capturesOnly=False):
+        self.getRookMoves(row, col, moves, capturesOnly)
+        self.getBishopMoves(row, col, moves, capturesOnly)
                     
     '''
     This function generates a list of all the pieces that are pinned,
@@ -554,10 +997,13 @@ class GameState():
     '''
     Get all the king moves for the rook located at row, col and add moves to possible moves.
     '''
-    def getKingMoves(self, row, col, moves, includeCastling=True):
+    def getKingMoves(self, row, col, moves, includeCastling=True, capturesOnly=False):
         rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
         colMoves = (-1, 0, 1, -1, 1, -1, 0, 1)
         allyColor = "w" if self.whiteToMove else "b"
+        enemyColor = "b" if self.whiteToMove else "w"
+        startSq = row * 8 + col
+        piece = self.board[row][col]
 
         for i in range(8):
             endRow = row + rowMoves[i]
@@ -565,25 +1011,11 @@ class GameState():
             
             if 0 <= endRow < 8 and 0 <= endCol < 8:
                 endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    # Not an ally piece
-                    # Place king on end square and check for checks
-                    if allyColor == "w":
-                        self.whiteKingLocation = (endRow, endCol)
-                    else:
-                        self.blackKingLocation = (endRow, endCol)
-                    
-                    inCheck, _, _ = self.checkForPinsAndChecks()
-
-                    if not inCheck:
-                        moves.append(Move((row, col), (endRow, endCol), self.board))
-                    
-                    # Place the king back on the original location
-                    if allyColor == "w":
-                        self.whiteKingLocation = (row, col)
-                    else:
-                        self.blackKingLocation = (row, col)
-        if includeCastling:
+                if endPiece[0] != allyColor and (not capturesOnly or endPiece != "--"):
+                    # Not an ally piece, and the king isn't attacked on the end square
+                    if not self.isSquareAttacked(endRow, endCol, enemyColor):
+                        moves.append(Move(startSq | (endRow * 8 + endCol) << 6, piece, endPiece))
+        if includeCastling and not capturesOnly:
             self.getCastleMoves(row, col, moves)
     
     '''
@@ -593,21 +1025,21 @@ class GameState():
         if self.squareUnderAttack(row, col):
             return
         
-        if (self.whiteToMove and self.currentCastlingRight.wks) or (not self.whiteToMove and self.currentCastlingRight.bks):
+        if self.castleRights & (WKS if self.whiteToMove else BKS):
             self.getKingsideCastleMoves(row, col, moves)
 
-        if (self.whiteToMove and self.currentCastlingRight.wqs) or (not self.whiteToMove and self.currentCastlingRight.bqs):
+        if self.castleRights & (WQS if self.whiteToMove else BQS):
             self.getQueensideCastleMoves(row, col, moves)
         
     def getKingsideCastleMoves(self, row, col, moves):
         if self.board[row][col + 1] == '--' and self.board[row][col + 2] == '--':
             if not self.squareUnderAttack(row, col + 1,) and not self.squareUnderAttack(row, col + 2):
-                moves.append(Move((row, col), (row, col + 2), self.board))
+                moves.append(Move(row * 8 + col | (row * 8 + col + 2) << 6 | CASTLE_FLAG, self.board[row][col], "--"))
 
     def getQueensideCastleMoves(self, row, col, moves):
         if self.board[row][col - 1] == '--' and self.board[row][col - 2] == '--' and self.board[row][col - 3] == '--':
             if not self.squareUnderAttack(row, col - 1,) and not self.squareUnderAttack(row, col - 2):
-                moves.append(Move((row, col), (row, col - 2), self.board))
+                moves.append(Move(row * 8 + col | (row * 8 + col - 2) << 6 | CASTLE_FLAG, self.board[row][col], "--"))
             
 class CastleRights():
     def __init__(self, wks, bks, wqs, bqs):
@@ -616,31 +1048,83 @@ class CastleRights():
         self.wqs = wqs
         self.bqs = bqs
 
+    '''
+    Pack the rights into 4 bits, used to index the Zobrist castling keys
+    '''
+    def index(self):
+        return self.wks | (self.bks << 1) | (self.wqs << 2) | (self.bqs << 3)
+
 class Move ():
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
+    __slots__ = ("packed", "pieceMoved", "pieceCaptured")
 
-    def __init__(self, startSq, endSq, board, isEnpassantMove=False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.moveId = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
-        # Generating a unique ID for every move
-
-        self.isPawnPromotion = False
-        if (self.pieceMoved == "wP" and self.endRow == 0) or (self.pieceMoved == "bP" and self.endRow == 7):
-            self.isPawnPromotion = True
-        
-        self.isEnpassantMove = isEnpassantMove
-        if self.isEnpassantMove:
-            self.pieceCaptured = "wP" if self.pieceMoved == "bP" else "bP"
-        
-        self.isCapture = self.pieceCaptured != "--"
+    '''
+    A move is packed into one int: start square in bits 0-5, end square in bits 6-11 (square = row * 8 + col)
+    and the flags above them. Promotion is always to a queen. The move generators build moves straight from
+    the packed int, everything else about the move is decoded from it when asked for
+    '''
+    def __init__(self, packed, pieceMoved, pieceCaptured):
+        self.packed = packed
+        self.pieceMoved = pieceMoved
+        self.pieceCaptured = pieceCaptured
+        # For en passant this is the pawn taken beside the end square
+
+    '''
+    Build a move from (row, col) squares on a board, for moves entered in the UI
+    '''
+    @classmethod
+    def fromSquares(cls, startSq, endSq, board, isEnpassantMove=False):
+        pieceMoved = board[startSq[0]][startSq[1]]
+        pieceCaptured = board[endSq[0]][endSq[1]]
+        packed = startSq[0] * 8 + startSq[1] | (endSq[0] * 8 + endSq[1]) << 6
+        if (pieceMoved == "wP" and endSq[0] == 0) or (pieceMoved == "bP" and endSq[0] == 7):
+            packed |= PROMOTION_FLAG
+        elif pieceMoved[1] == "K" and abs(endSq[1] - startSq[1]) == 2:
+            packed |= CASTLE_FLAG
+        if isEnpassantMove:
+            packed |= ENPASSANT_FLAG
+            pieceCaptured = "wP" if pieceMoved == "bP" else "bP"
+        return cls(packed, pieceMoved, pieceCaptured)
+
+    @property
+    def startRow(self):
+        return self.packed >> 3 & 7
+
+    @property
+    def startCol(self):
+        return self.packed & 7
+
+    @property
+    def endRow(self):
+        return self.packed >> 9 & 7
+
+    @property
+    def endCol(self):
+        return self.packed >> 6 & 7
+
+    @property
+    def moveId(self):
+        return self.packed & MOVE_ID_MASK
+        # Unique for every start and end square pair
+
+    @property
+    def isPawnPromotion(self):
+        return self.packed & PROMOTION_FLAG != 0
+
+    @property
+    def isEnpassantMove(self):
+        return self.packed & ENPASSANT_FLAG != 0
+
+    @property
+    def isCastleMove(self):
+        return self.packed & CASTLE_FLAG != 0
+
+    @property
+    def isCapture(self):
+        return self.pieceCaptured != "--"
     
     def __eq__(self, other):
 
@@ -652,6 +1136,12 @@ class Move ():
     def getChessNotation(self):
         return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
     
+    '''
+    Long algebraic notation as used by UCI, e7e8q for a promotion
+    '''
+    def getUciNotation(self):
+        return self.getChessNotation() + ("q" if self.packed & PROMOTION_FLAG else "")
+
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
     
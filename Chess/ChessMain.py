@@ -4,17 +4,20 @@ handling user input and displaying the current game state.
 '''
 
 import pygame as p
-import ChessEngine, moveFinder
-from multiprocessing import Process, Queue, freeze_support
+import ChessEngine, moveFinder, engineWorker
+from multiprocessing import freeze_support
 
 import sys
 import os
+import time
 
 BOARD_WIDTH = BOARD_HEIGHT = 512
 MOVE_LOG_PANEL_WIDTH = 175
 MOVE_LOG_PANEL_HEIGHT = BOARD_HEIGHT
 DIMENSION = 8
 SQ_SIZE = BOARD_HEIGHT // DIMENSION  
+MAX_FPS = 60
+# The loop sleeps in clock.tick between frames instead of spinning a core the search could use
 
 def resource_path(relative_path):
     # Works for dev and PyInstaller exe
@@ -39,13 +42,17 @@ def main():
     p.init()
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_HEIGHT), p.NOFRAME, p.RESIZABLE)
     clock = p.time.Clock()
-    screen.fill(p.Color("white"))
     moveLogFont = p.font.SysFont("Arial", 14, False, False)
+    renderer = Renderer(screen, moveLogFont)
+    redraw = True
+    # Only draw when something happened, an idle board costs nothing but the event loop
+    cpuMeter = CpuMeter()
 
     gs = ChessEngine.GameState()
     # Create the chess board
 
     valid_moves = gs.get_valid_moves()
+    movesBySquare = indexMovesBySquare(valid_moves)
     move_made = False
     # Flag for when a valid move is made
 
@@ -62,10 +69,15 @@ def main():
     # False = AI player, True = human player
     playerOne = True
     playerTwo = True
+    ponder = True
+    # Let the AI search the expected reply while the other player thinks
     # *************************
 
     AIThinking = False
-    moveFinderProcess = None
+    engine = engineWorker.EngineWorker()
+    # One search process for the whole game, it keeps its tables between moves
+    engine.configure(VERBOSE=True)
+    # The node count summary of every search goes to the console with the progress lines
     moveUndone = False
 
     while running:
@@ -75,8 +87,14 @@ def main():
             if e.type == p.QUIT:
                 running = False
 
+            elif e.type == p.VIDEOEXPOSE:
+                # The window was covered or restored, its contents are gone
+                renderer.invalidate()
+                redraw = True
+
             # Mouse handlers
             elif e.type == p.MOUSEBUTTONDOWN:
+                redraw = True
                 if not gameOver:
                     location = p.mouse.get_pos()
 
@@ -92,12 +110,12 @@ def main():
                         playerClicks.append(sqSelected)
                     
                     if (len(playerClicks) == 2) and humanTurn:
-                        move = ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board)
+                        move = ChessEngine.Move.fromSquares(playerClicks[0], playerClicks[1], gs.board)
                         print(move.getChessNotation())
 
-                        for i in range(len(valid_moves)):
+                        for validMove in movesBySquare.get(playerClicks[0], []):
 
-                            if move == valid_moves[i]:
+                            if move == validMove:
                                 gs.make_move(move)
                                 move_made = True
                         
@@ -109,25 +127,28 @@ def main():
             
             # Key handlers
             elif e.type == p.KEYDOWN:
+                redraw = True
                 if e.key == p.K_z:
                     gs.undo_move()
                     move_made = True
                     gameOver = False
                     if AIThinking:
-                        moveFinderProcess.terminate()
+                        engine.cancel()
                         AIThinking = False
                     moveUndone = True
                 
                 if e.key == p.K_r:
                     # Reset the board if 'r' is pressed
                     gs = ChessEngine.GameState()
+                    engine.newGame()
                     valid_moves = gs.get_valid_moves()
+                    movesBySquare = indexMovesBySquare(valid_moves)
                     sqSelected = ()
                     playerClicks = []
                     move_made = False
                     gameOver = False
                     if AIThinking:
-                        moveFinderProcess.terminate()
+                        engine.cancel()
                         AIThinking = False
                     moveUndone = True
         
@@ -136,43 +157,59 @@ def main():
             if not AIThinking:
                 AIThinking = True
                 print("loading...")
-                returnQueue = Queue()
-                # Used to pass data between threads
-
-                moveFinderProcess = Process(target=moveFinder.findBestMove, args=(gs, valid_moves, returnQueue))
-                moveFinderProcess.start()
-
-            if not moveFinderProcess.is_alive():
+                engine.setGameState(gs)
+                # Only the moves played since the last search go to the worker
+                engine.go()
+
+            for info in engine.poll():
+                # Progress report from a finished search iteration
+                print("depth " + str(info["depth"]) + " score " + str(info["score"]) + " pv " + " ".join(info["pv"]))
+            if not engine.searching:
                 print("finished")
-                result = returnQueue.get()
-                if isinstance(result, tuple):
-                    AIMove, moveFinder.counter = result
-                else:
-                    AIMove = result
-                    moveFinder.counter = 0
+                result = engine.result
+                AIMove = result.move
+                moveFinder.counter = result.stats.nodes
+                # The search ran in another process, keep its node count for the summary at the end
                 
                 if AIMove is None:
                     AIMove = moveFinder.findRandomMove(valid_moves)
                 gs.make_move(AIMove)
                 move_made = True
                 AIThinking = False
+                if ponder:
+                    engine.ponderGameState(gs)
+                    # The go for the next AI move carries on with this search if the expected reply is played
 
         if move_made:
             valid_moves = gs.get_valid_moves()
+            movesBySquare = indexMovesBySquare(valid_moves)
             move_made = False
             moveUndone = False
+            redraw = True
 
-        draw_game_state(screen, gs, valid_moves, sqSelected, moveLogFont)
-        if gs.checkMate or gs.staleMate:
+        text = None
+        if gs.checkMate or gs.staleMate or gs.repetitionDraw or gs.fiftyMoveDraw:
+            if not gameOver:
+                engine.cancel()
+                # The ponder search has no depth or time limit, it would run on after the game
             gameOver = True
             if gs.staleMate:
                 text = "Stalemate"
+            elif gs.repetitionDraw:
+                text = "Draw by threefold repetition"
+            elif gs.fiftyMoveDraw:
+                text = "Draw by the fifty move rule"
             else:
                 text = "Black wins by checkmate" if gs.whiteToMove else "White wins by checkmate"
-            drawEndGameText(screen, text)
-       
-        p.display.flip()
+
+        if redraw:
+            renderer.draw(gs, movesBySquare, sqSelected, text)
+            redraw = False
+        cpuMeter.sample(AIThinking)
+        clock.tick(MAX_FPS)
+    engine.close()
     print(str(moveFinder.counter) + " moves evaluated")
+    print(cpuMeter.summary())
     #screen.blit(evalText, evalTextLocation)
 
 def numMoves(counter):
@@ -192,67 +229,32 @@ def numMoves(counter):
     
 
 '''
-Handles the graphics for current game state
+Valid moves grouped by the square they start from, {(row, col): [moves]}, so a click or a highlight only looks at one piece's moves
 '''
-def draw_game_state(screen, gs, validMoves, sqSelected, moveLogFont):
-    draw_board(screen)  
-    # Draw squares on the board
-    highlightSquares(screen, gs, validMoves, sqSelected)
-    draw_pieces(screen, gs.board)  
-    # Draw pieces on top of those squares
-    drawMoveLog(screen, gs, moveLogFont)
-
+def indexMovesBySquare(validMoves):
+    movesBySquare = {}
+    for move in validMoves:
+        movesBySquare.setdefault((move.startRow, move.startCol), []).append(move)
+    return movesBySquare
 
 '''
-Draw the squares on the board, where top left is always white
+Highlight colour per square: the square selected if it holds a piece that can be moved, and the squares its moves go to
 '''
-def draw_board(screen):
-    screen.fill(p.Color("white"))
-    colors = [p.Color("white"), p.Color("gray")]
-
-    for row in range(DIMENSION):
-
-        for col in range(DIMENSION):
-
-            color = colors[(row + col) % 2]
-            p.draw.rect(screen, color, p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
-
-'''
-Highlight the square selected and possible moves for the piece
-'''
-def highlightSquares(screen, gs, validMoves, sqSelected):
+def squareHighlights(gs, movesBySquare, sqSelected):
+    highlights = {}
     if sqSelected != ():
         row, col = sqSelected
 
         if gs.board[row][col][0] == ("w" if gs.whiteToMove else "b"):
-            # Square selected is a piece that can be moved
-            s = p.Surface((SQ_SIZE, SQ_SIZE))
-            s.set_alpha(100)
-            s.fill(p.Color("blue"))
-            screen.blit(s, (col * SQ_SIZE, row * SQ_SIZE))
-            s.fill(p.Color("green"))
-            for move in validMoves:
-                if move.startRow == row and move.startCol == col:
-                    screen.blit(s, (move.endCol * SQ_SIZE, move.endRow * SQ_SIZE))
+            highlights[sqSelected] = "blue"
+            for move in movesBySquare.get(sqSelected, []):
+                highlights[(move.endRow, move.endCol)] = "green"
+    return highlights
 
 '''
-Draw pieces on the board using the current gamestate
-'''
-def draw_pieces(screen, board):
-    for row in range(DIMENSION):
-        for col in range(DIMENSION):
-            piece = board[row][col]
-            if piece != "--":
-                # If the square is not empty
-                screen.blit(IMAGES[piece], p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
-
+Rows of the move log text, three moves (white and black) per row
 '''
-Draws the move log
-'''
-def drawMoveLog(screen, gs, font):
-    moveLogRect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
-    p.draw.rect(screen, p.Color("black"), moveLogRect)
-    moveLog = gs.moveLog
+def moveLogRows(moveLog):
     moveTexts = []
     for i in range(0, len(moveLog), 2):
         moveString = str(i//2 + 1) + ". " + str(moveLog[i]) + " "
@@ -260,29 +262,138 @@ def drawMoveLog(screen, gs, font):
             # Make sure black made a move
             moveString += str(moveLog[i+1]) + " "
         moveTexts.append(moveString)
-    
+
     movesPerRow = 3
-    padding = 5
-    textY = padding
-
-    for i in range(0, len(moveTexts), movesPerRow):
-        text = ''
-        for j in range(movesPerRow):
-            if i + j < len(moveTexts):
-                text += moveTexts[i+j]
-
-        #numMovesProcessed = 0 # GET NUM MOVES CALCULATED LATER...................
-        textObject = font.render(text, True, p.Color("white"))
-        textLocation = moveLogRect.move(padding, textY)
-        screen.blit(textObject, textLocation)
-        textY += textObject.get_height() + 1
-
-
-def drawEndGameText(screen, text):
-    font = p.font.SysFont("Helvetca", 32, True, False)
-    textObject = font.render(text, 0, p.Color("Black"))
-    textLoaction = p.Rect(0, 0, BOARD_WIDTH, BOARD_HEIGHT).move(BOARD_WIDTH/2 - textObject.get_width()/2, BOARD_HEIGHT/2 - textObject.get_height()/2)
-    screen.blit(textObject, textLoaction)
+    return ["".join(moveTexts[i:i + movesPerRow]) for i in range(0, len(moveTexts), movesPerRow)]
+
+'''
+Handles the graphics for the current game state. It remembers what every square and the move log showed when they were
+last drawn, redraws only what changed since and updates only those parts of the window
+'''
+class Renderer():
+    def __init__(self, screen, font):
+        self.screen = screen
+        self.font = font
+        self.colors = [p.Color("white"), p.Color("gray")]
+        self.highlightSurfaces = {}
+        for color in ("blue", "green"):
+            surface = p.Surface((SQ_SIZE, SQ_SIZE))
+            surface.set_alpha(100)
+            surface.fill(p.Color(color))
+            self.highlightSurfaces[color] = surface
+        self.squares = {}
+        # (piece, highlight colour or None) of every square as it was last drawn
+        self.moveLogLines = []
+        # (text, rendered surface) of every move log row, a row is only rendered again when its text changes
+        self.moveLogDrawn = False
+        self.endGameText = None
+        self.fullRedraw = True
+
+    '''
+    Draw everything again on the next draw, e.g. after the window was covered
+    '''
+    def invalidate(self):
+        self.fullRedraw = True
+
+    def draw(self, gs, movesBySquare, sqSelected, endGameText=None):
+        dirty = []
+        if self.fullRedraw:
+            self.screen.fill(p.Color("white"))
+            self.squares = {}
+            self.moveLogDrawn = False
+            dirty.append(self.screen.get_rect())
+            self.fullRedraw = False
+
+        highlights = squareHighlights(gs, movesBySquare, sqSelected)
+        textChanged = endGameText != self.endGameText
+        # The text covers the middle of the board, so squares under an old text have to be drawn again
+        squaresDrawn = False
+        for row in range(DIMENSION):
+            for col in range(DIMENSION):
+                state = (gs.board[row][col], highlights.get((row, col)))
+                if textChanged or self.squares.get((row, col)) != state:
+                    dirty.append(self.drawSquare(row, col, state))
+                    squaresDrawn = True
+        if endGameText is not None and squaresDrawn:
+            dirty.append(self.drawEndGameText(endGameText))
+        self.endGameText = endGameText
+
+        moveLogRect = self.drawMoveLog(gs.moveLog)
+        if moveLogRect is not None:
+            dirty.append(moveLogRect)
+        if dirty:
+            p.display.update(dirty)
+
+    '''
+    Draw one square with its highlight and piece on top, returns the rect it covers
+    '''
+    def drawSquare(self, row, col, state):
+        piece, highlight = state
+        rect = p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+        p.draw.rect(self.screen, self.colors[(row + col) % 2], rect)
+        # Top left is always white
+        if highlight is not None:
+            self.screen.blit(self.highlightSurfaces[highlight], rect)
+        if piece != "--":
+            self.screen.blit(IMAGES[piece], rect)
+        self.squares[(row, col)] = state
+        return rect
+
+    '''
+    Draws the move log if it changed, returns its rect or None when it didn't
+    '''
+    def drawMoveLog(self, moveLog):
+        rows = moveLogRows(moveLog)
+        if self.moveLogDrawn and rows == [text for text, surface in self.moveLogLines]:
+            return None
+        lines = []
+        for i, text in enumerate(rows):
+            if i < len(self.moveLogLines) and self.moveLogLines[i][0] == text:
+                lines.append(self.moveLogLines[i])
+            else:
+                lines.append((text, self.font.render(text, True, p.Color("white"))))
+        self.moveLogLines = lines
+        self.moveLogDrawn = True
+
+        moveLogRect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
+        p.draw.rect(self.screen, p.Color("black"), moveLogRect)
+        padding = 5
+        textY = padding
+        for text, textObject in lines:
+            self.screen.blit(textObject, moveLogRect.move(padding, textY))
+            textY += textObject.get_height() + 1
+        return moveLogRect
+
+    def drawEndGameText(self, text):
+        font = p.font.SysFont("Helvetca", 32, True, False)
+        textObject = font.render(text, 0, p.Color("Black"))
+        textLoaction = p.Rect(0, 0, BOARD_WIDTH, BOARD_HEIGHT).move(BOARD_WIDTH/2 - textObject.get_width()/2, BOARD_HEIGHT/2 - textObject.get_height()/2)
+        self.screen.blit(textObject, textLoaction)
+        return p.Rect(textLoaction.topleft, textObject.get_size())
+
+'''
+Share of one core the front end process uses, kept apart for frames while the AI is thinking and idle frames.
+The search runs in the worker process, so this is what the window itself costs
+'''
+class CpuMeter():
+    def __init__(self):
+        self.cpuTime = {False: 0.0, True: 0.0}
+        self.wallTime = {False: 0.0, True: 0.0}
+        self.lastCpu = time.process_time()
+        self.lastWall = time.perf_counter()
+
+    def sample(self, thinking):
+        cpu, wall = time.process_time(), time.perf_counter()
+        self.cpuTime[thinking] += cpu - self.lastCpu
+        self.wallTime[thinking] += wall - self.lastWall
+        self.lastCpu, self.lastWall = cpu, wall
+
+    def usage(self, thinking):
+        return self.cpuTime[thinking] / self.wallTime[thinking] if self.wallTime[thinking] else 0.0
+
+    def summary(self):
+        return ("Front end CPU: " + str(round(self.usage(False) * 100, 1)) + "% of a core idle, " +
+            str(round(self.usage(True) * 100, 1)) + "% while the AI is thinking")
 
 if __name__ == "__main__":
     freeze_support()
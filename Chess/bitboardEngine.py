@@ -0,0 +1,630 @@
+'''
+Alternative GameState backend that stores the position as 12 piece bitboards (Python ints),
+where bit row * 8 + col is set for every square a piece sits on.
+Move generation uses precomputed knight, king and pawn attack tables and ray scans for the sliding pieces,
+and produces the same Move objects as ChessEngine so moveFinder and ChessMain work with either backend
+'''
+from ChessEngine import (Move, CastleRights, parseFen, zobristPieceKeys, zobristCastleKeys, zobristEnpassantKeys, zobristBlackToMove,
+    pieceScores, pieceSquareScores, PROMOTION_FLAG, ENPASSANT_FLAG, CASTLE_FLAG, WKS, BKS, WQS, BQS, castleMask, enpassantSquares)
+
+PIECES = ["wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK"]
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+# White pieces are indices 0-5, black pieces 6-11
+
+ALL_SQUARES = (1 << 64) - 1
+
+'''
+Build a table of attacked squares for a piece that jumps by fixed offsets (knight, king, pawn captures)
+'''
+def buildLeaperAttacks(offsets):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for dRow, dCol in offsets:
+            endRow = row + dRow
+            endCol = col + dCol
+            if 0 <= endRow < 8 and 0 <= endCol < 8:
+                mask |= 1 << (endRow * 8 + endCol)
+        table.append(mask)
+    return table
+
+knightAttacks = buildLeaperAttacks(((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+kingAttacks = buildLeaperAttacks(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+pawnAttacks = [buildLeaperAttacks(((-1, -1), (-1, 1))), buildLeaperAttacks(((1, -1), (1, 1)))]
+# Indexed by color (0 white, 1 black), white pawns capture towards row 0
+
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+# The first 4 directions are orthogonal (rook), the last 4 diagonal (bishop)
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+QUEEN_DIRECTIONS = (0, 1, 2, 3, 4, 5, 6, 7)
+positiveDirection = [dRow * 8 + dCol > 0 for dRow, dCol in DIRECTIONS]
+# Rays towards higher square indices find their first blocker with the lowest set bit, the others with the highest
+
+rays = []
+# rays[direction][sq] is every square beyond sq in that direction up to the edge of the board
+for dRow, dCol in DIRECTIONS:
+    directionRays = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for i in range(1, 8):
+            endRow = row + dRow * i
+            endCol = col + dCol * i
+            if not (0 <= endRow < 8 and 0 <= endCol < 8):
+                break
+            mask |= 1 << (endRow * 8 + endCol)
+        directionRays.append(mask)
+    rays.append(directionRays)
+
+between = [[0] * 64 for sq in range(64)]
+# between[a][b] is the squares strictly between two squares on the same line, 0 if they aren't aligned
+for sq in range(64):
+    for d in range(8):
+        ray = rays[d][sq]
+        while ray:
+            target = (ray & -ray).bit_length() - 1
+            ray &= ray - 1
+            between[sq][target] = rays[d][sq] & ~rays[d][target] & ~(1 << target)
+
+pieceZobrist = [[zobristPieceKeys[piece][sq // 8][sq % 8] for sq in range(64)] for piece in PIECES]
+pieceValues = [pieceScores[piece[1]] for piece in PIECES]
+pieceSquareValues = [[pieceSquareScores[piece][sq // 8][sq % 8] for sq in range(64)] for piece in PIECES]
+
+'''
+Squares attacked by a slider on sq along the given directions, stopping at (and including) the first blocker
+'''
+def slidingAttacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = rays[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if positiveDirection[d]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= rays[d][blocker]
+        attacks |= ray
+    return attacks
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_DIRECTIONS)
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, BISHOP_DIRECTIONS)
+
+class BitboardGameState():
+    def __init__(self, fen=None):
+        self.pieces = [0] * 12
+        startBoard = [
+            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+            ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
+            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
+        ]
+        self.whiteToMove = True
+        self.enpassantPossible = ()
+        self.castleRights = WKS | BKS | WQS | BQS
+        self.halfmoveClock = 0
+        self.startPly = 0
+        if fen is not None:
+            startBoard, self.whiteToMove, self.castleRights, self.enpassantPossible, self.halfmoveClock, fullmoveNumber = parseFen(fen)
+            self.startPly = 2 * (fullmoveNumber - 1) + (0 if self.whiteToMove else 1)
+        for row in range(8):
+            for col in range(8):
+                if startBoard[row][col] != "--":
+                    self.pieces[PIECE_INDEX[startBoard[row][col]]] |= 1 << (row * 8 + col)
+        self.occupancy = [0, 0]
+        # Squares occupied by white and black, kept in step with self.pieces
+        self.updateOccupancy()
+
+        self.moveLog = []
+        self.stateLog = []
+        # State before each move packed into an int: castling bits, en passant square + 1 (0 for none) << 4,
+        # captured piece index + 1 (0 for none) << 11, captured square << 15 and the halfmove clock << 21
+        self.nullMoveLog = []
+        # En passant square and halfmove clock before each null move still on the board
+        self.zobristLog = []
+        # Hash of the position before each move in the move log
+        self.in_check = False
+        self.checkMate = False
+        self.staleMate = False
+        self.repetitionDraw = False
+        self.fiftyMoveDraw = False
+        self.boardView = None
+        self.zobristKey = self.computeZobristKey()
+        self.material, self.positionScore = self.computeEvaluation()
+        # Running material and piece square totals indexed by color (0 white, 1 black), updated in make_move and undo_move
+        self.pieceCount = bin(self.occupancy[0] | self.occupancy[1]).count("1")
+        # Pieces of both sides on the board, kings and pawns included, updated in make_move and undo_move
+
+    def updateOccupancy(self):
+        self.occupancy[0] = self.pieces[0] | self.pieces[1] | self.pieces[2] | self.pieces[3] | self.pieces[4] | self.pieces[5]
+        self.occupancy[1] = self.pieces[6] | self.pieces[7] | self.pieces[8] | self.pieces[9] | self.pieces[10] | self.pieces[11]
+
+    '''
+    8x8 list of two character strings in the same format as ChessEngine.GameState.board,
+    rebuilt from the bitboards the first time it is read after a move
+    '''
+    @property
+    def board(self):
+        if self.boardView is None:
+            board = [["--"] * 8 for row in range(8)]
+            for index in range(12):
+                bitboard = self.pieces[index]
+                while bitboard:
+                    sq = (bitboard & -bitboard).bit_length() - 1
+                    bitboard &= bitboard - 1
+                    board[sq >> 3][sq & 7] = PIECES[index]
+            self.boardView = board
+        return self.boardView
+
+    @property
+    def whiteKingLocation(self):
+        sq = self.pieces[KING].bit_length() - 1
+        return (sq >> 3, sq & 7)
+
+    @property
+    def blackKingLocation(self):
+        sq = self.pieces[6 + KING].bit_length() - 1
+        return (sq >> 3, sq & 7)
+
+    @property
+    def currentCastlingRight(self):
+        rights = self.castleRights
+        return CastleRights(bool(rights & WKS), bool(rights & BKS), bool(rights & WQS), bool(rights & BQS))
+
+    def computeZobristKey(self):
+        key = 0
+        for index in range(12):
+            bitboard = self.pieces[index]
+            while bitboard:
+                sq = (bitboard & -bitboard).bit_length() - 1
+                bitboard &= bitboard - 1
+                key ^= pieceZobrist[index][sq]
+        key ^= zobristCastleKeys[self.castleRights]
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        if not self.whiteToMove:
+            key ^= zobristBlackToMove
+        return key
+
+    '''
+    Material and piece square totals for each side counted from scratch, [white, black] each
+    '''
+    def computeEvaluation(self):
+        material = [0, 0]
+        positionScore = [0, 0]
+        for index in range(12):
+            bitboard = self.pieces[index]
+            while bitboard:
+                sq = (bitboard & -bitboard).bit_length() - 1
+                bitboard &= bitboard - 1
+                material[index // 6] += pieceValues[index]
+                positionScore[index // 6] += pieceSquareValues[index][sq]
+        return material, positionScore
+
+    '''
+    Index of the piece on sq, searching only the pieces of one color (offset 0 white, 6 black)
+    '''
+    def pieceOn(self, sq, offset):
+        bit = 1 << sq
+        for index in range(offset, offset + 6):
+            if self.pieces[index] & bit:
+                return index
+        return None
+
+    '''
+    Takes a Move and executes it, including castling, en passant and promotion to a queen
+    '''
+    def make_move(self, move):
+        pieces = self.pieces
+        packed = move.packed
+        start = packed & 63
+        end = packed >> 6 & 63
+        startBit = 1 << start
+        endBit = 1 << end
+        moved = PIECE_INDEX[move.pieceMoved]
+        color = 0 if moved < 6 else 1
+        enemyOffset = 6 if color == 0 else 0
+        key = self.zobristKey
+
+        captured = None
+        capturedSq = end
+        if self.occupancy[1 - color] & endBit:
+            captured = self.pieceOn(end, enemyOffset)
+        elif moved % 6 == PAWN and (start ^ end) & 7:
+            # En passant, the captured pawn is beside the start square
+            capturedSq = end + 8 if color == 0 else end - 8
+            captured = enemyOffset + PAWN
+        enpassant = self.enpassantPossible
+        self.stateLog.append(self.castleRights | (enpassant[0] * 8 + enpassant[1] + 1 if enpassant != () else 0) << 4 |
+            (captured + 1 if captured is not None else 0) << 11 | capturedSq << 15 | self.halfmoveClock << 21)
+        self.zobristLog.append(key)
+        if captured is not None or moved % 6 == PAWN:
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+
+        if captured is not None:
+            capturedBit = 1 << capturedSq
+            pieces[captured] ^= capturedBit
+            self.occupancy[1 - color] ^= capturedBit
+            key ^= pieceZobrist[captured][capturedSq]
+            self.material[1 - color] -= pieceValues[captured]
+            self.positionScore[1 - color] -= pieceSquareValues[captured][capturedSq]
+            self.pieceCount -= 1
+
+        pieces[moved] ^= startBit | endBit
+        self.occupancy[color] ^= startBit | endBit
+        key ^= pieceZobrist[moved][start] ^ pieceZobrist[moved][end]
+        self.positionScore[color] += pieceSquareValues[moved][end] - pieceSquareValues[moved][start]
+
+        if packed & PROMOTION_FLAG:
+            queen = moved - PAWN + QUEEN
+            pieces[moved] ^= endBit
+            pieces[queen] ^= endBit
+            key ^= pieceZobrist[moved][end] ^ pieceZobrist[queen][end]
+            self.material[color] += pieceValues[queen] - pieceValues[moved]
+            self.positionScore[color] += pieceSquareValues[queen][end] - pieceSquareValues[moved][end]
+
+        if packed & CASTLE_FLAG:
+            rook = moved - KING + ROOK
+            if end > start:
+                rookStart, rookEnd = end + 1, end - 1
+            else:
+                rookStart, rookEnd = end - 2, end + 1
+            rookBits = (1 << rookStart) | (1 << rookEnd)
+            pieces[rook] ^= rookBits
+            self.occupancy[color] ^= rookBits
+            key ^= pieceZobrist[rook][rookStart] ^ pieceZobrist[rook][rookEnd]
+            self.positionScore[color] += pieceSquareValues[rook][rookEnd] - pieceSquareValues[rook][rookStart]
+
+        newRights = self.castleRights & castleMask[start] & castleMask[end]
+        key ^= zobristCastleKeys[self.castleRights] ^ zobristCastleKeys[newRights]
+        self.castleRights = newRights
+
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        if moved % 6 == PAWN and abs(start - end) == 16:
+            self.enpassantPossible = ((start + end) >> 4, end & 7)
+            key ^= zobristEnpassantKeys[end & 7]
+        else:
+            self.enpassantPossible = ()
+
+        self.zobristKey = key ^ zobristBlackToMove
+        self.whiteToMove = not self.whiteToMove
+        self.moveLog.append(move)
+        self.boardView = None
+
+    '''
+    Undo the previous move
+    '''
+    def undo_move(self):
+        if len(self.moveLog) != 0:
+            move = self.moveLog.pop()
+            state = self.stateLog.pop()
+            self.castleRights = state & 15
+            self.enpassantPossible = enpassantSquares[state >> 4 & 127]
+            captured = (state >> 11 & 15) - 1
+            capturedSq = state >> 15 & 63
+            self.halfmoveClock = state >> 21
+            self.zobristKey = self.zobristLog.pop()
+            self.whiteToMove = not self.whiteToMove
+            pieces = self.pieces
+            packed = move.packed
+            start = packed & 63
+            end = packed >> 6 & 63
+            startBit = 1 << start
+            endBit = 1 << end
+            moved = PIECE_INDEX[move.pieceMoved]
+            color = 0 if moved < 6 else 1
+
+            if packed & PROMOTION_FLAG:
+                queen = moved - PAWN + QUEEN
+                pieces[queen] ^= endBit
+                pieces[moved] ^= endBit
+                self.material[color] -= pieceValues[queen] - pieceValues[moved]
+                self.positionScore[color] -= pieceSquareValues[queen][end] - pieceSquareValues[moved][end]
+            pieces[moved] ^= startBit | endBit
+            self.occupancy[color] ^= startBit | endBit
+            self.positionScore[color] -= pieceSquareValues[moved][end] - pieceSquareValues[moved][start]
+
+            if packed & CASTLE_FLAG:
+                rook = moved - KING + ROOK
+                if end > start:
+                    rookStart, rookEnd = end + 1, end - 1
+                else:
+                    rookStart, rookEnd = end - 2, end + 1
+                rookBits = (1 << rookStart) | (1 << rookEnd)
+                pieces[rook] ^= rookBits
+                self.occupancy[color] ^= rookBits
+                self.positionScore[color] -= pieceSquareValues[rook][rookEnd] - pieceSquareValues[rook][rookStart]
+
+            if captured >= 0:
+                capturedBit = 1 << capturedSq
+                pieces[captured] ^= capturedBit
+                self.occupancy[1 - color] ^= capturedBit
+                self.material[1 - color] += pieceValues[captured]
+                self.positionScore[1 - color] += pieceSquareValues[captured][capturedSq]
+                self.pieceCount += 1
+            self.boardView = None
+
+        self.checkMate = False
+        self.staleMate = False
+        self.repetitionDraw = False
+        self.fiftyMoveDraw = False
+
+    '''
+    Pass the turn without moving, for null move pruning in the search. Only undo_null_move can take it back,
+    and it has to before any undo_move
+    '''
+    def make_null_move(self):
+        self.zobristLog.append(self.zobristKey)
+        self.nullMoveLog.append((self.enpassantPossible, self.halfmoveClock))
+        key = self.zobristKey ^ zobristBlackToMove
+        if self.enpassantPossible != ():
+            key ^= zobristEnpassantKeys[self.enpassantPossible[1]]
+        self.zobristKey = key
+        self.enpassantPossible = ()
+        self.halfmoveClock = 0
+        # Nothing before a null move counts as a repetition
+        self.whiteToMove = not self.whiteToMove
+
+    def undo_null_move(self):
+        self.enpassantPossible, self.halfmoveClock = self.nullMoveLog.pop()
+        self.zobristKey = self.zobristLog.pop()
+        self.whiteToMove = not self.whiteToMove
+
+    '''
+    Whether the side to move has a knight, bishop, rook or queen. With only king and pawns left zugzwang is common,
+    so the search doesn't try null moves
+    '''
+    def hasNonPawnMaterial(self):
+        offset = 0 if self.whiteToMove else 6
+        pieces = self.pieces
+        return (pieces[offset + KNIGHT] | pieces[offset + BISHOP] | pieces[offset + ROOK] | pieces[offset + QUEEN]) != 0
+
+    '''
+    Bitboard of the pieces of the side at enemyOffset (0 white, 6 black) attacking sq with the given occupancy
+    '''
+    def attackersTo(self, sq, enemyOffset, occupied):
+        pieces = self.pieces
+        attackers = knightAttacks[sq] & pieces[enemyOffset + KNIGHT]
+        attackers |= kingAttacks[sq] & pieces[enemyOffset + KING]
+        attackers |= pawnAttacks[1 if enemyOffset == 0 else 0][sq] & pieces[enemyOffset + PAWN]
+        # An enemy pawn attacks sq if a pawn of our color on sq would attack it
+        rooksQueens = pieces[enemyOffset + ROOK] | pieces[enemyOffset + QUEEN]
+        if rooksQueens:
+            attackers |= rookAttacks(sq, occupied) & rooksQueens
+        bishopsQueens = pieces[enemyOffset + BISHOP] | pieces[enemyOffset + QUEEN]
+        if bishopsQueens:
+            attackers |= bishopAttacks(sq, occupied) & bishopsQueens
+        return attackers
+
+    '''
+    How many times the current position was on the board before. Only the last halfmoveClock plies are looked at,
+    nothing before a capture or pawn move can come back, and only every other one has the same side to move
+    '''
+    def repetitionCount(self):
+        key = self.zobristKey
+        log = self.zobristLog
+        count = 0
+        for i in range(len(log) - 2, max(len(log) - self.halfmoveClock, 0) - 1, -2):
+            if log[i] == key:
+                count += 1
+        return count
+
+    def inCheck(self):
+        offset = 0 if self.whiteToMove else 6
+        kingSq = self.pieces[offset + KING].bit_length() - 1
+        return self.attackersTo(kingSq, 6 - offset, self.occupancy[0] | self.occupancy[1]) != 0
+
+    def squareUnderAttack(self, row, col):
+        enemyOffset = 6 if self.whiteToMove else 0
+        return self.attackersTo(row * 8 + col, enemyOffset, self.occupancy[0] | self.occupancy[1]) != 0
+
+    '''
+    Map each of our pinned pieces to the squares it may still move to (the line between the king and the pinner)
+    '''
+    def getPins(self, kingSq, ownOccupancy, occupied, enemyOffset):
+        pins = {}
+        pieces = self.pieces
+        rooksQueens = pieces[enemyOffset + ROOK] | pieces[enemyOffset + QUEEN]
+        bishopsQueens = pieces[enemyOffset + BISHOP] | pieces[enemyOffset + QUEEN]
+        for d in range(8):
+            sliders = rooksQueens if d < 4 else bishopsQueens
+            ray = rays[d][kingSq]
+            if not ray & sliders:
+                continue
+            blockers = ray & occupied
+            if positiveDirection[d]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            if not (1 << first) & ownOccupancy:
+                continue
+            blockers &= rays[d][first]
+            if not blockers:
+                continue
+            if positiveDirection[d]:
+                second = (blockers & -blockers).bit_length() - 1
+            else:
+                second = blockers.bit_length() - 1
+            if (1 << second) & sliders:
+                pins[first] = between[kingSq][second] | (1 << second)
+        return pins
+
+    '''
+    Getting all of the legal moves
+    '''
+    def get_valid_moves(self):
+        moves = self.generateMoves()
+        if len(moves) == 0:
+            if self.in_check:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        else:
+            self.checkMate = False
+            self.staleMate = False
+        self.fiftyMoveDraw = self.halfmoveClock >= 100 and not self.checkMate
+        # A mate on the hundredth ply still counts
+        self.repetitionDraw = self.repetitionCount() >= 2
+        return moves
+
+    '''
+    Legal captures and promotions only, for the quiescence search. Quiet moves are never built.
+    When in check every legal move is returned instead, since all evasions have to be looked at
+    '''
+    def get_capture_moves(self):
+        return self.generateMoves(capturesOnly=True)
+
+    def generateMoves(self, capturesOnly=False):
+        moves = []
+        pieces = self.pieces
+        white = self.whiteToMove
+        color = 0 if white else 1
+        offset = 0 if white else 6
+        enemyOffset = 6 - offset
+        ownOccupancy = self.occupancy[color]
+        enemyOccupancy = self.occupancy[1 - color]
+        occupied = ownOccupancy | enemyOccupancy
+        kingSq = pieces[offset + KING].bit_length() - 1
+        checkers = self.attackersTo(kingSq, enemyOffset, occupied)
+        self.in_check = checkers != 0
+        if checkers:
+            capturesOnly = False
+        captureMask = enemyOccupancy if capturesOnly else ALL_SQUARES
+
+        # King moves, with the king taken off the board so it can't hide behind itself on a checking line
+        occupiedWithoutKing = occupied ^ (1 << kingSq)
+        targets = kingAttacks[kingSq] & ~ownOccupancy & captureMask
+        while targets:
+            target = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not self.attackersTo(target, enemyOffset, occupiedWithoutKing):
+                captured = PIECES[self.pieceOn(target, enemyOffset)] if (1 << target) & enemyOccupancy else "--"
+                moves.append(Move(kingSq | target << 6, PIECES[offset + KING], captured))
+
+        if checkers & (checkers - 1) == 0:
+            # Not in double check, so other pieces can move
+            if checkers:
+                # Must capture the checking piece or block the line it checks along
+                checkerSq = checkers.bit_length() - 1
+                checkMask = checkers | between[kingSq][checkerSq]
+            else:
+                checkMask = ALL_SQUARES
+            pins = self.getPins(kingSq, ownOccupancy, occupied, enemyOffset)
+            targetMask = ~ownOccupancy & checkMask & captureMask
+
+            knights = pieces[offset + KNIGHT]
+            while knights:
+                sq = (knights & -knights).bit_length() - 1
+                knights &= knights - 1
+                if sq in pins:
+                    # A pinned knight can never move
+                    continue
+                self.addMoves(moves, offset + KNIGHT, sq, knightAttacks[sq] & targetMask, enemyOffset, enemyOccupancy)
+
+            for piece, directions in ((BISHOP, BISHOP_DIRECTIONS), (ROOK, ROOK_DIRECTIONS), (QUEEN, QUEEN_DIRECTIONS)):
+                sliders = pieces[offset + piece]
+                while sliders:
+                    sq = (sliders & -sliders).bit_length() - 1
+                    sliders &= sliders - 1
+                    targets = slidingAttacks(sq, occupied, directions) & targetMask
+                    if sq in pins:
+                        targets &= pins[sq]
+                    self.addMoves(moves, offset + piece, sq, targets, enemyOffset, enemyOccupancy)
+
+            self.getPawnMoves(moves, offset, color, occupied, enemyOccupancy, checkMask, pins, kingSq, capturesOnly)
+
+            if not checkers and not capturesOnly:
+                self.getCastleMoves(moves, kingSq, enemyOffset, occupied)
+        return moves
+
+    '''
+    Add a Move of the piece at pieceIndex from sq to every square in the targets bitboard, with the given Move flags.
+    Captured pieces are looked up in the bitboards of the side at enemyOffset, the board view is left for outside callers
+    '''
+    def addMoves(self, moves, pieceIndex, sq, targets, enemyOffset, enemyOccupancy, flags=0):
+        piece = PIECES[pieceIndex]
+        quiet = targets & ~enemyOccupancy
+        while quiet:
+            target = (quiet & -quiet).bit_length() - 1
+            quiet &= quiet - 1
+            moves.append(Move(sq | target << 6 | flags, piece, "--"))
+        captures = targets & enemyOccupancy
+        if captures:
+            pieces = self.pieces
+            for index in range(enemyOffset, enemyOffset + 6):
+                # One pass per enemy piece type instead of a lookup per target
+                hits = captures & pieces[index]
+                while hits:
+                    target = (hits & -hits).bit_length() - 1
+                    hits &= hits - 1
+                    moves.append(Move(sq | target << 6 | flags, piece, PIECES[index]))
+
+    def getPawnMoves(self, moves, offset, color, occupied, enemyOccupancy, checkMask, pins, kingSq, capturesOnly=False):
+        pawns = self.pieces[offset + PAWN]
+        pawn = PIECES[offset + PAWN]
+        forward = -8 if color == 0 else 8
+        doublePushRow = 6 if color == 0 else 1
+        promotionRow = 0 if color == 0 else 7
+        epSq = self.enpassantPossible[0] * 8 + self.enpassantPossible[1] if self.enpassantPossible != () else None
+
+        while pawns:
+            sq = (pawns & -pawns).bit_length() - 1
+            pawns &= pawns - 1
+            allowed = checkMask & pins[sq] if sq in pins else checkMask
+            push = sq + forward
+            promotion = PROMOTION_FLAG if push >> 3 == promotionRow else 0
+            if not (1 << push) & occupied and (not capturesOnly or promotion):
+                # Only promotions when generating captures
+                if (1 << push) & allowed:
+                    moves.append(Move(sq | push << 6 | promotion, pawn, "--"))
+                if sq >> 3 == doublePushRow:
+                    doublePush = push + forward
+                    if not (1 << doublePush) & occupied and (1 << doublePush) & allowed:
+                        moves.append(Move(sq | doublePush << 6, pawn, "--"))
+
+            self.addMoves(moves, offset + PAWN, sq, pawnAttacks[color][sq] & enemyOccupancy & allowed, 6 - offset, enemyOccupancy, promotion)
+
+            if epSq is not None and pawnAttacks[color][sq] & (1 << epSq):
+                if self.isLegalEnpassant(sq, epSq, epSq - forward, occupied, offset, kingSq):
+                    moves.append(Move(sq | epSq << 6 | ENPASSANT_FLAG, pawn, PIECES[6 - offset + PAWN]))
+
+    '''
+    En passant removes two pieces from one line, so check legality by playing it on the occupancy
+    and looking for any attacker of the king
+    '''
+    def isLegalEnpassant(self, sq, epSq, capturedSq, occupied, offset, kingSq):
+        enemyOffset = 6 - offset
+        occupiedAfter = (occupied ^ (1 << sq) ^ (1 << capturedSq)) | (1 << epSq)
+        self.pieces[enemyOffset + PAWN] ^= 1 << capturedSq
+        attacked = self.attackersTo(kingSq, enemyOffset, occupiedAfter)
+        self.pieces[enemyOffset + PAWN] ^= 1 << capturedSq
+        return attacked == 0
+
+    '''
+    Castling moves for a king that is not in check, the squares it passes must be empty and unattacked
+    '''
+    def getCastleMoves(self, moves, kingSq, enemyOffset, occupied):
+        if self.whiteToMove:
+            kingSide, queenSide = self.castleRights & WKS, self.castleRights & WQS
+        else:
+            kingSide, queenSide = self.castleRights & BKS, self.castleRights & BQS
+        king = PIECES[KING if self.whiteToMove else 6 + KING]
+        if kingSide and not occupied & ((1 << (kingSq + 1)) | (1 << (kingSq + 2))):
+            if not self.attackersTo(kingSq + 1, enemyOffset, occupied) and not self.attackersTo(kingSq + 2, enemyOffset, occupied):
+                moves.append(Move(kingSq | (kingSq + 2) << 6 | CASTLE_FLAG, king, "--"))
+        if queenSide and not occupied & ((1 << (kingSq - 1)) | (1 << (kingSq - 2)) | (1 << (kingSq - 3))):
+            if not self.attackersTo(kingSq - 1, enemyOffset, occupied) and not self.attackersTo(kingSq - 2, enemyOffset, occupied):
+                moves.append(Move(kingSq | (kingSq - 2) << 6 | CASTLE_FLAG, king, "--"))
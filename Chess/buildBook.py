@@ -0,0 +1,135 @@
+'''
+Build an opening book file for openingBook.py from PGN games, from the engine's own self play, or both.
+Every move of the first plies of a game adds to the weight of its (position, move) entry: 2 for the side that won,
+1 for a draw or an unknown result, and nothing for the side that lost
+
+Usage:
+    python buildBook.py --pgn games.pgn more.pgn --plies 16
+    python buildBook.py --self-play 64 --depth 3 --plies 12 --out book.bin
+'''
+import argparse
+import multiprocessing
+import random
+import re
+import sys
+import ChessEngine
+import matchRunner
+import moveFinder
+import openingBook
+import searchBench
+import uciEngine
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5, "*": None}
+
+'''
+Read the games of a PGN file as (list of SAN moves, result from white's point of view or None).
+Comments, variations, move numbers and numeric annotations are skipped
+'''
+def readPgnGames(path):
+    with open(path, encoding="utf-8", errors="replace") as file:
+        text = file.read()
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", text)
+    count = 1
+    while count:
+        # Innermost variations first, they can be nested
+        text, count = re.subn(r"\([^()]*\)", " ", text)
+
+    games = []
+    moves = []
+    for line in text.splitlines():
+        if line.startswith("["):
+            # Tag pairs, the result is taken from the end of the movetext
+            continue
+        for token in line.split():
+            if token in RESULTS:
+                games.append((moves, RESULTS[token]))
+                moves = []
+                continue
+            token = re.sub(r"^\d+\.+", "", token)
+            if token and not token.startswith("$"):
+                moves.append(token)
+    if moves:
+        games.append((moves, None))
+    return games
+
+'''
+Add the first maxPlies moves of a game to weights, {(key, move id): weight}. parse turns a move string
+into a Move (ChessEngine.sanToMove or uciEngine.uciToMove), a move it can't read ends the game there
+'''
+def addGame(weights, moves, result, maxPlies, parse):
+    gs = ChessEngine.GameState()
+    for text in moves[:maxPlies]:
+        try:
+            move = parse(gs, text)
+        except ValueError:
+            break
+        if result is None or result == 0.5:
+            weight = 1
+        else:
+            weight = 2 if (result == 1.0) == gs.whiteToMove else 0
+        key = (gs.zobristKey, move.moveId)
+        weights[key] = weights.get(key, 0) + weight
+        gs.make_move(move)
+
+'''
+Pool task, plays plies moves from an opening line at the given depth and returns all moves in UCI notation
+'''
+def selfPlayGame(task):
+    opening, plies, depth, seed = task
+    random.seed(seed)
+    moveFinder.USE_BOOK = False
+    moveFinder.WORKERS = 1
+    moveFinder.DEPTH = depth
+    gs = ChessEngine.GameState()
+    moves = opening.split()
+    for text in moves:
+        gs.make_move(uciEngine.uciToMove(gs, text))
+    while len(moves) < plies:
+        validMoves = gs.get_valid_moves()
+        if not validMoves:
+            break
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, validMoves, returnQueue)
+        move = returnQueue[-1].move or random.choice(validMoves)
+        gs.make_move(move)
+        moves.append(move.getUciNotation())
+    return moves
+
+'''
+Self play games games over a pool of workers, starting from the match runner openings in turn. The search
+shuffles the root moves, so equally scored moves differ between games. Returns the UCI move lists
+'''
+def selfPlayGames(games, plies, depth, workers=None, seed=0):
+    openings = matchRunner.OPENINGS
+    tasks = [(openings[game % len(openings)], plies, depth, seed + game) for game in range(games)]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(selfPlayGame, tasks)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN files and/or self play")
+    parser.add_argument("--pgn", nargs="+", default=[], metavar="FILE")
+    parser.add_argument("--self-play", type=int, default=0, metavar="GAMES", help="number of self play games to add")
+    parser.add_argument("--depth", type=int, default=3, help="search depth of the self play games")
+    parser.add_argument("--plies", type=int, default=16, help="moves per game that go into the book")
+    parser.add_argument("--workers", type=int, help="processes playing self play games (default: every core)")
+    parser.add_argument("--min-weight", type=int, default=1, help="leave out entries with a lower total weight")
+    parser.add_argument("--out", default=openingBook.DEFAULT_BOOK_PATH)
+    options = parser.parse_args(args)
+    weights = {}
+
+    for path in options.pgn:
+        games = readPgnGames(path)
+        for moves, result in games:
+            addGame(weights, moves, result, options.plies, ChessEngine.sanToMove)
+        print(path + ": " + str(len(games)) + " games")
+    if options.self_play:
+        for moves in selfPlayGames(options.self_play, options.plies, options.depth, options.workers):
+            addGame(weights, moves, None, options.plies, uciEngine.uciToMove)
+        print(str(options.self_play) + " self play games at depth " + str(options.depth))
+
+    weights = {entry: weight for entry, weight in weights.items() if weight >= options.min_weight}
+    print("Wrote " + str(openingBook.writeBook(weights, options.out)) + " entries to " + options.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+'''
+Long lived search process for the pygame front end and batch jobs. The worker keeps its own GameState, transposition
+table and move ordering tables across moves, so a move costs one search instead of a new process that unpickles
+the whole game and imports everything again. Commands go over a pipe as small tuples, and the position is sent as
+the moves added or taken back since the last one, or a FEN plus moves when it starts somewhere else.
+The worker answers every go with the search's progress dicts and its SearchResult. Stopping goes through a shared
+multiprocessing.Event the search checks with its time limit, so it ends within a few hundred nodes even while the
+worker is busy, and still answers with the best move it found so far.
+While the opponent thinks, ponder searches the position after the reply the last search expected. If the opponent
+plays it, the go for the real search turns the running ponder search into it instead of starting over
+
+Usage:
+    engine = EngineWorker()
+    engine.setPosition(None, ["e2e4", "e7e5"])
+    engine.go(maxDepth=3)
+    result = engine.waitResult()
+    engine.ponder(None, ["e2e4", "e7e5", result.move.getUciNotation()])
+    engine.setPosition(None, ["e2e4", "e7e5", result.move.getUciNotation(), "g8f6"])
+    engine.go(maxDepth=3)
+    engine.close()
+'''
+import multiprocessing
+import threading
+import ChessEngine
+import moveFinder
+import uciEngine
+
+'''
+Stands in for the returnQueue of moveFinder.findBestMove in the worker, sending everything the search puts
+back over the pipe tagged with the id of the go it answers. started is set by the first item, by then
+findBestMove has set up its limits
+'''
+class PipeQueue():
+    def __init__(self, connection, searchId):
+        self.connection = connection
+        self.searchId = searchId
+        self.started = threading.Event()
+
+    def put(self, item):
+        self.connection.send((self.searchId, item))
+        self.started.set()
+
+'''
+Worker process main loop. Commands:
+    ("position", fen or None for the start position, [uci moves])
+    ("moves", [uci moves])      play moves on from the current position
+    ("undo", count)             take back moves
+    ("go", search id, {findBestMove limits})
+    ("ponderhit", {findBestMove limits})    the running search goes on with these limits
+    ("stop",)                   end the running search, it still sends its result (stopEvent does the same without waiting in line)
+    ("set", {moveFinder setting: value})
+    ("newgame",)                start position and empty search tables
+    ("quit",)
+'''
+def runWorker(connection, stopEvent):
+    gs = ChessEngine.GameState()
+    searchThread = None
+    searchQueue = None
+
+    def startSearch(searchId, limits):
+        nonlocal searchThread, searchQueue
+        stopEvent.clear()
+        # A stop meant for the previous search must not end this one
+        searchQueue = PipeQueue(connection, searchId)
+        searchThread = threading.Thread(target=moveFinder.findBestMove,
+            args=(gs, gs.get_valid_moves(), searchQueue), kwargs=dict(limits, stopEvent=stopEvent), daemon=True)
+        searchThread.start()
+
+    def endSearch():
+        if searchThread is None:
+            return
+        stopEvent.set()
+        searchThread.join()
+
+    def playMoves(moves):
+        for text in moves:
+            gs.make_move(uciEngine.uciToMove(gs, text))
+
+    while True:
+        try:
+            command = connection.recv()
+        except EOFError:
+            # The front end went away without saying quit
+            command = ("quit",)
+        name = command[0]
+        if name == "ponderhit":
+            if searchThread is None or not searchThread.is_alive():
+                # The ponder search already finished and sent its result
+                continue
+            if moveFinder.WORKERS == 1:
+                while not searchQueue.started.wait(0.05):
+                    if not searchThread.is_alive():
+                        break
+                        # A search that died before its first report never sets started
+                moveFinder.limitSearch(**command[1])
+                continue
+            searchId = searchQueue.searchId
+            searchQueue.searchId = None
+            # The parallel search can't take new limits, its result is dropped and the search starts over
+            endSearch()
+            startSearch(searchId, command[1])
+            continue
+        endSearch()
+        # Every other command waits for the running search to send its result first
+        searchThread = None
+
+        if name == "position":
+            gs = ChessEngine.GameState(command[1])
+            playMoves(command[2])
+        elif name == "moves":
+            playMoves(command[1])
+        elif name == "undo":
+            for i in range(command[1]):
+                gs.undo_move()
+        elif name == "go":
+            startSearch(command[1], command[2])
+        elif name == "set":
+            for setting, value in command[1].items():
+                setattr(moveFinder, setting, value)
+        elif name == "newgame":
+            gs = ChessEngine.GameState()
+            moveFinder.transpositionTable.clear()
+            moveFinder.resetMoveOrdering()
+        elif name == "quit":
+            connection.close()
+            return
+
+'''
+Front end side of the worker process
+'''
+class EngineWorker():
+    def __init__(self):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        self.stopEvent = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=runWorker, args=(workerConnection, self.stopEvent), daemon=True)
+        self.process.start()
+        workerConnection.close()
+        # Only the worker uses its end
+        self.fen = None
+        self.moves = []
+        # The position the worker has, as a starting FEN (None for the start position) and UCI moves
+        self.searchId = 0
+        self.searching = False
+        self.result = None
+        # SearchResult of the last search once it arrives
+        self.pv = []
+        # Principal variation of the current search's last finished iteration
+        self.pondering = False
+        # True while the current search is a ponder search the next go can take over
+
+    '''
+    Bring the worker to the position after moves (UCI strings) from fen, sending only the moves to take back
+    and play from the position it already has when the game starts from the same place.
+    A search still running is stopped and its result ignored, unless it is a ponder search on this very position
+    '''
+    def setPosition(self, fen, moves):
+        moves = list(moves)
+        if self.pondering and fen == self.fen and moves == self.moves:
+            return
+        self.abandonSearch()
+        known = self.moves
+        if fen != self.fen:
+            self.connection.send(("position", fen, moves))
+        else:
+            common = 0
+            while common < min(len(moves), len(known)) and moves[common] == known[common]:
+                common += 1
+            # A ponder miss only takes back the expected reply
+            if len(known) > common:
+                self.connection.send(("undo", len(known) - common))
+            if len(moves) > common:
+                self.connection.send(("moves", moves[common:]))
+        self.fen = fen
+        self.moves = moves
+
+    '''
+    The position of a GameState started from the start position (like the one ChessMain plays on)
+    '''
+    def setGameState(self, gs):
+        self.setPosition(None, [move.getUciNotation() for move in gs.moveLog])
+
+    '''
+    Start searching the current position, keyword arguments are the limits of moveFinder.findBestMove
+    (timeLimit, nodeLimit, maxDepth). A search still running is stopped and its result ignored,
+    except a ponder search on this position, which goes on with the limits
+    '''
+    def go(self, **limits):
+        if self.pondering:
+            self.pondering = False
+            self.connection.send(("ponderhit", limits))
+            return
+        self.pv = []
+        self.searchId += 1
+        self.searching = True
+        self.result = None
+        self.connection.send(("go", self.searchId, limits))
+
+    '''
+    Search on the opponent's time: the position after moves from fen (the engine's move last) and the reply the
+    opponent is expected to play, by default the second move of the last search's principal variation.
+    Returns False when there is no expected reply. Once the opponent moves, setPosition and go as usual
+    '''
+    def ponder(self, fen, moves, reply=None):
+        moves = list(moves)
+        if reply is None:
+            if len(self.pv) < 2 or moves[-1:] != self.pv[:1]:
+                return False
+            reply = self.pv[1]
+        self.setPosition(fen, moves + [reply])
+        self.go(maxDepth=moveFinder.MAX_DEPTH)
+        self.pondering = True
+        return True
+
+    def ponderGameState(self, gs):
+        return self.ponder(None, [move.getUciNotation() for move in gs.moveLog])
+
+    '''
+    Ask the running search to finish, its result (the best move so far) still comes in through poll.
+    The event stops it right away, the command covers a go the worker hasn't started yet
+    '''
+    def stop(self):
+        if self.searching:
+            self.stopEvent.set()
+            self.connection.send(("stop",))
+
+    '''
+    Change moveFinder settings in the worker, e.g. configure(DEPTH=4, USE_BOOK=False)
+    '''
+    def configure(self, **settings):
+        self.connection.send(("set", settings))
+
+    def newGame(self):
+        self.abandonSearch()
+        self.connection.send(("newgame",))
+        self.fen = None
+        self.moves = []
+
+    '''
+    Stop the running search and ignore its result, e.g. when the move it was looking for was taken back
+    '''
+    def cancel(self):
+        self.stop()
+        self.abandonSearch()
+
+    '''
+    Forget the current search, whatever it still sends is dropped as coming from an earlier one
+    '''
+    def abandonSearch(self):
+        if self.searching:
+            self.stopEvent.set()
+            self.searchId += 1
+            self.searching = False
+        self.pondering = False
+        self.result = None
+
+    '''
+    Read whatever the worker has sent without waiting. Returns the progress dicts of the current search,
+    its SearchResult ends up in self.result. Anything left over from an earlier search is dropped
+    '''
+    def poll(self, timeout=0):
+        progress = []
+        while self.connection.poll(timeout):
+            searchId, item = self.connection.recv()
+            timeout = 0
+            if searchId != self.searchId:
+                continue
+            if isinstance(item, moveFinder.SearchResult):
+                self.result = item
+                self.searching = False
+            else:
+                self.pv = item["pv"]
+                progress.append(item)
+        return progress
+
+    '''
+    Wait for the current search to finish and return its SearchResult, or None after timeout seconds
+    '''
+    def waitResult(self, timeout=None):
+        while self.searching:
+            if not self.connection.poll(timeout):
+                return None
+            self.poll()
+        return self.result
+
+    def close(self):
+        try:
+            self.connection.send(("quit",))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
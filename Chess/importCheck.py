@@ -0,0 +1,68 @@
+'''
+Import time budget for the engine core (ChessEngine, bitboardEngine, moveFinder). Every search process imports
+these, so each one is timed with python -X importtime in a fresh interpreter and fails the check when it takes
+longer than the budget or pulls in a module that has to stay out of the core or load lazily: pygame and ChessMain,
+the opening book and tablebases, multiprocessing and cProfile
+
+Usage:
+    python importCheck.py
+    python importCheck.py --budget 30
+'''
+import argparse
+import os
+import subprocess
+import sys
+
+CORE_MODULES = ["ChessEngine", "bitboardEngine", "moveFinder"]
+IMPORT_BUDGET = 50
+# Milliseconds, cumulative import time of one core module including everything it imports
+LAZY_MODULES = ["pygame", "ChessMain", "openingBook", "tablebase", "multiprocessing", "cProfile"]
+
+'''
+Import module in a fresh interpreter and return {module name: cumulative import time in microseconds}
+for everything the import loaded. Raises ValueError if the import fails
+'''
+def importTimes(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError("import " + module + " failed:\n" + result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[1].strip().isdigit():
+            # The first line is the column header
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+'''
+Time every core module, returns (module, milliseconds, lazy modules it imported) per module
+'''
+def checkImports(modules=CORE_MODULES):
+    results = []
+    for module in modules:
+        importTimes(module)
+        # The first run writes the bytecode cache, so compiling isn't counted
+        times = importTimes(module)
+        results.append((module, times[module] / 1000, [lazy for lazy in LAZY_MODULES if lazy in times]))
+    return results
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Check the import time of the engine core")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="milliseconds allowed per core module")
+    options = parser.parse_args(args)
+    failures = []
+
+    for module, milliseconds, lazyImports in checkImports():
+        print(module + ": " + str(round(milliseconds, 1)) + " ms")
+        if milliseconds > options.budget:
+            failures.append(module + " takes " + str(round(milliseconds, 1)) + " ms, over the budget of " + str(options.budget) + " ms")
+        if lazyImports:
+            failures.append(module + " imports " + ", ".join(lazyImports))
+
+    for failure in failures:
+        print("FAIL " + failure)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
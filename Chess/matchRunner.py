@@ -0,0 +1,191 @@
+'''
+Engine against engine matches between two moveFinder configurations, to check whether a search change plays
+stronger or just slower. Games run in parallel over a pool of processes, every opening is played twice with
+the colours swapped, and the summary gives wins / draws / losses, an Elo estimate and nodes and time per move.
+A configuration is a set of moveFinder globals, e.g. DEPTH=2 or USE_QUIESCENCE=False or TIME_LIMIT=0.2
+
+Usage:
+    python matchRunner.py --a DEPTH=3 --b DEPTH=2 --games 16
+    python matchRunner.py --a USE_QUIESCENCE=True --b USE_QUIESCENCE=False --games 32 --workers 4
+'''
+import argparse
+import ast
+import math
+import multiprocessing
+import random
+import sys
+import time
+import ChessEngine
+import moveFinder
+import searchBench
+import uciEngine
+
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "g1f3 d7d5 g2g3 g8f6",
+]
+# Short opening lines in UCI notation, so games between deterministic settings still differ
+MAX_PLIES = 300
+# Games still going after this many plies are adjudicated as draws
+
+defaultSettings = {}
+# The moveFinder globals as they were before any configuration was applied
+
+'''
+Parse "DEPTH=3,USE_QUIESCENCE=False" into {"DEPTH": 3, "USE_QUIESCENCE": False}
+'''
+def parseConfig(text):
+    config = {}
+    for item in filter(None, text.split(",")):
+        name, value = item.split("=", 1)
+        name = name.strip()
+        if not hasattr(moveFinder, name):
+            raise ValueError("moveFinder has no setting " + name)
+        config[name] = ast.literal_eval(value.strip())
+    return config
+
+'''
+Set the moveFinder globals for one side, anything the other side changed goes back to its default first
+'''
+def applyConfig(config):
+    for name, value in defaultSettings.items():
+        setattr(moveFinder, name, value)
+    for name, value in config.items():
+        defaultSettings.setdefault(name, getattr(moveFinder, name))
+        setattr(moveFinder, name, value)
+
+'''
+Why the game is over ("checkmate", "stalemate", "fifty moves", "repetition", "move limit") or None if it isn't,
+validMoves has to come from the get_valid_moves call that set the draw flags
+'''
+def gameOverReason(gs, validMoves, plies):
+    if not validMoves:
+        return "checkmate" if gs.inCheck() else "stalemate"
+    if gs.fiftyMoveDraw:
+        return "fifty moves"
+    if gs.repetitionDraw:
+        return "repetition"
+    if plies >= MAX_PLIES:
+        return "move limit"
+    return None
+
+'''
+Play one game in a pool worker. task is (game number, opening, (white config, black config), random seed).
+Returns the result from white's point of view (1, 0.5 or 0), how the game ended and the nodes, seconds
+and number of moves each side used. Each side searches with its own transposition table and history scores,
+so neither plays from the other's deeper (or shallower) search
+'''
+def playGame(task):
+    gameNumber, opening, configs, seed = task
+    random.seed(seed)
+    moveFinder.WORKERS = 1
+    sharedTables = (moveFinder.transpositionTable, moveFinder.historyTable)
+    sideTables = [(moveFinder.TranspositionTable(), {piece: [0] * 64 for piece in moveFinder.historyTable}) for color in range(2)]
+    gs = ChessEngine.GameState()
+    for text in opening.split():
+        gs.make_move(uciEngine.uciToMove(gs, text))
+    stats = [{"nodes": 0, "seconds": 0.0, "moves": 0} for color in range(2)]
+    plies = 0
+
+    try:
+        while True:
+            validMoves = gs.get_valid_moves()
+            reason = gameOverReason(gs, validMoves, plies)
+            if reason is not None:
+                break
+            side = 0 if gs.whiteToMove else 1
+            applyConfig(configs[side])
+            moveFinder.transpositionTable, moveFinder.historyTable = sideTables[side]
+            returnQueue = searchBench.ListQueue()
+            startTime = time.perf_counter()
+            moveFinder.findBestMove(gs, validMoves[:], returnQueue)
+            stats[side]["seconds"] += time.perf_counter() - startTime
+            stats[side]["nodes"] += returnQueue[-1].stats.nodes
+            stats[side]["moves"] += 1
+            move = returnQueue[-1].move if returnQueue[-1].move is not None else random.choice(validMoves)
+            gs.make_move(move)
+            plies += 1
+    finally:
+        moveFinder.transpositionTable, moveFinder.historyTable = sharedTables
+        # The tables of the process that called playGame directly
+
+    if reason == "checkmate":
+        result = 0.0 if gs.whiteToMove else 1.0
+    else:
+        result = 0.5
+    return {"game": gameNumber, "opening": opening, "result": result, "reason": reason, "plies": plies, "stats": stats}
+
+'''
+Elo difference for a score fraction, with the half width of its 95% confidence interval from the per game results
+'''
+def eloEstimate(results):
+    games = len(results)
+    score = sum(results) / games
+    variance = sum((result - score) ** 2 for result in results) / games
+    def elo(fraction):
+        fraction = min(max(fraction, 1 / (2 * games)), 1 - 1 / (2 * games))
+        # A clean sweep would be infinite, count it as half a game dropped
+        return -400 * math.log10(1 / fraction - 1)
+    margin = 1.96 * math.sqrt(variance / games)
+    return elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+'''
+Play games games between configA and configB over a pool of workers and return the summary from A's point of view
+'''
+def runMatch(configA, configB, games, workers=None, seed=0, openings=OPENINGS):
+    tasks = []
+    for gameNumber in range(games):
+        opening = openings[(gameNumber // 2) % len(openings)]
+        # A plays white in the even games and black in the odd ones, each opening once with either colour
+        configs = (configA, configB) if gameNumber % 2 == 0 else (configB, configA)
+        tasks.append((gameNumber, opening, configs, seed + gameNumber))
+
+    wins = draws = losses = 0
+    scores = []
+    totals = [{"nodes": 0, "seconds": 0.0, "moves": 0} for engine in range(2)]
+    with multiprocessing.Pool(workers) as pool:
+        for game in pool.imap_unordered(playGame, tasks):
+            aIsWhite = game["game"] % 2 == 0
+            score = game["result"] if aIsWhite else 1 - game["result"]
+            scores.append(score)
+            wins += score == 1
+            draws += score == 0.5
+            losses += score == 0
+            for engine, side in ((0, 0 if aIsWhite else 1), (1, 1 if aIsWhite else 0)):
+                for key in totals[engine]:
+                    totals[engine][key] += game["stats"][side][key]
+            print("Game " + str(game["game"] + 1) + " (" + game["opening"] + "): " + ("A" if score == 1 else "B" if score == 0 else "draw") +
+                " by " + game["reason"] + " after " + str(game["plies"]) + " plies")
+
+    elo, margin = eloEstimate(scores)
+    summary = {"games": games, "wins": wins, "draws": draws, "losses": losses, "elo": round(elo, 1), "eloMargin": round(margin, 1)}
+    for name, total in zip("ab", totals):
+        moves = total["moves"] or 1
+        summary[name + "NodesPerMove"] = int(total["nodes"] / moves)
+        summary[name + "SecondsPerMove"] = round(total["seconds"] / moves, 3)
+    return summary
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Play two moveFinder configurations against each other")
+    parser.add_argument("--a", default="", help="settings of engine A, e.g. DEPTH=3,USE_QUIESCENCE=False")
+    parser.add_argument("--b", default="", help="settings of engine B")
+    parser.add_argument("--games", type=int, default=16)
+    parser.add_argument("--workers", type=int, help="processes playing games at once (default: every core)")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(args)
+    summary = runMatch(parseConfig(options.a), parseConfig(options.b), options.games, options.workers, options.seed)
+
+    print("A (" + (options.a or "defaults") + ") vs B (" + (options.b or "defaults") + "): +" + str(summary["wins"]) +
+        " =" + str(summary["draws"]) + " -" + str(summary["losses"]) + ", Elo " + str(summary["elo"]) + " +/- " + str(summary["eloMargin"]))
+    for name in "ab":
+        print(name.upper() + ": " + str(summary[name + "NodesPerMove"]) + " nodes and " + str(summary[name + "SecondsPerMove"]) + "s per move")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
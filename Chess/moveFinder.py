@@ -1,80 +1,221 @@
+import os
 import random
-import ChessMain
+import time
+from ChessEngine import pieceScores, piecePositionScores
 
-counter = 0
-# Rank the pieces by point value TODO adjust weights
-pieceScores = {"K": 0, "Q": 10, "R": 5, "B": 3, "N": 3, "P": 1}
-knightScores = [
-    [1, 1, 1, 1, 1, 1, 1, 1],
-    [1, 2, 2, 2, 2, 2, 2, 1],
-    [1, 2, 3, 3, 3, 3, 2, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 2, 3, 3, 3, 3, 2, 1],
-    [1, 2, 2, 2, 2, 2, 2, 1],
-    [1, 1, 1, 1, 1, 1, 1, 1]
-    ]
-
-bishopScores = [
-    [4, 3, 2, 1, 1, 2, 3, 4],
-    [3, 4, 3, 2, 2, 3, 4, 3],
-    [2, 3, 4, 3, 3, 4, 3, 2],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [2, 3, 4, 3, 3, 4, 3, 2],
-    [3, 4, 3, 2, 2, 3, 4, 3],
-    [4, 3, 2, 1, 1, 2, 3, 4]
-    ]
-
-queenScores = [
-    [1, 1, 1, 3, 1, 1, 1, 1],
-    [1, 2, 3, 3, 3, 1, 1, 1],
-    [1, 4, 3, 3, 3, 4, 2, 1],
-    [1, 2, 3, 3, 3, 2, 2, 1],
-    [1, 2, 3, 3, 3, 2, 2, 1],
-    [1, 4, 3, 3, 3, 4, 2, 1],
-    [1, 1, 2, 3, 3, 1, 1, 1],
-    [1, 1, 1, 3, 1, 1, 1, 1]
-    ]
-
-rookScores = [
-    [4, 3, 4, 4, 4, 4, 3, 4],
-    [4, 4, 4, 4, 4, 4, 4, 4],
-    [1, 1, 2, 3, 3, 2, 1, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 1, 2, 2, 2, 2, 2, 1],
-    [4, 4, 4, 4, 4, 4, 4, 4],
-    [4, 3, 4, 4, 4, 4, 3, 4]
-    ]
-
-whitePawnScores = [
-    [8, 8, 8, 8, 8, 8, 8, 8],
-    [8, 8, 8, 8, 8, 8, 8, 8],
-    [5, 6, 6, 7, 7, 6, 6, 5],
-    [2, 3, 3, 5, 5, 3, 3, 2],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [1, 1, 2, 3, 3, 2, 1, 1],
-    [1, 1, 1, 0, 0, 1, 1, 1],
-    [0, 0, 0, 0, 0, 0, 0, 0]
-]
-
-blackPawnScores = [
-    [0, 0, 0, 0, 0, 0, 0, 0],
-    [1, 1, 1, 0, 0, 1, 1, 1],
-    [1, 1, 2, 3, 3, 2, 1, 1],
-    [1, 2, 3, 4, 4, 3, 2, 1],
-    [2, 3, 3, 5, 5, 3, 3, 2],
-    [5, 6, 6, 7, 7, 6, 6, 5],
-    [8, 8, 8, 8, 8, 8, 8, 8],
-    [8, 8, 8, 8, 8, 8, 8, 8]
-]
-
-piecePositionScores = {"N": knightScores, "Q": queenScores, "B": bishopScores, "R": rookScores, "bP": blackPawnScores, "wP": whitePawnScores}
+openingBook = None
+tablebase = None
+# Imported by loadSubsystems once a search has them switched on, so a plain import moveFinder
+# (every worker process does one) doesn't pay for them. cProfile and multiprocessing are imported where they are used
 
+counter = 0
 CHECKMATE = 1000
 STALEMATE = 0
 DEPTH = 3
+TIME_LIMIT = None
+# Seconds to search per move, None searches to DEPTH
+MAX_DEPTH = 64
+# Iterative deepening never goes deeper than this, even with time left
+CHECK_INTERVAL = 255
+# The time and node limits are checked every CHECK_INTERVAL + 1 nodes
+USE_MOVE_ORDERING = True
+# Sort moves by MVV-LVA, killer moves and history before searching them (switch off to compare node counts)
+USE_STAGED_MOVES = True
+# Generate moves inside the search in stages (pickMoves) instead of building the whole legal move list at every node
+USE_PVS = True
+# Principal variation search: moves after the first get a zero window search that only proves they are no better,
+# and are searched again with the full window when they are
+USE_NULL_MOVE = True
+# Null move pruning: pass the turn, and if a search NULL_MOVE_REDUCTION plies shallower still fails high, cut the node off.
+# Never in check or with only king and pawns left, where passing could be the best move (zugzwang)
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Closer to the leaves the null move search is a quiescence search on a position with the side that passed hanging pieces,
+# that costs more than it prunes
+USE_LMR = True
+# Late move reductions: quiet moves after the first LMR_FULL_DEPTH_MOVES are searched a ply shallower,
+# and again at full depth if they beat alpha. Only in nodes with at least LMR_MIN_DEPTH plies left
+LMR_FULL_DEPTH_MOVES = 3
+LMR_MIN_DEPTH = 3
+ZERO_WINDOW = 0.001
+# Width of the zero window, below any score difference the evaluation can make
+USE_QUIESCENCE = True
+# Keep searching captures and promotions past depth 0 instead of scoring in the middle of an exchange
+DELTA_MARGIN = 2
+# A capture is skipped in quiescence when even winning the captured piece plus this margin can't raise alpha
+CHECK_INCREMENTAL_EVAL = False
+# Debugging, rescan the whole board on every scoreBoard call and raise if it disagrees with the running totals
+WORKERS = 1
+# Processes used by findBestMove, more than 1 splits the root moves between them (None uses every core)
+VERBOSE = False
+# Print a node count summary after every search, off unless ChessMain or a tool asks for it since stdout may carry a protocol
+PROFILE_PATH = None
+# Run the next findBestMove under cProfile and dump the profile to this file (read it with pstats or snakeviz), then switch back off
+USE_BOOK = True
+# Play straight from the opening book while the position is in it
+BOOK_PATH = None
+# None for openingBook.DEFAULT_BOOK_PATH
+USE_TABLEBASES = True
+# Look up positions with few pieces left in the endgame tablebases (tablebase.py), at the root and inside the search
+TABLEBASE_WIN = 500
+# Score of a tablebase win less its distance to mate in plies, above any material score and below CHECKMATE
+
+# Bound types stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+TT_SIZE_BITS = 18
+
+'''
+Fixed size hash table of searched positions, indexed by the low bits of the Zobrist key.
+Each slot holds (key, depth, score, bound type, best move id, age). A new entry replaces the
+old one when it is the same position, the old one is from a previous search, or it was searched
+at least as deep
+'''
+class TranspositionTable():
+    def __init__(self, sizeBits=TT_SIZE_BITS):
+        self.mask = (1 << sizeBits) - 1
+        self.entries = [None] * (1 << sizeBits)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def newSearch(self):
+        # Entries from earlier searches become preferred for replacement
+        self.age += 1
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, bestMoveId):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old[0] == key or old[5] != self.age or depth >= old[1]:
+            self.entries[index] = (key, depth, score, bound, bestMoveId, self.age)
+
+    def bestMoveId(self, key):
+        # For walking the principal variation, not counted as a probe
+        entry = self.entries[key & self.mask]
+        return entry[4] if entry is not None and entry[0] == key else None
+
+    def hitRate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+transpositionTable = TranspositionTable()
+
+'''
+Counters for one search. Nodes are split into interior nodes (searched with depth left), leaf nodes (depth 0, or settled
+by a tablebase, draw or mate before any move was searched) and quiescence nodes. The first move cutoff rate, the share of beta
+cutoffs made by the first move searched, measures the move ordering. Time is split into move generation and evaluation,
+what is left of the total is the search itself
+'''
+class SearchStats():
+    def __init__(self):
+        self.nodes = 0
+        self.interiorNodes = 0
+        self.quiescenceNodes = 0
+        self.betaCutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.nullMoveCutoffs = 0
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.depthNodes = []
+        # Nodes searched by each finished iteration, depth 1 first
+        self.moveGenTime = 0.0
+        self.evalTime = 0.0
+        self.time = 0.0
+
+    @property
+    def leafNodes(self):
+        return self.nodes - self.interiorNodes - self.quiescenceNodes
+
+    def firstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.betaCutoffs if self.betaCutoffs else 0.0
+
+    def ttHitRate(self):
+        return self.ttHits / self.ttProbes if self.ttProbes else 0.0
+
+    '''
+    Nodes of each iteration over the nodes of the one before, from depth 2 on
+    '''
+    def branchingFactors(self):
+        return [later / earlier for earlier, later in zip(self.depthNodes, self.depthNodes[1:]) if earlier]
+
+    def nps(self):
+        return int(self.nodes / self.time) if self.time > 0 else 0
+
+    '''
+    Add the counters of a search of part of the tree, e.g. a root move searched in a pool worker.
+    The iterations and total time belong to the whole search and aren't added
+    '''
+    def merge(self, other):
+        for name in ("nodes", "interiorNodes", "quiescenceNodes", "betaCutoffs", "firstMoveCutoffs", "nullMoveCutoffs", "ttProbes", "ttHits",
+                "moveGenTime", "evalTime"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def asDict(self):
+        return {"nodes": self.nodes, "interiorNodes": self.interiorNodes, "leafNodes": self.leafNodes, "quiescenceNodes": self.quiescenceNodes,
+            "betaCutoffs": self.betaCutoffs, "firstMoveCutoffRate": round(self.firstMoveCutoffRate(), 3), "nullMoveCutoffs": self.nullMoveCutoffs,
+            "ttHitRate": round(self.ttHitRate(), 3), "branchingFactors": [round(factor, 2) for factor in self.branchingFactors()],
+            "moveGenTime": round(self.moveGenTime, 3), "evalTime": round(self.evalTime, 3), "time": round(self.time, 3), "nps": self.nps()}
+
+    def summary(self):
+        return (str(self.nodes) + " nodes (" + str(self.interiorNodes) + " interior, " + str(self.leafNodes) + " leaf, " +
+            str(self.quiescenceNodes) + " quiescence) in " + str(round(self.time, 3)) + "s, " + str(self.nps()) + " nps\n" +
+            str(self.betaCutoffs) + " beta cutoffs, " + str(round(self.firstMoveCutoffRate() * 100, 1)) + "% by the first move, " +
+            str(self.nullMoveCutoffs) + " null move cutoffs, transposition table hit rate " + str(round(self.ttHitRate() * 100, 1)) + "%\n" +
+            "branching factor per depth " + " ".join(str(round(factor, 2)) for factor in self.branchingFactors()) +
+            ", move generation " + str(round(self.moveGenTime, 3)) + "s, evaluation " + str(round(self.evalTime, 3)) + "s")
+
+'''
+The last message findBestMove puts on its returnQueue: the move to play (None if the search didn't get to one), its SearchStats,
+and whether the search was stopped before reaching its depth (by its stop event, time or node limit)
+'''
+class SearchResult():
+    def __init__(self, move, stats, stopped=False):
+        self.move = move
+        self.stats = stats
+        self.stopped = stopped
+
+searchStats = SearchStats()
+# Stats of the search running in this process
+
+stopSearch = False
+# Set once the time or node limit runs out or the stop event is set, the search then unwinds
+searchDeadline = None
+searchNodeLimit = None
+searchStopEvent = None
+# multiprocessing.Event another thread or process sets to stop the search, checked with the limits
+searchMaxDepth = MAX_DEPTH
+searchDepth = 0
+# Depth limit of the running search and the deepest iteration it finished, limitSearch can lower the first
+principalVariation = [[] for ply in range(MAX_DEPTH + 1)]
+# principalVariation[ply] is the best line found from that ply in the current iteration
+previousPv = []
+followPv = False
+# True while the search is still walking down the previous iteration's principal variation
+
+# Move ordering, most promising moves first so alpha-beta cuts off sooner
+mvvLvaValues = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9, "K": 20}
+# Piece values for ordering captures, most valuable victim first and then least valuable attacker
+FIRST_MOVE_ORDER = 1000000
+CAPTURE_ORDER = 100000
+KILLER_ORDER = 90000
+# Captures and promotions come before the killer moves, quiet moves are ordered by their history score below that
+killerMoves = [[None, None] for ply in range(MAX_DEPTH + 1)]
+# Ids of the last two quiet moves that caused a beta cutoff at each ply
+historyTable = {piece: [0] * 64 for piece in ("wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")}
+# How often (weighted by depth) a quiet move of this piece to this square caused a cutoff
 
 '''
 Look at all possible moves and choose a random one-- LEVEL 1
@@ -129,19 +270,376 @@ def findBestMoveMinMaxNoRecursion(gs, validMoves):
     return bestPlayerMove
 
 '''
-Helper method to call inital alpha beta function
+Helper method to call inital alpha beta function.
+Iterative deepening: searches depth 1, 2, 3... until maxDepth, or until timeLimit seconds or nodeLimit nodes run out
+or stopEvent (a multiprocessing.Event) is set, then returns the best move found: the one of the last finished iteration,
+or a root move of the unfinished one that already beat it. With no limits it searches to DEPTH.
+Every finished iteration puts a progress dict (depth, score, pv, nodes, time) on the returnQueue,
+and the search ends with a SearchResult
 '''
-def findBestMove(gs, validMoves, returnQueue):
-    global nextMove, counter
-    nextMove = None
+def findBestMove(gs, validMoves, returnQueue, timeLimit=None, nodeLimit=None, maxDepth=None, stopEvent=None):
+    global nextMove, counter, stopSearch, searchDeadline, searchNodeLimit, searchStopEvent, searchMaxDepth, searchDepth
+    global previousPv, followPv, searchStats, PROFILE_PATH
+    if PROFILE_PATH is not None:
+        path = PROFILE_PATH
+        PROFILE_PATH = None
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(findBestMove, gs, validMoves, returnQueue, timeLimit, nodeLimit, maxDepth, stopEvent)
+        profiler.dump_stats(path)
+        return
+    searchStats = SearchStats()
+    loadSubsystems()
+    if USE_BOOK:
+        bookMove = openingBook.probeBook(gs, validMoves, BOOK_PATH or openingBook.DEFAULT_BOOK_PATH)
+        if bookMove is not None:
+            counter = 0
+            nextMove = bookMove
+            returnQueue.put(SearchResult(nextMove, searchStats))
+            return
+    if USE_TABLEBASES:
+        tablebaseMove = tablebase.bestMove(gs, validMoves)
+        if tablebaseMove is not None:
+            # The result is already known, play the quickest win or the slowest loss
+            counter = 0
+            nextMove = tablebaseMove
+            returnQueue.put(SearchResult(nextMove, searchStats))
+            return
+    if WORKERS != 1:
+        return findBestMoveParallel(gs, validMoves, returnQueue, timeLimit, nodeLimit, maxDepth, WORKERS, stopEvent)
+    if timeLimit is None:
+        timeLimit = TIME_LIMIT
+    if maxDepth is None:
+        maxDepth = DEPTH if timeLimit is None and nodeLimit is None else MAX_DEPTH
+    turnMultiplier = 1 if gs.whiteToMove else -1
     random.shuffle(validMoves)
     counter = 0
-    findMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
-    print(str(counter) + " Moves evaluated")
+    transpositionTable.newSearch()
+    resetMoveOrdering()
+    startTime = time.perf_counter()
+    searchDeadline = startTime + timeLimit if timeLimit is not None else None
+    searchNodeLimit = nodeLimit
+    searchStopEvent = stopEvent
+    stopSearch = stopEvent is not None and stopEvent.is_set()
+    # A stop that came in before the search started still counts
+    searchMaxDepth = min(maxDepth, MAX_DEPTH)
+    searchDepth = 0
+    previousPv = []
+    bestMove = None
+
+    while searchDepth < searchMaxDepth:
+        depth = searchDepth + 1
+        nextMove = None
+        followPv = True
+        iterationStart = counter
+        score = findMoveNegaMaxAlphaBeta(gs, validMoves, depth, -CHECKMATE, CHECKMATE, turnMultiplier)
+        if stopSearch:
+            # Stopped part way, the previous best move is searched first, so a root move that finished
+            # with a better score before the stop is the better move
+            if nextMove is not None:
+                bestMove = nextMove
+            break
+        searchStats.depthNodes.append(counter - iterationStart)
+        searchDepth = depth
+        if nextMove is not None:
+            bestMove = nextMove
+        previousPv = principalVariation[0][:]
+        returnQueue.put({"depth": depth, "score": score, "pv": pvNotation(gs, previousPv, depth),
+            "nodes": counter, "time": round(time.perf_counter() - startTime, 3)})
+        if abs(score) >= CHECKMATE:
+            # Forced mate either way, searching deeper won't change anything
+            break
+
+    nextMove = bestMove
+    searchStats.nodes = counter
+    searchStats.ttProbes = transpositionTable.probes
+    searchStats.ttHits = transpositionTable.hits
+    searchStats.time = time.perf_counter() - startTime
+    if VERBOSE:
+        print(searchStats.summary())
 
 
     #findMoveMinMax(gs, validMoves, DEPTH, gs.whiteToMove)
-    returnQueue.put(nextMove, counter)
+    returnQueue.put(SearchResult(nextMove, searchStats, stopSearch and searchDepth < searchMaxDepth))
+
+'''
+Root parallel version of findBestMove, each root move is searched as a task in a pool of worker processes.
+Every iteration searches the first (previous best) move on its own to get a bound, then hands out the rest at once.
+The best root score so far is shared through sharedAlpha, so tasks starting later search with a narrower window
+and still get pruned. Reports progress and the move on the returnQueue the same way as findBestMove.
+The node limit is approximate, tasks already running when it runs out finish their own share.
+stopEvent has to be a multiprocessing.Event, since the pool workers check it too
+'''
+def findBestMoveParallel(gs, validMoves, returnQueue, timeLimit=None, nodeLimit=None, maxDepth=None, workers=None, stopEvent=None):
+    global nextMove, counter, searchStats
+    import multiprocessing
+    if timeLimit is None:
+        timeLimit = TIME_LIMIT
+    if maxDepth is None:
+        maxDepth = DEPTH if timeLimit is None and nodeLimit is None else MAX_DEPTH
+    if workers is None:
+        workers = os.cpu_count() or 1
+    random.shuffle(validMoves)
+    resetMoveOrdering()
+    orderMoves(validMoves, 0, None)
+    # Captures first, so the first task gives a useful bound
+    movesById = {move.moveId: move for move in validMoves}
+    rootOrder = list(movesById)
+    startTime = time.perf_counter()
+    deadline = time.time() + timeLimit if timeLimit is not None else None
+    # Wall clock, so the worker processes can compare against it
+    counter = 0
+    searchStats = SearchStats()
+    bestMove = None
+    stopped = False
+    sharedAlpha = multiprocessing.Value("d", -CHECKMATE)
+
+    with multiprocessing.Pool(workers, initializer=initSearchWorker, initargs=(gs, sharedAlpha, stopEvent)) as pool:
+        for depth in range(1, min(maxDepth, MAX_DEPTH) + 1):
+            sharedAlpha.value = -CHECKMATE
+            tasks = [(moveId, depth, deadline, None if nodeLimit is None else nodeLimit - counter) for moveId in rootOrder]
+            results = [pool.apply(searchRootMove, (tasks[0],))]
+            if not results[0]["stopped"]:
+                results += pool.imap_unordered(searchRootMove, tasks[1:])
+            iterationNodes = sum(result["stats"].nodes for result in results)
+            counter += iterationNodes
+            for result in results:
+                searchStats.merge(result["stats"])
+            if any(result["stopped"] for result in results) or (nodeLimit is not None and counter >= nodeLimit and depth > 1):
+                # Out of time or nodes, keep the result of the last finished iteration
+                stopped = True
+                break
+
+            searchStats.depthNodes.append(iterationNodes)
+            results.sort(key=lambda result: (result["score"], result["exact"]), reverse=True)
+            # A score that didn't beat the shared alpha is only an upper bound, so exact scores win ties
+            best = results[0]
+            bestMove = movesById[best["moveId"]]
+            rootOrder = [result["moveId"] for result in results]
+            returnQueue.put({"depth": depth, "score": best["score"], "pv": best["pv"], "nodes": counter,
+                "time": round(time.perf_counter() - startTime, 3)})
+            if abs(best["score"]) >= CHECKMATE:
+                break
+
+    nextMove = bestMove
+    searchStats.time = time.perf_counter() - startTime
+    if VERBOSE:
+        print(searchStats.summary() + "\nwith " + str(workers) + " workers")
+    returnQueue.put(SearchResult(nextMove, searchStats, stopped))
+
+workerGameState = None
+workerSharedAlpha = None
+# Set in each pool process by initSearchWorker
+
+'''
+Pool initializer, every worker keeps its own copy of the root position, transposition table and move ordering tables
+'''
+def initSearchWorker(gs, sharedAlpha, stopEvent=None):
+    global workerGameState, workerSharedAlpha, searchStopEvent
+    workerGameState = gs
+    workerSharedAlpha = sharedAlpha
+    searchStopEvent = stopEvent
+    loadSubsystems()
+    transpositionTable.newSearch()
+    resetMoveOrdering()
+
+'''
+Search one root move in a pool worker with the window narrowed by the best score any worker has found so far.
+task is (move id, depth, wall clock deadline or None, node limit or None)
+'''
+def searchRootMove(task):
+    global counter, stopSearch, searchDeadline, searchNodeLimit, followPv, searchStats
+    moveId, depth, deadline, nodeLimit = task
+    gs = workerGameState
+    move = next(move for move in gs.get_valid_moves() if move.moveId == moveId)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    counter = 0
+    searchStats = SearchStats()
+    probes, hits = transpositionTable.probes, transpositionTable.hits
+    stopSearch = False
+    searchDeadline = time.perf_counter() + (deadline - time.time()) if deadline is not None else None
+    searchNodeLimit = nodeLimit
+    followPv = False
+    alpha = workerSharedAlpha.value
+
+    gs.make_move(move)
+    score = -findMoveNegaMaxAlphaBeta(gs, None, depth - 1, -CHECKMATE, -alpha, -turnMultiplier, 1)
+    gs.undo_move()
+    if not stopSearch and score > alpha:
+        with workerSharedAlpha.get_lock():
+            if score > workerSharedAlpha.value:
+                workerSharedAlpha.value = score
+    searchStats.nodes = counter
+    searchStats.ttProbes = transpositionTable.probes - probes
+    searchStats.ttHits = transpositionTable.hits - hits
+    return {"moveId": moveId, "score": score, "exact": score > alpha, "stats": searchStats, "stopped": stopSearch,
+        "pv": [move.getUciNotation()] + [reply.getUciNotation() for reply in principalVariation[1]]}
+
+'''
+Sort the moves in place: the principal variation / transposition table move, then captures and promotions by MVV-LVA,
+then the killer moves for this ply, then the remaining quiet moves by their history score
+'''
+def orderMoves(validMoves, ply, firstMoveId):
+    killers = killerMoves[ply]
+
+    def orderScore(move):
+        if move.moveId == firstMoveId:
+            return FIRST_MOVE_ORDER
+        if move.isCapture or move.isPawnPromotion:
+            return CAPTURE_ORDER + mvvLvaScore(move)
+        if move.moveId == killers[0] or move.moveId == killers[1]:
+            return KILLER_ORDER
+        return historyTable[move.pieceMoved][move.packed >> 6 & 63]
+
+    validMoves.sort(key=orderScore, reverse=True)
+
+'''
+Staged move picker for the search, yields the same moves in the same order as orderMoves without building them all up front:
+the transposition table move, then captures and promotions by MVV-LVA, then the killer moves and the rest of the quiet moves
+by history score. The full move list is only generated once the captures are used up (or for a quiet table move), so a node
+that cuts off on a capture never builds its quiet moves. The generators already leave out moves that break a pin or leave
+the king in check, so every move yielded is legal. When in check the capture list holds every evasion and nothing else is generated
+'''
+def pickMoves(gs, ply, firstMoveId):
+    captures = generateMoves(gs, True)
+    if gs.in_check:
+        orderMoves(captures, ply, firstMoveId)
+        yield from captures
+        return
+
+    searched = set()
+    allMoves = None
+    if firstMoveId is not None:
+        firstMove = next((move for move in captures if move.moveId == firstMoveId), None)
+        if firstMove is None:
+            # A quiet table move, only the full move list can tell whether it is legal here (it may be a hash collision)
+            allMoves = generateMoves(gs)
+            firstMove = next((move for move in allMoves if move.moveId == firstMoveId), None)
+        if firstMove is not None:
+            searched.add(firstMoveId)
+            yield firstMove
+
+    captures.sort(key=mvvLvaScore, reverse=True)
+    for move in captures:
+        if move.moveId not in searched:
+            searched.add(move.moveId)
+            yield move
+
+    if allMoves is None:
+        allMoves = generateMoves(gs)
+    killers = killerMoves[ply]
+    quietMoves = [move for move in allMoves if move.moveId not in searched]
+    quietMoves.sort(key=lambda move: KILLER_ORDER if move.moveId in killers else historyTable[move.pieceMoved][move.packed >> 6 & 63], reverse=True)
+    yield from quietMoves
+
+'''
+Move generation and evaluation as the search calls them, timed into searchStats
+'''
+def generateMoves(gs, capturesOnly=False):
+    start = time.perf_counter()
+    moves = gs.get_capture_moves() if capturesOnly else gs.get_valid_moves()
+    searchStats.moveGenTime += time.perf_counter() - start
+    return moves
+
+def evaluate(gs, turnMultiplier):
+    start = time.perf_counter()
+    score = turnMultiplier * scoreBoard(gs)
+    searchStats.evalTime += time.perf_counter() - start
+    return score
+
+'''
+Most valuable victim first, then least valuable attacker, promotions count as winning a queen
+'''
+def mvvLvaScore(move):
+    score = 0
+    if move.isCapture:
+        score += 10 * mvvLvaValues[move.pieceCaptured[1]] - mvvLvaValues[move.pieceMoved[1]]
+    if move.isPawnPromotion:
+        score += 10 * mvvLvaValues["Q"]
+    return score
+
+'''
+Remember a quiet move that caused a beta cutoff, as a killer for this ply and in the history table
+'''
+def storeCutoffMove(move, ply, depth):
+    if move.isCapture or move.isPawnPromotion:
+        return
+    killers = killerMoves[ply]
+    if killers[0] != move.moveId:
+        killers[1] = killers[0]
+        killers[0] = move.moveId
+    historyTable[move.pieceMoved][move.packed >> 6 & 63] += depth * depth
+
+'''
+Forget the killer moves and age the history scores before a new search
+'''
+def resetMoveOrdering():
+    for killers in killerMoves:
+        killers[0] = None
+        killers[1] = None
+    for scores in historyTable.values():
+        for sq in range(64):
+            scores[sq] //= 2
+
+'''
+Stop the search once the deadline has passed or the node limit is reached
+'''
+def checkSearchLimits():
+    global stopSearch
+    if searchStopEvent is not None and searchStopEvent.is_set():
+        stopSearch = True
+    elif searchDeadline is not None and time.perf_counter() >= searchDeadline:
+        stopSearch = True
+    elif searchNodeLimit is not None and counter >= searchNodeLimit:
+        stopSearch = True
+
+'''
+Import the opening book and tablebase modules the first time a search runs with them switched on
+'''
+def loadSubsystems():
+    global openingBook, tablebase
+    if USE_BOOK and openingBook is None:
+        import openingBook
+    if USE_TABLEBASES and tablebase is None:
+        import tablebase
+
+'''
+The principal variation in UCI notation. A transposition table cutoff cuts the line short, so it is filled up to depth moves
+with the table's best moves, which also gives a reply to ponder on
+'''
+def pvNotation(gs, pv, depth):
+    line = [move.getUciNotation() for move in pv]
+    for move in pv:
+        gs.make_move(move)
+    played = len(pv)
+    while played < depth:
+        moveId = transpositionTable.bestMoveId(gs.zobristKey)
+        move = next((move for move in gs.get_valid_moves() if move.moveId == moveId), None)
+        if move is None:
+            break
+        line.append(move.getUciNotation())
+        gs.make_move(move)
+        played += 1
+    for i in range(played):
+        gs.undo_move()
+    return line
+
+'''
+Give the search running in this process new limits, counted from now and with the same defaults as findBestMove.
+Used on a ponder hit: the search started without limits on the expected reply goes on as the real search instead of
+starting over. One that already finished maxDepth stops straight away. The root parallel search doesn't take new limits
+'''
+def limitSearch(timeLimit=None, nodeLimit=None, maxDepth=None):
+    global stopSearch, searchDeadline, searchNodeLimit, searchMaxDepth
+    if timeLimit is None:
+        timeLimit = TIME_LIMIT
+    if maxDepth is None:
+        maxDepth = DEPTH if timeLimit is None and nodeLimit is None else MAX_DEPTH
+    searchDeadline = time.perf_counter() + timeLimit if timeLimit is not None else None
+    searchNodeLimit = counter + nodeLimit if nodeLimit is not None else None
+    searchMaxDepth = min(maxDepth, MAX_DEPTH)
+    if searchDepth >= searchMaxDepth:
+        stopSearch = True
 
 '''
 MinMax AI algorithm setting the recursive depth based on how good the ai will be,
@@ -202,38 +700,215 @@ def findMoveNegaMax(gs, validMoves, depth, turnMultiplier):
     return maxScore
 
 '''
-AlphaBeta nega max AI with pruning for optomization (Variable depth set)
+AlphaBeta nega max AI with pruning for optomization (Variable depth set).
+validMoves is the legal move list of the position, or None to let pickMoves generate the moves as they are needed.
+On top of it the selective search switches USE_PVS, USE_NULL_MOVE and USE_LMR, allowNullMove is False straight after a null move
 '''
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier):
+def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, ply=0, allowNullMove=True):
     # 1 for white's turn, -1 for black
     # Alpha upper-bound, beta lower-bound
-    global nextMove, counter
+    global nextMove, counter, followPv
     counter += 1
+    if counter & CHECK_INTERVAL == 0:
+        checkSearchLimits()
+    if stopSearch:
+        return 0
+    principalVariation[ply] = []
+    if USE_TABLEBASES and ply > 0:
+        if tablebase is None:
+            loadSubsystems()
+            # Called without findBestMove, e.g. straight from a test or a tool
+        if gs.pieceCount <= tablebase.maxPieces():
+            result = tablebase.probe(gs)
+            if result is not None:
+                return tablebaseScore(result)
+    stagedMoves = validMoves is None and USE_STAGED_MOVES and USE_MOVE_ORDERING
+    if validMoves is None and not stagedMoves:
+        validMoves = generateMoves(gs)
+    if ply > 0 and (gs.repetitionCount() or isFiftyMoveDraw(gs)):
+        # Already one repetition inside the search is a draw, going round again can't change that
+        return STALEMATE
+    if validMoves is not None and not validMoves:
+        return -CHECKMATE if gs.checkMate else STALEMATE
     if depth == 0:
-        return turnMultiplier * scoreBoard(gs)
-    
-    # move ordering - implement later
+        if USE_QUIESCENCE:
+            return quiescenceSearch(gs, alpha, beta, turnMultiplier, True)
+        return evaluate(gs, turnMultiplier)
+
+    searchStats.interiorNodes += 1
+    alphaOriginal = alpha
+    key = gs.zobristKey
+    ttMoveId = None
+    entry = transpositionTable.probe(key)
+    if entry is not None:
+        ttMoveId = entry[4]
+        if ply != 0 and entry[1] >= depth:
+            # Position already searched at least this deep, the root always searches to pick nextMove
+            ttScore = entry[2]
+            if entry[3] == EXACT:
+                return ttScore
+            elif entry[3] == LOWER_BOUND:
+                alpha = max(alpha, ttScore)
+            else:
+                beta = min(beta, ttScore)
+            if alpha >= beta:
+                return ttScore
+
+    # move ordering - the previous iteration's principal variation first, otherwise the best move stored for this position
+    firstMoveId = ttMoveId
+    if followPv:
+        if ply < len(previousPv):
+            firstMoveId = previousPv[ply].moveId
+        else:
+            followPv = False
+
+    inCheck = (USE_NULL_MOVE or USE_LMR) and gs.inCheck()
+    if (USE_NULL_MOVE and allowNullMove and ply > 0 and not followPv and depth >= NULL_MOVE_MIN_DEPTH and not inCheck and beta < TABLEBASE_WIN and
+            evaluate(gs, turnMultiplier) >= beta and gs.hasNonPawnMaterial()):
+        gs.make_null_move()
+        score = -findMoveNegaMaxAlphaBeta(gs, None, max(depth - 1 - NULL_MOVE_REDUCTION, 0), -beta, -beta + ZERO_WINDOW,
+            -turnMultiplier, ply + 1, False)
+        gs.undo_null_move()
+        if stopSearch:
+            return 0
+        if score >= beta:
+            # Even passing keeps the score above beta, a real move will too. Only the bound is returned,
+            # a mate or tablebase win after passing doesn't prove anything
+            searchStats.nullMoveCutoffs += 1
+            return beta
+    if stagedMoves:
+        validMoves = pickMoves(gs, ply, firstMoveId)
+    elif USE_MOVE_ORDERING:
+        orderMoves(validMoves, ply, firstMoveId)
+    elif firstMoveId is not None:
+        for i in range(len(validMoves)):
+            if validMoves[i].moveId == firstMoveId:
+                validMoves.insert(0, validMoves.pop(i))
+                break
     
     maxScore = -CHECKMATE
+    bestMoveId = None
+    movesSearched = 0
+    killers = killerMoves[ply]
     for move in validMoves:
+        movesSearched += 1
         gs.make_move(move)
-        nextMoves = gs.get_valid_moves()
-        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth-1, -beta, -alpha, -turnMultiplier)
+        reduction = 0
+        if (USE_LMR and movesSearched > LMR_FULL_DEPTH_MOVES and depth >= LMR_MIN_DEPTH and not inCheck and
+                not move.isCapture and not move.isPawnPromotion and move.moveId not in killers and not gs.inCheck()):
+            reduction = 1
+        if movesSearched > 1 and (USE_PVS or reduction):
+            childBeta = alpha + ZERO_WINDOW if USE_PVS else beta
+            score = -findMoveNegaMaxAlphaBeta(gs, None, depth - 1 - reduction, -childBeta, -alpha, -turnMultiplier, ply + 1)
+            if score > alpha and (reduction or score < beta) and not stopSearch:
+                # Better than expected, find out by how much at full depth with the full window
+                score = -findMoveNegaMaxAlphaBeta(gs, None, depth-1, -beta, -alpha, -turnMultiplier, ply + 1)
+        else:
+            score = -findMoveNegaMaxAlphaBeta(gs, None, depth-1, -beta, -alpha, -turnMultiplier, ply + 1)
+        gs.undo_move()
+        followPv = False
+        # Only the first move searched can continue the previous principal variation
+        if stopSearch:
+            return 0
+
         if score > maxScore:
             maxScore = score
-            if depth == DEPTH:
+            bestMoveId = move.moveId
+            principalVariation[ply] = [move] + principalVariation[ply + 1]
+            if ply == 0:
                 nextMove = move
 
-        gs.undo_move()
         if maxScore > alpha:
             # Pruning
             alpha = maxScore
         
         if alpha >= beta:
+            storeCutoffMove(move, ply, depth)
+            searchStats.betaCutoffs += 1
+            if movesSearched == 1:
+                searchStats.firstMoveCutoffs += 1
             break
+
+    if movesSearched == 0:
+        # The picker ran out without a single legal move
+        return -CHECKMATE if gs.inCheck() else STALEMATE
+    if maxScore <= alphaOriginal:
+        bound = UPPER_BOUND
+    elif maxScore >= beta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    transpositionTable.store(key, depth, maxScore, bound, bestMoveId)
     
     return maxScore
 
+'''
+Whether the fifty move rule has drawn the position, without relying on the draw flag of a get_valid_moves call
+the staged search may not have made. A mate on the hundredth ply still counts
+'''
+def isFiftyMoveDraw(gs):
+    return gs.halfmoveClock >= 100 and not (gs.inCheck() and not gs.get_valid_moves())
+
+'''
+Search score for the side to move of a tablebase value
+'''
+def tablebaseScore(value):
+    if tablebase.isWin(value):
+        return TABLEBASE_WIN - value
+    if tablebase.isLoss(value):
+        return -TABLEBASE_WIN + tablebase.distanceToMate(value)
+    return STALEMATE
+
+'''
+Quiescence search: at the end of the main search keep playing captures and promotions until the position is quiet,
+so exchanges aren't scored half way through. The side to move can always stand pat on the static score instead of capturing,
+except when in check, where every evasion is searched. Standing pat also skips the stalemate check, building the full move list
+in every quiet node would cost more than the captures first generation saves, a stalemate is found once the main search gets there.
+horizon is True for the call at depth 0 of the main search, that node was already counted there as a leaf
+'''
+def quiescenceSearch(gs, alpha, beta, turnMultiplier, horizon=False):
+    global counter
+    if not horizon:
+        counter += 1
+        searchStats.quiescenceNodes += 1
+        if counter & CHECK_INTERVAL == 0:
+            checkSearchLimits()
+        if stopSearch:
+            return 0
+
+    standPat = evaluate(gs, turnMultiplier)
+    moves = generateMoves(gs, True)
+    inCheck = gs.in_check
+    if inCheck:
+        if len(moves) == 0:
+            return -CHECKMATE
+        bestScore = -CHECKMATE
+    else:
+        if standPat >= beta:
+            return standPat
+        if standPat > alpha:
+            alpha = standPat
+        bestScore = standPat
+
+    moves.sort(key=mvvLvaScore, reverse=True)
+    for move in moves:
+        if not inCheck and not move.isPawnPromotion and standPat + pieceScores[move.pieceCaptured[1]] + DELTA_MARGIN <= alpha:
+            # Delta pruning, this capture can't bring the score back up to alpha
+            continue
+        gs.make_move(move)
+        score = -quiescenceSearch(gs, -beta, -alpha, -turnMultiplier)
+        gs.undo_move()
+        if stopSearch:
+            return 0
+
+        if score > bestScore:
+            bestScore = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return bestScore
+
 def scoreBoard(gs):
     # + - good for white and black respectively
     if gs.checkMate:
@@ -246,10 +921,23 @@ def scoreBoard(gs):
     elif gs.staleMate:
         return STALEMATE
 
+    # Material and piece square totals are kept up to date by make_move and undo_move
+    score = gs.material[0] - gs.material[1] + (gs.positionScore[0] - gs.positionScore[1]) * .1
+    if CHECK_INCREMENTAL_EVAL:
+        fullScore = scanBoard(gs.board)
+        if abs(score - fullScore) > 1e-9:
+            raise AssertionError("Incremental score " + str(score) + " doesn't match board scan " + str(fullScore) +
+                " after " + " ".join(move.getChessNotation() for move in gs.moveLog))
+    return score
+
+'''
+Score the board by scanning every square, scoreBoard uses the running totals instead and only calls this to check them
+'''
+def scanBoard(board):
     score = 0
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[row])):
-            square = gs.board[row][col]
+    for row in range(len(board)):
+        for col in range(len(board[row])):
+            square = board[row][col]
             if square != "--":
                 # Score positionally
                 piecePositionScore = 0
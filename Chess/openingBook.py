@@ -0,0 +1,86 @@
+'''
+Opening book: a sorted binary file of (Zobrist key, move id, weight) entries, memory mapped and binary searched,
+so probing it reads a few pages of the file instead of loading the whole book at startup.
+Entries of the same position are next to each other with the highest weight first. Build one with buildBook.py
+'''
+import mmap
+import os
+import random
+import struct
+
+ENTRY = struct.Struct(">QHH")
+# Big endian key, move id (start square | end square << 6) and weight, 12 bytes per entry
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+MAX_WEIGHT = 0xFFFF
+
+class OpeningBook():
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.entries = size // ENTRY.size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.entries else None
+        # mmap can't map an empty file
+
+    def __len__(self):
+        return self.entries
+
+    '''
+    All (move id, weight) entries for a position, highest weight first
+    '''
+    def lookup(self, key):
+        low, high = 0, self.entries
+        while low < high:
+            # First entry with an entry key >= key
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.map, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.entries:
+            entryKey, moveId, weight = ENTRY.unpack_from(self.map, low * ENTRY.size)
+            if entryKey != key:
+                break
+            moves.append((moveId, weight))
+            low += 1
+        return moves
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+openBooks = {}
+# Books opened so far by path, None for a path with no book file
+
+'''
+Pick a book move for the position, at random in proportion to the entry weights.
+Returns None when there is no book or the position isn't in it
+'''
+def probeBook(gs, validMoves, path=DEFAULT_BOOK_PATH):
+    if path not in openBooks:
+        openBooks[path] = OpeningBook(path) if os.path.exists(path) else None
+    book = openBooks[path]
+    if book is None:
+        return None
+    movesById = {move.moveId: move for move in validMoves}
+    candidates = [(movesById[moveId], weight) for moveId, weight in book.lookup(gs.zobristKey) if moveId in movesById]
+    # A move missing from validMoves means a hash collision with another position
+    if not candidates:
+        return None
+    return random.choices([move for move, weight in candidates], weights=[weight for move, weight in candidates])[0]
+
+'''
+Write a book file from {(key, move id): weight}, dropping entries with a weight of zero
+'''
+def writeBook(weights, path):
+    entries = sorted(((key, moveId, min(weight, MAX_WEIGHT)) for (key, moveId), weight in weights.items() if weight > 0),
+        key=lambda entry: (entry[0], -entry[2], entry[1]))
+    book = openBooks.pop(path, None)
+    if book is not None:
+        # Windows won't replace a file that is still mapped
+        book.close()
+    with open(path, "wb") as file:
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    return len(entries)
@@ -0,0 +1,224 @@
+'''
+Perft (performance test) counts the leaf nodes of the legal move tree to a fixed depth.
+Used to check move generation against known node counts, to compare the board backends
+and to benchmark nodes per second against a saved JSON baseline
+
+Usage:
+    python perft.py --suite                           check every reference position
+    python perft.py --fen "<fen>" --depth 3 --divide  node count per root move
+    python perft.py --bench --save baseline.json      record a benchmark baseline
+    python perft.py --bench --compare baseline.json   fail if a count changed or nodes/s dropped
+'''
+import argparse
+import json
+import sys
+import time
+import ChessEngine
+import bitboardEngine
+
+BACKENDS = {"list": ChessEngine.GameState, "bitboards": bitboardEngine.BitboardGameState}
+
+'''
+Standard perft positions with their node counts per depth (counts[0] is depth 1).
+The engine only promotes to a queen, so positions with promotions inside the counted depth
+have lower counts than the published ones (noted in brackets), those were cross checked between both backends
+'''
+REFERENCE_POSITIONS = [
+    {"name": "start", "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "counts": [20, 400, 8902, 197281], "benchDepth": 4},
+    {"name": "kiwipete", "fen": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "counts": [48, 2039, 97862], "benchDepth": 3},
+    # Castling both ways, en passant and lots of pins
+    {"name": "position 3", "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "counts": [14, 191, 2812, 43238], "benchDepth": 4},
+    # En passant that would expose the king along its row
+    {"name": "position 4", "fen": "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "counts": [6, 228, 8087], "benchDepth": 3},
+    # Promotions with capture while in check (published 6, 264, 9467)
+    {"name": "position 5", "fen": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        "counts": [41, 1373, 54007], "benchDepth": 3},
+    # Promotion by capture on the first move (published 44, 1486, 62379)
+    {"name": "position 6", "fen": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        "counts": [46, 2079, 89890], "benchDepth": 3},
+    {"name": "promotions", "fen": "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+        "counts": [15, 210, 3253], "benchDepth": 3},
+    # Promotion races for both sides (published 24, 496, 9483)
+    {"name": "castle through pawn attack", "fen": "r3k2r/1P6/8/8/8/8/8/R3K2R b KQkq - 0 1",
+        "counts": [25, 582, 13159], "benchDepth": 3},
+    # c8 is attacked by the b7 pawn, so black can't castle queenside
+    {"name": "en passant evades check", "fen": "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1",
+        "counts": [9, 50, 379, 2369], "benchDepth": 5},
+    # The checking pawn can be taken en passant
+    {"name": "en passant gives check", "fen": "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        "counts": [15, 126, 1928, 13931], "benchDepth": 5},
+    {"name": "pinned pawn", "fen": "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+        "counts": [18, 92, 1670, 10138], "benchDepth": 5},
+    # d7-d5 can't be taken en passant by the c5 pawn pinned on the 5th rank
+]
+
+'''
+Number of leaf nodes depth plies below the current position
+'''
+def perft(gs, depth):
+    moves = gs.get_valid_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.make_move(move)
+        nodes += perft(gs, depth - 1)
+        gs.undo_move()
+    return nodes
+
+'''
+Perft split by root move, {"e2e4": nodes, ...}, for finding which move a wrong count comes from
+'''
+def divide(gs, depth):
+    counts = {}
+    for move in gs.get_valid_moves():
+        gs.make_move(move)
+        counts[move.getChessNotation()] = perft(gs, depth - 1)
+        gs.undo_move()
+    return counts
+
+'''
+Time a perft run, returns the node count, seconds taken and nodes per second
+'''
+def timedPerft(gs, depth):
+    startTime = time.perf_counter()
+    nodes = perft(gs, depth)
+    elapsed = time.perf_counter() - startTime
+    return {"nodes": nodes, "seconds": round(elapsed, 4), "nps": int(nodes / elapsed) if elapsed > 0 else 0}
+
+'''
+Walk the move trees of two game states in lockstep and return the first line where
+their move lists differ, or None if they generate the same moves everywhere
+'''
+def compareBackends(gs, otherGs, depth, line=()):
+    moves = {move.getChessNotation(): move for move in gs.get_valid_moves()}
+    otherMoves = {move.getChessNotation(): move for move in otherGs.get_valid_moves()}
+    if moves.keys() != otherMoves.keys():
+        return line, sorted(moves.keys() - otherMoves.keys()), sorted(otherMoves.keys() - moves.keys())
+    if depth <= 1:
+        return None
+    for notation in moves:
+        gs.make_move(moves[notation])
+        otherGs.make_move(otherMoves[notation])
+        difference = compareBackends(gs, otherGs, depth - 1, line + (notation,))
+        gs.undo_move()
+        otherGs.undo_move()
+        if difference is not None:
+            return difference
+    return None
+
+'''
+Check every reference position up to maxDepth, returns a list of failure messages
+'''
+def checkReferencePositions(backend, maxDepth=None):
+    failures = []
+    for position in REFERENCE_POSITIONS:
+        for depth, expected in enumerate(position["counts"], 1):
+            if maxDepth is not None and depth > maxDepth:
+                break
+            nodes = perft(backend(position["fen"]), depth)
+            if nodes != expected:
+                failures.append(position["name"] + " depth " + str(depth) + ": expected " + str(expected) + ", got " + str(nodes))
+    return failures
+
+'''
+Time every reference position at its benchmark depth, keeping the fastest of repeat runs to cut down on noise.
+Returns {backend: {position: {"depth", "nodes", "seconds", "nps"}}}
+'''
+def benchmark(backendNames, repeat=3):
+    results = {}
+    for backendName in backendNames:
+        results[backendName] = {}
+        for position in REFERENCE_POSITIONS:
+            depth = position["benchDepth"]
+            result = min((timedPerft(BACKENDS[backendName](position["fen"]), depth) for i in range(repeat)), key=lambda run: run["seconds"])
+            result["depth"] = depth
+            results[backendName][position["name"]] = result
+            print(backendName + " " + position["name"] + ": perft(" + str(depth) + ") = " + str(result["nodes"]) +
+                " in " + str(result["seconds"]) + "s, " + str(result["nps"]) + " nodes/s")
+    return results
+
+'''
+Compare benchmark results against a baseline. Any change in node count is a failure (move generation changed),
+and so is a position running at less than (1 - tolerance) of its baseline nodes per second
+'''
+def compareToBaseline(results, baseline, tolerance=0.2):
+    failures = []
+    for backendName, positions in results.items():
+        for name, result in positions.items():
+            previous = baseline.get(backendName, {}).get(name)
+            if previous is None or previous["depth"] != result["depth"]:
+                continue
+            if previous["nodes"] != result["nodes"]:
+                failures.append(backendName + " " + name + ": node count " + str(result["nodes"]) + " != baseline " + str(previous["nodes"]))
+            elif result["nps"] < previous["nps"] * (1 - tolerance):
+                failures.append(backendName + " " + name + ": " + str(result["nps"]) + " nodes/s is more than " +
+                    str(int(tolerance * 100)) + "% below baseline " + str(previous["nps"]))
+    return failures
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Perft move generation tests and benchmarks")
+    parser.add_argument("--backend", choices=["list", "bitboards", "both"], default="both")
+    parser.add_argument("--fen", help="position to run perft on (default: start position)")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    parser.add_argument("--suite", action="store_true", help="check all reference positions")
+    parser.add_argument("--compare-backends", action="store_true", help="check both backends generate identical move trees")
+    parser.add_argument("--bench", action="store_true", help="benchmark all reference positions")
+    parser.add_argument("--save", metavar="JSON", help="save benchmark results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="fail if benchmark results regress against this baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="benchmark runs per position, the fastest one counts")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed drop in nodes/s against the baseline")
+    options = parser.parse_args(args)
+    backendNames = ["list", "bitboards"] if options.backend == "both" else [options.backend]
+    failures = []
+
+    if options.suite:
+        for backendName in backendNames:
+            backendFailures = checkReferencePositions(BACKENDS[backendName])
+            print(backendName + ": " + ("all reference positions pass" if not backendFailures else str(len(backendFailures)) + " failures"))
+            failures += [backendName + " " + failure for failure in backendFailures]
+
+    elif options.compare_backends:
+        fens = [options.fen] if options.fen else [position["fen"] for position in REFERENCE_POSITIONS]
+        for fen in fens:
+            difference = compareBackends(ChessEngine.GameState(fen), bitboardEngine.BitboardGameState(fen), options.depth)
+            if difference is not None:
+                line, onlyList, onlyBitboards = difference
+                failures.append(fen + " after " + " ".join(line) + ": list only " + str(onlyList) + ", bitboards only " + str(onlyBitboards))
+        if not failures:
+            print("Both backends generate the same moves")
+
+    elif options.bench:
+        results = benchmark(backendNames, options.repeat)
+        if options.save:
+            with open(options.save, "w") as file:
+                json.dump(results, file, indent=2)
+            print("Saved baseline to " + options.save)
+        if options.compare:
+            with open(options.compare) as file:
+                failures = compareToBaseline(results, json.load(file), options.tolerance)
+
+    else:
+        for backendName in backendNames:
+            gs = BACKENDS[backendName](options.fen)
+            if options.divide:
+                counts = divide(gs, options.depth)
+                for notation in sorted(counts):
+                    print(notation + ": " + str(counts[notation]))
+                print("Moves: " + str(len(counts)) + ", nodes: " + str(sum(counts.values())))
+            else:
+                result = timedPerft(gs, options.depth)
+                print(backendName + ": perft(" + str(options.depth) + ") = " + str(result["nodes"]) +
+                    " in " + str(result["seconds"]) + "s, " + str(result["nps"]) + " nodes/s")
+
+    for failure in failures:
+        print("FAIL " + failure)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
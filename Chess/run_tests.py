@@ -1,8 +1,9 @@
+import os
 import unittest
 
 if __name__ == "__main__":
     loader = unittest.TestLoader()
-    suite = loader.discover("tests")
+    suite = loader.discover(os.path.dirname(os.path.abspath(__file__)), pattern="tests.py")
 
     runner = unittest.TextTestRunner(verbosity=2)
-    runner.run(suite)
\ No newline at end of file
+    runner.run(suite)
@@ -0,0 +1,162 @@
+'''
+Search benchmarks: time-to-depth for the single process and root parallel search at different pool sizes,
+time-to-depth with each selective search feature on its own, solve rate and time per position over an EPD test suite,
+and the search stats and a cProfile of a single search
+
+Usage:
+    python searchBench.py                                  depth 4 with 1, 2, 4 and 8 workers
+    python searchBench.py --depth 3 --workers 1 2 --fen "<fen>"
+    python searchBench.py --selective --depth 5             plain alpha-beta against PVS, null move and LMR one at a time
+    python searchBench.py --epd tactics.epd --time 2       search every position for 2 seconds and check bm/am
+    python searchBench.py --profile search.prof --depth 4  profile one search of kiwipete (or --fen) and print the hot spots
+'''
+import argparse
+import os
+import pstats
+import sys
+import time
+import ChessEngine
+import moveFinder
+
+POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+}
+SELECTIVE_SWITCHES = ["USE_PVS", "USE_NULL_MOVE", "USE_LMR"]
+
+'''
+Collects everything the search puts on its returnQueue
+'''
+class ListQueue(list):
+    def put(self, item):
+        self.append(item)
+
+'''
+Search fen to depth with the given number of workers (0 for the single process search) starting from empty tables,
+returns the seconds taken, nodes searched, the best move and the search stats
+'''
+def timeToDepth(fen, depth, workers):
+    moveFinder.USE_BOOK = False
+    moveFinder.transpositionTable.clear()
+    moveFinder.resetMoveOrdering()
+    gs = ChessEngine.GameState(fen)
+    returnQueue = ListQueue()
+    startTime = time.perf_counter()
+    if workers == 0:
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue, maxDepth=depth)
+    else:
+        moveFinder.findBestMoveParallel(gs, gs.get_valid_moves(), returnQueue, maxDepth=depth, workers=workers)
+    elapsed = time.perf_counter() - startTime
+    result = returnQueue[-1]
+    return {"seconds": round(elapsed, 3), "nodes": result.stats.nodes, "move": result.move.getChessNotation(), "stats": result.stats}
+
+'''
+Search fen to depth once under cProfile, dump the profile to path and print the search stats and the functions
+with the most time spent in them
+'''
+def profileSearch(fen, depth, path, top=20):
+    moveFinder.PROFILE_PATH = path
+    result = timeToDepth(fen, depth, 0)
+    print(result["stats"].summary())
+    pstats.Stats(path).sort_stats("tottime").print_stats(top)
+    return result
+
+'''
+Time-to-depth of the single process search with every selective search switch off, each one on by itself and all of them on.
+Returns [(name, timeToDepth result)], the switches are left as they were
+'''
+def selectiveSearchBench(fen, depth):
+    saved = {name: getattr(moveFinder, name) for name in SELECTIVE_SWITCHES}
+    configs = [("plain", [])] + [(name, [name]) for name in SELECTIVE_SWITCHES] + [("all", SELECTIVE_SWITCHES)]
+    results = []
+    try:
+        for label, switchesOn in configs:
+            for name in SELECTIVE_SWITCHES:
+                setattr(moveFinder, name, name in switchesOn)
+            results.append((label, timeToDepth(fen, depth, 0)))
+    finally:
+        for name, value in saved.items():
+            setattr(moveFinder, name, value)
+    return results
+
+'''
+Search every position of an EPD file, to depth or for timeLimit seconds each, and check the chosen move
+against the bm (best move) and am (avoid move) operations. Prints a line per position and returns a summary dict
+'''
+def runEpd(path, depth=None, timeLimit=None):
+    solved = 0
+    positions = 0
+    totalTime = 0
+    totalNodes = 0
+    moveFinder.USE_BOOK = False
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fen, operations = ChessEngine.parseEpd(line)
+            gs = ChessEngine.GameState(fen)
+            validMoves = gs.get_valid_moves()
+            bestMoves = [ChessEngine.sanToMove(gs, san, validMoves) for san in operations.get("bm", [])]
+            avoidMoves = [ChessEngine.sanToMove(gs, san, validMoves) for san in operations.get("am", [])]
+            returnQueue = ListQueue()
+            startTime = time.perf_counter()
+            moveFinder.findBestMove(gs, validMoves, returnQueue, timeLimit=timeLimit, maxDepth=depth)
+            elapsed = time.perf_counter() - startTime
+            move = returnQueue[-1].move
+            correct = move is not None and (not bestMoves or move in bestMoves) and move not in avoidMoves
+            positions += 1
+            solved += correct
+            totalTime += elapsed
+            totalNodes += returnQueue[-1].stats.nodes
+            expected = "bm " + " ".join(operations["bm"]) if "bm" in operations else "am " + " ".join(operations.get("am", []))
+            print(operations.get("id", fen) + ": " + (move.getChessNotation() if move is not None else "none") + " (" + expected + ") " +
+                ("solved" if correct else "missed") + " in " + str(round(elapsed, 2)) + "s")
+
+    summary = {"positions": positions, "solved": solved, "solveRate": solved / positions if positions else 0.0,
+        "secondsPerPosition": totalTime / positions if positions else 0.0, "nps": int(totalNodes / totalTime) if totalTime > 0 else 0}
+    print("Solved " + str(solved) + "/" + str(positions) + " (" + str(round(summary["solveRate"] * 100, 1)) + "%), " +
+        str(round(summary["secondsPerPosition"], 2)) + "s per position, " + str(summary["nps"]) + " nodes/s")
+    return summary
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Search time-to-depth and EPD test suite benchmarks")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="pool sizes to time")
+    parser.add_argument("--fen", help="position to search (default: start position and kiwipete)")
+    parser.add_argument("--epd", metavar="FILE", help="run an EPD test suite instead, checking the bm and am moves")
+    parser.add_argument("--time", type=float, help="seconds per EPD position (default: search to --depth)")
+    parser.add_argument("--selective", action="store_true", help="time PVS, null move pruning and LMR one at a time instead")
+    parser.add_argument("--profile", metavar="FILE", help="profile a single search instead, dumping the cProfile data to FILE")
+    options = parser.parse_args(args)
+    if options.epd:
+        runEpd(options.epd, None if options.time else options.depth, options.time)
+        return 0
+    if options.profile:
+        profileSearch(options.fen or POSITIONS["kiwipete"], options.depth, options.profile)
+        return 0
+    positions = {"fen": options.fen} if options.fen else POSITIONS
+    if options.selective:
+        for name, fen in positions.items():
+            print(name + " depth " + str(options.depth) + ":")
+            results = selectiveSearchBench(fen, options.depth)
+            plain = results[0][1]
+            for label, result in results:
+                print("  " + label + ": " + str(result["seconds"]) + "s, " + str(result["nodes"]) + " nodes, " + result["move"] +
+                    ", " + str(round(plain["nodes"] / result["nodes"], 2)) + "x fewer nodes")
+        return 0
+    if max(options.workers) > (os.cpu_count() or 1):
+        print("Note: only " + str(os.cpu_count()) + " cores, larger pools share them")
+
+    for name, fen in positions.items():
+        baseline = timeToDepth(fen, options.depth, 0)
+        print(name + " depth " + str(options.depth) + ": single process " + str(baseline["seconds"]) + "s, " +
+            str(baseline["nodes"]) + " nodes, " + baseline["move"])
+        for workers in options.workers:
+            result = timeToDepth(fen, options.depth, workers)
+            print("  " + str(workers) + " workers: " + str(result["seconds"]) + "s, " + str(result["nodes"]) + " nodes, " +
+                result["move"] + ", speedup " + str(round(baseline["seconds"] / result["seconds"], 2)) + "x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
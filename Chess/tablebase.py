@@ -0,0 +1,588 @@
+'''
+Endgame tablebases for up to four pieces (KQK, KRK, KPK, KBNK, KQKR, ...), generated by retrograde analysis.
+A table stores one byte per position with the result for the side to move and the distance to mate in plies:
+DRAW, 1 to 126 for a win in that many plies, LOSS + n for a loss in n plies. Positions are indexed with the stronger
+side as white and folded by the board symmetries (all 8 without pawns, the left-right mirror with pawns).
+Each table is a zlib compressed file in TABLEBASE_DIR, loaded the first time a position with its material is probed.
+Only queen promotions are generated, like the rest of the engine, and positions with castling rights or an
+en passant square aren't probed
+
+Usage:
+    python tablebase.py                        generate KQK, KRK and KPK
+    python tablebase.py KBNK KQKR              generate these and the smaller tables they convert into
+    python tablebase.py --probe "<fen>"        print the result and the best move for a position
+'''
+import argparse
+import os
+import sys
+import time
+import zlib
+import ChessEngine
+from ChessEngine import pieceScores
+
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+DEFAULT_TABLES = ["KQK", "KRK", "KPK"]
+MAX_PIECES = 4
+PIECE_ORDER = "QRBNP"
+
+DRAW = 0
+UNKNOWN = 127
+# Legal positions not resolved yet while generating, whatever is left at the end is a draw
+LOSS = 128
+ILLEGAL = 255
+BLOCKED = 1 << 10
+# Conversion "distance" of a position that can capture or promote into a draw or a win, it can never be lost
+
+'''
+Precomputed geometry, squares are row * 8 + col like the packed moves, with row 0 the 8th rank
+'''
+def buildTargets(offsets):
+    targets = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        targets.append([(row + dr) * 8 + col + dc for dr, dc in offsets if 0 <= row + dr < 8 and 0 <= col + dc < 8])
+    return targets
+
+KING_TARGETS = buildTargets([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+KNIGHT_TARGETS = buildTargets([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_MASKS = [sum(1 << target for target in targets) for targets in KING_TARGETS]
+KNIGHT_MASKS = [sum(1 << target for target in targets) for targets in KNIGHT_TARGETS]
+PAWN_ATTACK_TARGETS = {"w": buildTargets([(-1, -1), (-1, 1)]), "b": buildTargets([(1, -1), (1, 1)])}
+PAWN_ATTACK_MASKS = {color: [sum(1 << target for target in targets) for targets in PAWN_ATTACK_TARGETS[color]] for color in "wb"}
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+# Orthogonal first, then diagonal
+RAYS = [[[] for direction in DIRECTIONS] for sq in range(64)]
+LINE = [[0] * 64 for sq in range(64)]
+# 1 when two squares share a row or column, 2 when they share a diagonal
+BETWEEN = [[0] * 64 for sq in range(64)]
+# Squares strictly between two squares on a line, as a bit mask
+for sq in range(64):
+    for i, (dr, dc) in enumerate(DIRECTIONS):
+        row, col = divmod(sq, 8)
+        mask = 0
+        while 0 <= row + dr < 8 and 0 <= col + dc < 8:
+            row, col = row + dr, col + dc
+            target = row * 8 + col
+            RAYS[sq][i].append(target)
+            LINE[sq][target] = 1 if i < 4 else 2
+            BETWEEN[sq][target] = mask
+            mask |= 1 << target
+SLIDER_DIRECTIONS = {"Q": range(8), "R": range(4), "B": range(4, 8)}
+
+TRANSPOSE = [(7 - sq % 8) * 8 + 7 - sq // 8 for sq in range(64)]
+# Reflection in the a1-h8 diagonal
+PAWNLESS_KING_SQUARES = [sq for sq in range(64) if sq % 8 <= 3 and 7 - sq // 8 <= sq % 8]
+# The a1-d1-d4 triangle
+PAWN_KING_SQUARES = [sq for sq in range(64) if sq % 8 <= 3]
+# The a-d files
+
+def isWin(value):
+    return 0 < value < UNKNOWN
+
+def isLoss(value):
+    return LOSS <= value < ILLEGAL
+
+'''
+Distance to mate in plies of a win or loss value
+'''
+def distanceToMate(value):
+    return value - LOSS if value >= LOSS else value
+
+'''
+True when a piece of byColor attacks sq, with occupied the bit mask of every piece on the board
+'''
+def isAttacked(sq, byColor, pieces, squares, occupied):
+    for piece, pieceSq in zip(pieces, squares):
+        if piece[0] != byColor:
+            continue
+        kind = piece[1]
+        if kind == "K":
+            if KING_MASKS[pieceSq] >> sq & 1:
+                return True
+        elif kind == "N":
+            if KNIGHT_MASKS[pieceSq] >> sq & 1:
+                return True
+        elif kind == "P":
+            if PAWN_ATTACK_MASKS[byColor][pieceSq] >> sq & 1:
+                return True
+        else:
+            line = LINE[pieceSq][sq]
+            if line and (kind == "Q" or line == (1 if kind == "R" else 2)) and not BETWEEN[pieceSq][sq] & occupied:
+                return True
+    return False
+
+'''
+Bit mask of every square attacked by byColor
+'''
+def attackMask(byColor, pieces, squares, occupied):
+    mask = 0
+    for piece, pieceSq in zip(pieces, squares):
+        if piece[0] != byColor:
+            continue
+        kind = piece[1]
+        if kind == "K":
+            mask |= KING_MASKS[pieceSq]
+        elif kind == "N":
+            mask |= KNIGHT_MASKS[pieceSq]
+        elif kind == "P":
+            mask |= PAWN_ATTACK_MASKS[byColor][pieceSq]
+        else:
+            for direction in SLIDER_DIRECTIONS[kind]:
+                for target in RAYS[pieceSq][direction]:
+                    mask |= 1 << target
+                    if occupied >> target & 1:
+                        break
+    return mask
+
+'''
+Squares a piece can move to as (square, promotes) pairs, including captures of enemy pieces. ownMask and
+enemyMask are the bit masks of each side's pieces
+'''
+def pieceTargets(piece, sq, ownMask, enemyMask):
+    color, kind = piece
+    if kind == "K" or kind == "N":
+        return [(target, False) for target in (KING_TARGETS if kind == "K" else KNIGHT_TARGETS)[sq] if not ownMask >> target & 1]
+    if kind == "P":
+        occupied = ownMask | enemyMask
+        step, startRow, lastRow = (-8, 6, 0) if color == "w" else (8, 1, 7)
+        targets = []
+        forward = sq + step
+        if not occupied >> forward & 1:
+            targets.append((forward, forward // 8 == lastRow))
+            if sq // 8 == startRow and not occupied >> (forward + step) & 1:
+                targets.append((forward + step, False))
+        for target in PAWN_ATTACK_TARGETS[color][sq]:
+            if enemyMask >> target & 1:
+                targets.append((target, target // 8 == lastRow))
+        return targets
+    targets = []
+    for direction in SLIDER_DIRECTIONS[kind]:
+        for target in RAYS[sq][direction]:
+            if ownMask >> target & 1:
+                break
+            targets.append((target, False))
+            if enemyMask >> target & 1:
+                break
+    return targets
+
+'''
+Legal moves of the side to move as (child pieces, child squares, conversion) where conversion is True for
+a capture or promotion, which leaves the table. Kings are always pieces 0 (white) and 1 (black)
+'''
+def legalMoves(pieces, squares, whiteToMove):
+    color, enemy = ("w", "b") if whiteToMove else ("b", "w")
+    ownMask = enemyMask = 0
+    for piece, sq in zip(pieces, squares):
+        if piece[0] == color:
+            ownMask |= 1 << sq
+        else:
+            enemyMask |= 1 << sq
+    kingIndex = 0 if whiteToMove else 1
+    kingSq = squares[kingIndex]
+    kingDanger = attackMask(enemy, pieces, squares, (ownMask | enemyMask) ^ 1 << kingSq)
+    # Squares the king can't step to (including captures of defended pieces), seen through the king so it can't retreat along a checking line
+    inCheck = kingDanger >> kingSq & 1
+    moves = []
+    for i, piece in enumerate(pieces):
+        if piece[0] != color:
+            continue
+        exposesKing = i != kingIndex and (inCheck or LINE[kingSq][squares[i]])
+        # Out of check, another piece can only uncover an attack on the king from a line through both
+        for target, promotes in pieceTargets(piece, squares[i], ownMask, enemyMask):
+            if i == kingIndex and kingDanger >> target & 1:
+                continue
+            childPieces = pieces
+            childSquares = list(squares)
+            childSquares[i] = target
+            if promotes:
+                childPieces = pieces[:i] + (color + "Q",) + pieces[i + 1:]
+            capture = enemyMask >> target & 1
+            if capture:
+                captured = squares.index(target)
+                childPieces = childPieces[:captured] + childPieces[captured + 1:]
+                del childSquares[captured]
+            if exposesKing:
+                occupied = 0
+                for childSq in childSquares:
+                    occupied |= 1 << childSq
+                if isAttacked(kingSq, enemy, childPieces, childSquares, occupied):
+                    continue
+            moves.append((childPieces, childSquares, promotes or capture))
+    return moves
+
+'''
+"K" followed by the side's other pieces in PIECE_ORDER
+'''
+def sideSignature(kinds):
+    return "K" + "".join(sorted(kinds, key=PIECE_ORDER.index))
+
+'''
+Table name for a set of pieces and whether the colours have to be swapped to look it up (the stronger side is white)
+'''
+def materialSignature(pieces):
+    white = sideSignature(piece[1] for piece in pieces if piece[0] == "w" and piece[1] != "K")
+    black = sideSignature(piece[1] for piece in pieces if piece[0] == "b" and piece[1] != "K")
+    whiteKey = (sum(pieceScores[kind] for kind in white), [-PIECE_ORDER.index(kind) for kind in white[1:]])
+    blackKey = (sum(pieceScores[kind] for kind in black), [-PIECE_ORDER.index(kind) for kind in black[1:]])
+    if whiteKey >= blackKey:
+        return white + black, False
+    return black + white, True
+
+'''
+Bare kings, or a single bishop or knight on the board, can't mate
+'''
+def insufficientMaterial(pieces):
+    kinds = [piece[1] for piece in pieces if piece[1] != "K"]
+    return not kinds or (len(kinds) == 1 and kinds[0] in "BN")
+
+class Table():
+    def __init__(self, signature):
+        weakKing = signature.index("K", 1)
+        self.signature = signature
+        self.pieces = ("wK", "bK") + tuple("w" + kind for kind in signature[1:weakKing]) + tuple("b" + kind for kind in signature[weakKing + 1:])
+        self.pawns = "P" in signature
+        self.kingSquares = PAWN_KING_SQUARES if self.pawns else PAWNLESS_KING_SQUARES
+        self.kingSlots = {sq: slot for slot, sq in enumerate(self.kingSquares)}
+        self.size = len(self.kingSquares) * 64 ** (len(self.pieces) - 1) * 2
+        self.values = None
+
+    '''
+    Index of a position given as squares in the order of self.pieces, after moving the white king into
+    kingSquares by the board symmetries. A king on the diagonal leaves two candidates, the smaller one counts
+    '''
+    def index(self, squares, whiteToMove):
+        squares = list(squares)
+        kingSq = squares[0]
+        if kingSq % 8 > 3:
+            squares = [sq ^ 7 for sq in squares]
+            kingSq ^= 7
+        if not self.pawns:
+            if kingSq < 32:
+                squares = [sq ^ 56 for sq in squares]
+                kingSq ^= 56
+            rank, col = 7 - kingSq // 8, kingSq % 8
+            if rank > col:
+                squares = [TRANSPOSE[sq] for sq in squares]
+                kingSq = squares[0]
+            elif rank == col:
+                transposed = [TRANSPOSE[sq] for sq in squares]
+                if transposed < squares:
+                    squares = transposed
+        index = self.kingSlots[kingSq]
+        for sq in squares[1:]:
+            index = index * 64 + sq
+        return index * 2 + (0 if whiteToMove else 1)
+
+    def decode(self, index):
+        whiteToMove = index & 1 == 0
+        index >>= 1
+        squares = []
+        for i in range(len(self.pieces) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.kingSquares[index])
+        return tuple(reversed(squares)), whiteToMove
+
+    def path(self, directory=None):
+        return os.path.join(directory or TABLEBASE_DIR, self.signature + ".tb")
+
+    def load(self, directory=None):
+        with open(self.path(directory), "rb") as file:
+            self.values = bytearray(zlib.decompress(file.read()))
+
+    def save(self, directory=None):
+        os.makedirs(directory or TABLEBASE_DIR, exist_ok=True)
+        with open(self.path(directory), "wb") as file:
+            file.write(zlib.compress(bytes(self.values), 9))
+
+    '''
+    Squares of an unmove by the side that just moved (not to move in the child), in the order of self.pieces.
+    Captures and promotions come from other tables, so only plain moves to empty squares are undone
+    '''
+    def parents(self, squares, whiteToMove):
+        moverColor = "b" if whiteToMove else "w"
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        enemyKing = squares[0 if whiteToMove else 1]
+        for i, piece in enumerate(self.pieces):
+            if piece[0] != moverColor:
+                continue
+            sq = squares[i]
+            if piece[1] == "P":
+                step, startRow = (8, 6) if moverColor == "w" else (-8, 1)
+                # A pawn moves back towards its own side, and never from the first or last row
+                origins = []
+                origin = sq + step
+                if origin // 8 not in (0, 7) and not occupied >> origin & 1:
+                    origins.append(origin)
+                    if origin // 8 + step // 8 == startRow and not occupied >> (origin + step) & 1:
+                        origins.append(origin + step)
+            else:
+                origins = [target for target, promotes in pieceTargets(piece, sq, occupied, 0)]
+            for origin in origins:
+                parent = list(squares)
+                parent[i] = origin
+                parentOccupied = occupied ^ (1 << sq) ^ (1 << origin)
+                # The side to move in the child can't be in check in the parent, where it isn't to move
+                if not isAttacked(enemyKing, moverColor, self.pieces, parent, parentOccupied):
+                    yield parent
+
+    '''
+    Retrograde analysis: mates are lost in 0, a position with a move to a lost one is won one ply further,
+    and a position whose moves all lead to won ones (including captures and promotions into smaller tables)
+    is lost one ply after the longest of them. Resolved positions are handed on in waves of one ply
+    '''
+    def generate(self, directory=None):
+        values = bytearray([ILLEGAL]) * self.size
+        self.values = values
+        conversionDistance = {}
+        # Longest distance to mate among the captures and promotions of a position, or BLOCKED
+        pending = {}
+        # Ply: positions to recheck then because of a capture or promotion
+        frontier = []
+        for index in range(self.size):
+            squares, whiteToMove = self.decode(index)
+            if len(set(squares)) != len(squares) or self.index(squares, whiteToMove) != index:
+                continue
+            if self.pawns and any(piece[1] == "P" and sq // 8 in (0, 7) for piece, sq in zip(self.pieces, squares)):
+                continue
+            color, enemy = ("w", "b") if whiteToMove else ("b", "w")
+            occupied = 0
+            for sq in squares:
+                occupied |= 1 << sq
+            if isAttacked(squares[1 if whiteToMove else 0], color, self.pieces, squares, occupied):
+                # The side not to move is in check
+                continue
+            moves = legalMoves(self.pieces, squares, whiteToMove)
+            if not moves:
+                inCheck = isAttacked(squares[0 if whiteToMove else 1], enemy, self.pieces, squares, occupied)
+                values[index] = LOSS if inCheck else DRAW
+                if inCheck:
+                    frontier.append(index)
+                continue
+            values[index] = UNKNOWN
+            longest = None
+            for childPieces, childSquares, conversion in moves:
+                if not conversion:
+                    continue
+                value = probePieces(childPieces, childSquares, not whiteToMove, directory)
+                if value is None:
+                    raise ValueError(self.signature + " needs the " + materialSignature(childPieces)[0] + " table")
+                if isLoss(value):
+                    pending.setdefault(distanceToMate(value) + 1, []).append(index)
+                    longest = BLOCKED
+                elif isWin(value) and longest != BLOCKED:
+                    longest = max(longest or 0, value)
+                else:
+                    longest = BLOCKED
+            if longest is not None:
+                conversionDistance[index] = longest
+                if longest != BLOCKED:
+                    pending.setdefault(longest + 1, []).append(index)
+
+        ply = 0
+        while frontier or any(key > ply for key in pending):
+            ply += 1
+            if ply >= UNKNOWN:
+                raise ValueError(self.signature + ": distance to mate doesn't fit in a byte")
+            candidates = pending.pop(ply, [])
+            for index in frontier:
+                squares, whiteToMove = self.decode(index)
+                for parent in self.parents(squares, whiteToMove):
+                    candidates.append(self.index(parent, not whiteToMove))
+            frontier = []
+            for index in candidates:
+                if values[index] != UNKNOWN:
+                    continue
+                if ply % 2:
+                    values[index] = ply
+                    frontier.append(index)
+                elif self.allMovesLose(index, ply, conversionDistance):
+                    values[index] = LOSS + ply
+                    frontier.append(index)
+
+        for index in range(self.size):
+            if values[index] == UNKNOWN:
+                values[index] = DRAW
+
+    '''
+    True when every move from the position leads to a win for the opponent in fewer than ply plies
+    '''
+    def allMovesLose(self, index, ply, conversionDistance):
+        if conversionDistance.get(index, 0) >= ply:
+            return False
+        squares, whiteToMove = self.decode(index)
+        for childPieces, childSquares, conversion in legalMoves(self.pieces, squares, whiteToMove):
+            if not conversion and not isWin(self.values[self.index(childSquares, not whiteToMove)]):
+                return False
+        return True
+
+tables = {}
+# Tables by signature, None when there is no file for it
+
+def getTable(signature, directory=None):
+    key = (signature, directory)
+    if key not in tables:
+        table = Table(signature)
+        if os.path.exists(table.path(directory)):
+            table.load(directory)
+        else:
+            table = None
+        tables[key] = table
+    return tables[key]
+
+'''
+Table value for the side to move of any pieces (like ("wK", "bK", "wR")) on squares, None if there's no table for them
+'''
+def probePieces(pieces, squares, whiteToMove, directory=None):
+    if insufficientMaterial(pieces):
+        return DRAW
+    signature, swapColors = materialSignature(pieces)
+    table = getTable(signature, directory)
+    if table is None:
+        return None
+    if swapColors:
+        pieces = [("b" if piece[0] == "w" else "w") + piece[1] for piece in pieces]
+        squares = [sq ^ 56 for sq in squares]
+        whiteToMove = not whiteToMove
+    remaining = list(zip(pieces, squares))
+    ordered = []
+    for piece in table.pieces:
+        match = next(pair for pair in remaining if pair[0] == piece)
+        remaining.remove(match)
+        ordered.append(match[1])
+    return table.values[table.index(ordered, whiteToMove)]
+
+maxTableMaterial = None
+maxTablePieces = None
+# Both found by the same scan of TABLEBASE_DIR, setting maxTableMaterial back to None scans again
+
+'''
+Most material (pieceScores, both sides together) of any table on disk, -1 without tables.
+A position with more can't be in a table, which is a cheap test before scanning the board
+'''
+def maxMaterial():
+    global maxTableMaterial, maxTablePieces
+    if maxTableMaterial is None:
+        maxTableMaterial = -1
+        maxTablePieces = -1
+        if os.path.isdir(TABLEBASE_DIR):
+            for name in os.listdir(TABLEBASE_DIR):
+                if name.endswith(".tb"):
+                    maxTableMaterial = max(maxTableMaterial, sum(pieceScores[kind] for kind in name[:-3]))
+                    maxTablePieces = max(maxTablePieces, len(name) - 3)
+    return maxTableMaterial
+
+'''
+Most pieces (kings and pawns included) of any table on disk, -1 without tables. Compared with the piece count
+both backends keep up to date, so a position with lots of pawns left doesn't get as far as scanning the board
+'''
+def maxPieces():
+    if maxTableMaterial is None:
+        maxMaterial()
+    return maxTablePieces
+
+'''
+Table value for the side to move of a GameState (either backend), None when it isn't covered by a table
+'''
+def probe(gs):
+    if gs.castleRights:
+        return None
+    board = gs.board
+    if gs.enpassantPossible != ():
+        row, col = gs.enpassantPossible
+        pawn, captureRow = ("wP", row + 1) if gs.whiteToMove else ("bP", row - 1)
+        if any(0 <= captureCol < 8 and board[captureRow][captureCol] == pawn for captureCol in (col - 1, col + 1)):
+            # Only matters when a pawn can actually take en passant
+            return None
+    pieces = []
+    squares = []
+    for row, rowPieces in enumerate(board):
+        for col, piece in enumerate(rowPieces):
+            if piece != "--":
+                if len(pieces) == MAX_PIECES:
+                    return None
+                pieces.append(piece)
+                squares.append(row * 8 + col)
+    return probePieces(pieces, squares, gs.whiteToMove)
+
+'''
+The move leading to the quickest win, else a draw, else the slowest loss, None if the position or one of its children isn't covered
+'''
+def bestMove(gs, validMoves):
+    if not validMoves or gs.pieceCount > maxPieces() or probe(gs) is None:
+        return None
+    best = None
+    bestKey = None
+    for move in validMoves:
+        gs.make_move(move)
+        value = probe(gs)
+        gs.undo_move()
+        if value is None:
+            return None
+        # The child is scored for the opponent
+        key = (0, distanceToMate(value)) if isLoss(value) else (1, 0) if value == DRAW else (2, -value)
+        if bestKey is None or key < bestKey:
+            best, bestKey = move, key
+    return best
+
+'''
+Tables a signature captures or promotes into, that have to exist before it can be generated
+'''
+def dependencies(signature):
+    table = Table(signature)
+    result = []
+    for i, piece in enumerate(table.pieces[2:], 2):
+        smaller = table.pieces[:i] + table.pieces[i + 1:]
+        if not insufficientMaterial(smaller):
+            result.append(materialSignature(smaller)[0])
+        if piece[1] == "P":
+            promoted = table.pieces[:i] + (piece[0] + "Q",) + table.pieces[i + 1:]
+            result.append(materialSignature(promoted)[0])
+    return result
+
+'''
+Generate and save a table and anything it depends on that isn't on disk yet, verbose prints a line per table
+'''
+def generateTable(signature, directory=None, verbose=False):
+    global maxTableMaterial
+    for dependency in dependencies(signature):
+        if getTable(dependency, directory) is None:
+            generateTable(dependency, directory, verbose)
+    startTime = time.perf_counter()
+    table = Table(signature)
+    table.generate(directory)
+    table.save(directory)
+    tables[(signature, directory)] = table
+    maxTableMaterial = None
+    wins = sum(1 for value in table.values if isWin(value))
+    longest = max((value for value in table.values if isWin(value)), default=0)
+    if verbose:
+        print(signature + ": " + str(table.size) + " positions, " + str(wins) + " wins, longest mate " + str(longest) +
+            " plies, " + str(round(time.perf_counter() - startTime, 1)) + "s")
+    return table
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate and probe endgame tablebases")
+    parser.add_argument("signatures", nargs="*", default=DEFAULT_TABLES, help="tables to generate, stronger side first (KQK, KBNK, KQKR ...)")
+    parser.add_argument("--probe", metavar="FEN", help="print the tablebase result and best move for a position")
+    options = parser.parse_args(args)
+    if options.probe:
+        gs = ChessEngine.GameState(options.probe)
+        value = probe(gs)
+        if value is None:
+            print("Not in the tablebases")
+            return 1
+        result = "draw" if value == DRAW else ("win" if isWin(value) else "loss") + " in " + str(distanceToMate(value)) + " plies"
+        move = bestMove(gs, gs.get_valid_moves())
+        print(result + (", best move " + move.getUciNotation() if move is not None else ""))
+        return 0
+    for signature in options.signatures:
+        if len(signature) > MAX_PIECES or signature[0] != "K" or signature.count("K") != 2:
+            parser.error(signature + " isn't a table of up to " + str(MAX_PIECES) + " pieces")
+        generateTable(signature, verbose=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
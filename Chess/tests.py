@@ -1,7 +1,662 @@
+import multiprocessing
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-import ChessMain
 import ChessEngine
+import moveFinder
+import bitboardEngine
+import perft
+import uciEngine
+import matchRunner
+import openingBook
+import buildBook
+import tablebase
+import engineWorker
+import importCheck
+import searchBench
+import random
 
 class Tests(unittest.TestCase):
-    pass
+    '''
+    Tests switch moveFinder settings and the tablebase directory freely, they all go back to how they were
+    when the test ends, even when it fails part way
+    '''
+    def setUp(self):
+        settings = {name: value for name, value in vars(moveFinder).items() if name.isupper()}
+        tablebaseDir = tablebase.TABLEBASE_DIR
 
+        def restore():
+            for name, value in settings.items():
+                setattr(moveFinder, name, value)
+            tablebase.TABLEBASE_DIR, tablebase.maxTableMaterial = tablebaseDir, None
+
+        self.addCleanup(restore)
+
+    '''
+    The incremental Zobrist key has to match a full recompute, and transposed move orders must hash the same
+    '''
+    def testZobristKey(self):
+        gs = ChessEngine.GameState()
+        startKey = gs.zobristKey
+        for notation in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+            move = next(m for m in gs.get_valid_moves() if m.getChessNotation() == notation)
+            gs.make_move(move)
+            self.assertEqual(gs.zobristKey, gs.computeZobristKey())
+        self.assertEqual(gs.zobristKey, startKey)
+
+        other = ChessEngine.GameState()
+        for notation in ["b1c3", "g8f6", "g1f3"]:
+            other.make_move(next(m for m in other.get_valid_moves() if m.getChessNotation() == notation))
+        transposed = ChessEngine.GameState()
+        for notation in ["g1f3", "g8f6", "b1c3"]:
+            transposed.make_move(next(m for m in transposed.get_valid_moves() if m.getChessNotation() == notation))
+        self.assertEqual(other.zobristKey, transposed.zobristKey)
+
+        while len(other.moveLog) != 0:
+            other.undo_move()
+        self.assertEqual(other.zobristKey, startKey)
+
+    '''
+    The bitboard backend has to generate exactly the same moves as the list board
+    '''
+    def testBitboardBackendMatches(self):
+        self.assertIsNone(perft.compareBackends(ChessEngine.GameState(), bitboardEngine.BitboardGameState(), 3))
+        self.assertEqual(perft.perft(bitboardEngine.BitboardGameState(), 3), 8902)
+
+    '''
+    Node counts of the perft reference positions (castling, en passant, promotion and pins)
+    '''
+    def testPerftReferencePositions(self):
+        self.assertEqual(perft.checkReferencePositions(ChessEngine.GameState, maxDepth=2), [])
+        self.assertEqual(perft.checkReferencePositions(bitboardEngine.BitboardGameState, maxDepth=3), [])
+
+    '''
+    isSquareAttacked agrees on every square with generating the attacker's moves, the way squareUnderAttack used to work:
+    a defending piece stands on the square so pawns capture onto it, the defending king is taken off the board since
+    the query looks through it, and the attacking king is checked by its offsets because its own moves ask isSquareAttacked
+    '''
+    def testSquareAttacks(self):
+        def attackedByMoves(gs, row, col, enemyColor):
+            defender = "b" if enemyColor == "w" else "w"
+            board = gs.board
+            gs.board = [[piece if piece != defender + "K" else "--" for piece in boardRow] for boardRow in board]
+            gs.board[row][col] = defender + "N"
+            whiteToMove, pins = gs.whiteToMove, gs.pins
+            gs.whiteToMove, gs.pins = enemyColor == "w", []
+            moves = gs.get_all_possible_moves(includeCastling=False)
+            gs.board, gs.whiteToMove, gs.pins = board, whiteToMove, pins
+            if any(move.endRow == row and move.endCol == col and move.pieceMoved[1] != "K" for move in moves):
+                return True
+            return any(board[r][c] == enemyColor + "K" and (r, c) != (row, col) for r in range(max(row - 1, 0), min(row + 2, 8))
+                for c in range(max(col - 1, 0), min(col + 2, 8)))
+
+        fens = [position["fen"] for position in perft.REFERENCE_POSITIONS] + ["4r3/8/8/8/4K3/8/8/k7 w - - 0 1"]
+        # The last king is checked along the e file and can't step back to e3
+        for fen in fens:
+            gs = ChessEngine.GameState(fen)
+            gs.get_valid_moves()
+            for row in range(8):
+                for col in range(8):
+                    for enemyColor in "wb":
+                        self.assertEqual(gs.isSquareAttacked(row, col, enemyColor), attackedByMoves(gs, row, col, enemyColor),
+                            fen + " " + "abcdefgh"[col] + str(8 - row) + " by " + enemyColor)
+        self.assertTrue(gs.isSquareAttacked(5, 4, "b"))
+        for backend in (ChessEngine.GameState, bitboardEngine.BitboardGameState):
+            notations = [move.getChessNotation() for move in backend(fens[-1]).get_valid_moves()]
+            self.assertNotIn("e4e3", notations)
+            self.assertIn("e4d3", notations)
+
+    '''
+    Undoing a move has to restore the board, en passant square and castling rights exactly
+    '''
+    def testUndoRestoresPosition(self):
+        for backend in [ChessEngine.GameState, bitboardEngine.BitboardGameState]:
+            gs = backend("r3k2r/8/8/8/1p6/8/P7/R3K2R w KQkq - 7 1")
+            for notation in ["a2a4", "b4a3", "e1g1", "a3a2"]:
+                board = [row[:] for row in gs.board]
+                enpassant = gs.enpassantPossible
+                rights = gs.currentCastlingRight.index()
+                clock = gs.halfmoveClock
+                gs.make_move(next(m for m in gs.get_valid_moves() if m.getChessNotation() == notation))
+                gs.undo_move()
+                self.assertEqual(gs.board, board)
+                self.assertEqual(gs.enpassantPossible, enpassant)
+                self.assertEqual(gs.currentCastlingRight.index(), rights)
+                self.assertEqual(gs.halfmoveClock, clock)
+                gs.make_move(next(m for m in gs.get_valid_moves() if m.getChessNotation() == notation))
+            self.assertEqual(gs.halfmoveClock, 0)
+            self.assertEqual(gs.currentCastlingRight.index(), ChessEngine.BKS | ChessEngine.BQS)
+
+    '''
+    The running material and piece square totals and the piece count have to match a full rescan after every make_move and undo_move,
+    through captures, promotions, en passant and castling on both backends
+    '''
+    def testIncrementalEvaluation(self):
+        def walk(gs, depth):
+            self.assertEqual((gs.material, gs.positionScore), gs.computeEvaluation())
+            self.assertEqual(gs.pieceCount, sum(piece != "--" for row in gs.board for piece in row))
+            if depth == 0:
+                return
+            for move in gs.get_valid_moves():
+                gs.make_move(move)
+                walk(gs, depth - 1)
+                gs.undo_move()
+            self.assertEqual((gs.material, gs.positionScore), gs.computeEvaluation())
+
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+                "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1"]:
+            walk(ChessEngine.GameState(fen), 2)
+            walk(bitboardEngine.BitboardGameState(fen), 2)
+
+        gs = ChessEngine.GameState()
+        self.assertAlmostEqual(moveFinder.scoreBoard(gs), moveFinder.scanBoard(gs.board))
+
+    '''
+    Moves entered in the UI are built from squares and have to compare equal to the packed moves from the generators,
+    with the same promotion and castling flags
+    '''
+    def testMovePacking(self):
+        gs = ChessEngine.GameState("r3k2r/1P6/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        for startSq, endSq in [((1, 1), (0, 0)), ((1, 1), (0, 1)), ((7, 4), (7, 6)), ((7, 4), (7, 2)), ((7, 0), (3, 0))]:
+            move = ChessEngine.Move.fromSquares(startSq, endSq, gs.board)
+            generated = gs.get_valid_moves()
+            self.assertIn(move, generated)
+            match = generated[generated.index(move)]
+            self.assertEqual(move.packed, match.packed)
+            self.assertEqual((move.startRow, move.startCol, move.endRow, move.endCol), startSq + endSq)
+            self.assertEqual(move.pieceCaptured, match.pieceCaptured)
+        self.assertTrue(ChessEngine.Move.fromSquares((1, 1), (0, 0), gs.board).isPawnPromotion)
+        self.assertTrue(ChessEngine.Move.fromSquares((7, 4), (7, 2), gs.board).isCastleMove)
+
+    '''
+    FEN export has to round trip through parsing on both backends and follow the moves played,
+    EPD lines split into a position and operations, and SAN resolves to the one legal move it names
+    '''
+    def testFenAndEpd(self):
+        fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 5 40"]
+        for backend in [ChessEngine.GameState, bitboardEngine.BitboardGameState]:
+            for fen in fens:
+                self.assertEqual(ChessEngine.toFen(backend(fen)), fen)
+            gs = backend()
+            for san in ["e4", "Nf6", "Nc3"]:
+                gs.make_move(ChessEngine.sanToMove(gs, san))
+            self.assertEqual(ChessEngine.toFen(gs), "rnbqkb1r/pppppppp/5n2/8/4P3/2N5/PPPP1PPP/R1BQKBNR b KQkq - 2 2")
+
+        fen, operations = ChessEngine.parseEpd('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - bm O-O "O-O-O"; id "castles; both"; hmvc 3;')
+        self.assertEqual(fen, "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 3 1")
+        self.assertEqual(operations["id"], "castles; both")
+
+        gs = ChessEngine.GameState("r3k2r/1P6/8/8/8/5N2/8/R3K1NR w KQkq - 0 1")
+        self.assertEqual(ChessEngine.sanToMove(gs, "O-O-O").getChessNotation(), "e1c1")
+        self.assertEqual(ChessEngine.sanToMove(gs, "Ng1h3").getChessNotation(), "g1h3")
+        self.assertEqual(ChessEngine.sanToMove(gs, "Nfd4").getChessNotation(), "f3d4")
+        self.assertEqual(ChessEngine.sanToMove(gs, "bxa8=Q+").getChessNotation(), "b7a8")
+        self.assertEqual(ChessEngine.sanToMove(gs, "b8Q").getChessNotation(), "b7b8")
+        self.assertRaises(ValueError, ChessEngine.sanToMove, ChessEngine.GameState("4k3/8/8/8/8/8/4K3/R6R w - - 0 1"), "Rd1")
+        self.assertRaises(ValueError, ChessEngine.sanToMove, gs, "Kf3")
+
+    '''
+    Iterative deepening reports every finished depth and then returns a legal move, within the node limit
+    '''
+    def testIterativeDeepening(self):
+        moveFinder.USE_BOOK = False
+        gs = ChessEngine.GameState()
+        validMoves = gs.get_valid_moves()
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, validMoves, returnQueue, nodeLimit=2000)
+        progress, bestMove = returnQueue[:-1], returnQueue[-1].move
+        self.assertIn(bestMove, validMoves)
+        self.assertEqual([info["depth"] for info in progress], list(range(1, len(progress) + 1)))
+        self.assertEqual(progress[-1]["pv"][0], bestMove.getChessNotation())
+        self.assertLess(moveFinder.counter, 2000 + moveFinder.CHECK_INTERVAL + 1)
+        self.assertEqual(len(gs.moveLog), 0)
+
+    '''
+    The search ends with a SearchResult whose stats add up: node types to the node count, each node counted once,
+    iterations to the depths searched, first move cutoffs within the cutoffs. A profiled search dumps a profile pstats can read
+    '''
+    def testSearchStats(self):
+        moveFinder.USE_BOOK = False
+        gs = ChessEngine.GameState("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        moveFinder.transpositionTable.clear()
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue, maxDepth=3)
+        result = returnQueue[-1]
+        self.assertIsInstance(result, moveFinder.SearchResult)
+        stats = result.stats
+        self.assertEqual(stats.nodes, returnQueue[-2]["nodes"])
+        self.assertEqual(stats.interiorNodes + stats.leafNodes + stats.quiescenceNodes, stats.nodes)
+        self.assertTrue(stats.interiorNodes > 0 and stats.leafNodes > 0 and stats.quiescenceNodes > 0)
+        self.assertEqual(len(stats.depthNodes), 3)
+        self.assertEqual(sum(stats.depthNodes), stats.nodes)
+        self.assertEqual(len(stats.branchingFactors()), 2)
+        self.assertTrue(0 < stats.firstMoveCutoffs <= stats.betaCutoffs)
+        self.assertTrue(0 < stats.moveGenTime + stats.evalTime < stats.time)
+        self.assertGreater(stats.nps(), 0)
+        self.assertEqual(stats.asDict()["nodes"], stats.nodes)
+        # A horizon node is one leaf, not a leaf and a quiescence node as well
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(ChessEngine.GameState(), ChessEngine.GameState().get_valid_moves(), returnQueue, maxDepth=1)
+        stats = returnQueue[-1].stats
+        self.assertEqual((stats.interiorNodes, stats.quiescenceNodes), (1, 0))
+        self.assertGreaterEqual(stats.leafNodes, 20)
+        # No captures one move deep, and a PVS re-search can visit a reply twice
+
+        path = os.path.join(tempfile.mkdtemp(), "search.prof")
+        moveFinder.PROFILE_PATH = path
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue, maxDepth=1)
+        self.assertIsNone(moveFinder.PROFILE_PATH)
+        self.assertIsInstance(returnQueue[-1], moveFinder.SearchResult)
+        functions = [function for file, line, function in pstats.Stats(path).stats]
+        self.assertIn("findMoveNegaMaxAlphaBeta", functions)
+
+    '''
+    Setting the stop event ends a search from another thread within a few hundred nodes, and it still answers
+    with a legal move from the iterations it got through
+    '''
+    def testStopEvent(self):
+        moveFinder.USE_BOOK = False
+        gs = ChessEngine.GameState("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        stopEvent = multiprocessing.Event()
+        returnQueue = searchBench.ListQueue()
+        searchThread = threading.Thread(target=moveFinder.findBestMove,
+            args=(gs, gs.get_valid_moves(), returnQueue), kwargs={"maxDepth": moveFinder.MAX_DEPTH, "stopEvent": stopEvent})
+        searchThread.start()
+        while not returnQueue:
+            time.sleep(0.01)
+        stopEvent.set()
+        searchThread.join(5)
+        self.assertFalse(searchThread.is_alive())
+        result = returnQueue[-1]
+        self.assertTrue(result.stopped)
+        self.assertIn(result.move, gs.get_valid_moves())
+        self.assertGreater(result.stats.nodes, 0)
+
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue, maxDepth=2)
+        self.assertFalse(returnQueue[-1].stopped)
+
+    '''
+    The engine core imports without pygame or the optional subsystems, the opening book and tablebases load once
+    a search uses them, also a search started without findBestMove in a fresh interpreter. The import time itself
+    depends on the machine and its load, python importCheck.py checks it against the budget
+    '''
+    def testImportBudget(self):
+        for module, milliseconds, lazyImports in importCheck.checkImports():
+            self.assertEqual(lazyImports, [], module)
+        moveFinder.USE_BOOK = True
+        gs = ChessEngine.GameState()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), searchBench.ListQueue(), maxDepth=1)
+        self.assertIs(moveFinder.openingBook, openingBook)
+        self.assertIs(moveFinder.tablebase, tablebase)
+
+        code = ("import ChessEngine, moveFinder\n"
+            "gs = ChessEngine.GameState('8/8/8/4k3/8/8/3QK3/8 w - - 0 1')\n"
+            "moveFinder.findMoveNegaMaxAlphaBeta(gs, gs.get_valid_moves(), 2, -moveFinder.CHECKMATE, moveFinder.CHECKMATE, 1)\n"
+            "print(moveFinder.tablebase is not None)")
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "True")
+
+    '''
+    The root parallel search has to agree with the single process search on the score of every depth
+    '''
+    def testParallelSearch(self):
+        fen = "4k3/8/8/3q4/2P1r3/8/3Q4/3K4 w - - 0 1"
+        results = []
+        for workers in [0, 2]:
+            moveFinder.transpositionTable.clear()
+            gs = ChessEngine.GameState(fen)
+            returnQueue = searchBench.ListQueue()
+            if workers == 0:
+                moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue, maxDepth=2)
+            else:
+                moveFinder.findBestMoveParallel(gs, gs.get_valid_moves(), returnQueue, maxDepth=2, workers=workers)
+            results.append(([round(info["score"], 6) for info in returnQueue[:-1]], returnQueue[-1].move.getChessNotation()))
+        self.assertEqual(results[0][0], results[1][0])
+        self.assertIn(results[1][1], ["c4d5", "d2d5"])
+
+    '''
+    Captures are ordered most valuable victim / least valuable attacker first, ahead of the quiet moves
+    '''
+    def testMoveOrdering(self):
+        gs = ChessEngine.GameState("4k3/8/8/3q4/2P1r3/8/3Q4/3K4 w - - 0 1")
+        moves = gs.get_valid_moves()
+        moveFinder.resetMoveOrdering()
+        moveFinder.orderMoves(moves, 0, None)
+        self.assertEqual([move.getChessNotation() for move in moves[:2]], ["c4d5", "d2d5"])
+        self.assertFalse(any(move.isCapture for move in moves[2:]))
+
+    '''
+    The quiescence search sees the recapture, so even a depth 1 search won't trade the queen for a defended pawn
+    '''
+    def testQuiescenceSeesRecapture(self):
+        gs = ChessEngine.GameState("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1")
+        moveFinder.transpositionTable.clear()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), searchBench.ListQueue(), maxDepth=1)
+        self.assertNotEqual(moveFinder.nextMove.getChessNotation(), "d1d5")
+
+    '''
+    The captures only generator returns exactly the legal captures and promotions
+    '''
+    def testCaptureMoves(self):
+        for backend in (ChessEngine.GameState, bitboardEngine.BitboardGameState):
+            gs = backend("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+            captures = sorted(move.getChessNotation() for move in gs.get_capture_moves())
+            expected = sorted(move.getChessNotation() for move in gs.get_valid_moves() if move.isCapture or move.isPawnPromotion)
+            self.assertEqual(captures, expected)
+
+    '''
+    The staged picker yields every legal move exactly once in orderMoves order, a stale table move is skipped,
+    and the search scores agree with and without it, mates and stalemates included
+    '''
+    def testStagedMovePicker(self):
+        fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", "4k3/8/8/3q4/2P1r3/8/3Q4/3K4 w - - 0 1",
+            "4k3/8/8/8/1b6/8/8/1N2K3 w - - 0 1"]
+        for backend in (ChessEngine.GameState, bitboardEngine.BitboardGameState):
+            for fen in fens:
+                gs = backend(fen)
+                moves = gs.get_valid_moves()
+                for firstMoveId in (None, moves[-1].moveId, 0):
+                    moveFinder.resetMoveOrdering()
+                    ordered = moves[:]
+                    moveFinder.orderMoves(ordered, 0, firstMoveId)
+                    picked = [move.getChessNotation() for move in moveFinder.pickMoves(gs, 0, firstMoveId)]
+                    self.assertEqual(picked, [move.getChessNotation() for move in ordered])
+
+        moveFinder.USE_TABLEBASES = moveFinder.USE_PVS = moveFinder.USE_NULL_MOVE = moveFinder.USE_LMR = False
+        for fen in fens[1:] + ["k7/2Q5/8/8/8/8/8/7K w - - 0 1", "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"]:
+            scores = []
+            for staged in (True, False):
+                moveFinder.USE_STAGED_MOVES = staged
+                moveFinder.transpositionTable.clear()
+                moveFinder.resetMoveOrdering()
+                gs = ChessEngine.GameState(fen)
+                scores.append(moveFinder.findMoveNegaMaxAlphaBeta(gs, gs.get_valid_moves(), 3, -moveFinder.CHECKMATE, moveFinder.CHECKMATE, 1))
+            self.assertEqual(scores[0], scores[1])
+        self.assertEqual(scores[0], moveFinder.CHECKMATE)
+
+    '''
+    A null move only passes the turn and undoes exactly, and the selective search (PVS, null move pruning, late move
+    reductions) searches fewer nodes than plain alpha-beta and still finds a mate and a winning capture
+    '''
+    def testSelectiveSearch(self):
+        for backend in (ChessEngine.GameState, bitboardEngine.BitboardGameState):
+            gs = backend("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 5 40")
+            state = (gs.zobristKey, gs.enpassantPossible, gs.halfmoveClock, gs.whiteToMove)
+            gs.make_null_move()
+            self.assertEqual((gs.zobristKey, gs.enpassantPossible, gs.whiteToMove), (gs.computeZobristKey(), (), True))
+            self.assertEqual(gs.repetitionCount(), 0)
+            gs.undo_null_move()
+            self.assertEqual((gs.zobristKey, gs.enpassantPossible, gs.halfmoveClock, gs.whiteToMove), state)
+
+        moveFinder.USE_TABLEBASES = False
+        for fen, best in [("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", "a1a8"), ("4k3/8/4p3/3q4/8/8/3R4/3QK3 w - - 0 1", "d2d5")]:
+            nodes = []
+            for selective in (False, True):
+                moveFinder.USE_PVS = moveFinder.USE_NULL_MOVE = moveFinder.USE_LMR = selective
+                gs = ChessEngine.GameState(fen)
+                moveFinder.transpositionTable.clear()
+                random.seed(1)
+                # The root moves are shuffled
+                moveFinder.findBestMove(gs, gs.get_valid_moves(), searchBench.ListQueue(), maxDepth=4)
+                self.assertEqual(moveFinder.nextMove.getChessNotation(), best)
+                nodes.append(moveFinder.counter)
+        self.assertLess(nodes[1], nodes[0])
+        # Only the second position, the mate is found at depth 1 after a handful of nodes either way
+
+    '''
+    The UCI front end plays moves from a position command, reports info lines and a legal bestmove,
+    and answers stop on an infinite search with a move straight away
+    '''
+    def testUciEngine(self):
+        lines = []
+        engine = uciEngine.UciEngine(lines.append)
+        for command in ["uci", "isready", "position startpos moves e2e4 e7e5 g1f3", "go depth 2"]:
+            self.assertTrue(engine.handle(command))
+        engine.finish()
+        self.assertEqual(lines[:5], ["id name " + uciEngine.ENGINE_NAME, "id author " + uciEngine.ENGINE_AUTHOR,
+            "option name Ponder type check default true", "uciok", "readyok"])
+        self.assertTrue(lines[-2].startswith("info depth 2 score cp "))
+        self.assertFalse(engine.gs.whiteToMove)
+        bestMove = lines[-1].split()[1]
+        self.assertIn(bestMove, [move.getUciNotation() for move in engine.gs.get_valid_moves()])
+
+        engine.handle("position fen 4k3/1P6/8/8/8/8/8/4K3 w - - 0 1")
+        engine.handle("go infinite")
+        engine.handle("isready")
+        self.assertEqual(lines[-1], "readyok")
+        engine.handle("stop")
+        self.assertTrue(lines[-1].startswith("bestmove "))
+
+        engine.handle("position startpos moves e2e4")
+        engine.handle("go depth 2")
+        engine.finish()
+        bestMove, ponder, ponderMove = lines[-1].split()[1:]
+        self.assertEqual(ponder, "ponder")
+        engine.handle("position startpos moves e2e4 " + bestMove + " " + ponderMove)
+        engine.handle("go ponder wtime 3000 btime 3000")
+        engine.handle("isready")
+        self.assertEqual(lines[-1], "readyok")
+        engine.handle("ponderhit")
+        engine.finish()
+        self.assertTrue(lines[-1].startswith("bestmove "))
+        engine.handle("go ponder depth 1")
+        engine.handle("stop")
+        self.assertTrue(lines[-1].startswith("bestmove "))
+        self.assertFalse(engine.handle("quit"))
+        self.assertEqual(uciEngine.uciToMove(ChessEngine.GameState("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1"), "b7b8n").getUciNotation(), "b7b8q")
+        self.assertLess(uciEngine.allocateTime(60, 1), 60 / uciEngine.MOVES_TO_GO + 1)
+
+    '''
+    The engine worker follows the game by move deltas and takebacks, answers every go with a legal move for the position
+    the front end has, stops an unlimited search on request and ignores the result of a cancelled one
+    '''
+    def testEngineWorker(self):
+        engine = engineWorker.EngineWorker()
+        try:
+            engine.configure(USE_BOOK=False)
+            gs = ChessEngine.GameState()
+            for notation in ["e2e4", "e7e5", "g1f3"]:
+                gs.make_move(uciEngine.uciToMove(gs, notation))
+                engine.setGameState(gs)
+                engine.go(maxDepth=2)
+                result = engine.waitResult(30)
+                self.assertIn(result.move, gs.get_valid_moves())
+                self.assertGreater(result.stats.nodes, 0)
+            gs.undo_move()
+            gs.undo_move()
+            engine.setGameState(gs)
+            self.assertEqual(engine.moves, ["e2e4"])
+            engine.go(maxDepth=1)
+            self.assertIn(engine.waitResult(30).move, gs.get_valid_moves())
+
+            engine.go(maxDepth=moveFinder.MAX_DEPTH)
+            self.assertEqual(engine.poll(0.5)[0]["depth"], 1)
+            engine.stop()
+            result = engine.waitResult(30)
+            self.assertTrue(result.stopped)
+            self.assertIn(result.move, gs.get_valid_moves())
+            engine.go(maxDepth=moveFinder.MAX_DEPTH)
+            engine.cancel()
+            self.assertIsNone(engine.waitResult(30))
+
+            engine.go(maxDepth=2)
+            gs.make_move(engine.waitResult(30).move)
+            moves = [move.getUciNotation() for move in gs.moveLog]
+            self.assertTrue(engine.ponder(None, moves))
+            reply = engine.moves[-1]
+            self.assertEqual(engine.moves, moves + [reply])
+            gs.make_move(uciEngine.uciToMove(gs, reply))
+            engine.setGameState(gs)
+            # Ponder hit, the ponder search carries on as the real one
+            self.assertTrue(engine.pondering)
+            engine.go(maxDepth=2)
+            self.assertFalse(engine.pondering)
+            self.assertIn(engine.waitResult(30).move, gs.get_valid_moves())
+            gs.undo_move()
+            self.assertTrue(engine.ponder(None, moves, reply))
+            other = next(move for move in gs.get_valid_moves() if move.getUciNotation() != reply)
+            gs.make_move(other)
+            engine.setGameState(gs)
+            # Ponder miss, the worker takes back the reply and plays the other move
+            self.assertFalse(engine.pondering)
+            engine.go(maxDepth=1)
+            self.assertIn(engine.waitResult(30).move, gs.get_valid_moves())
+
+            engine.newGame()
+            engine.setPosition("4k3/8/8/8/8/8/8/R3K3 w - - 0 1", ["a1a2"])
+            engine.go(maxDepth=1)
+            self.assertEqual(engine.waitResult(30).move.pieceMoved[0], "b")
+        finally:
+            engine.close()
+        self.assertFalse(engine.process.is_alive())
+
+    '''
+    A self play game between two configurations ends with a result, and the configurations don't leak into the defaults
+    '''
+    def testMatchRunner(self):
+        config = matchRunner.parseConfig("DEPTH=1, USE_QUIESCENCE=False")
+        self.assertEqual(config, {"DEPTH": 1, "USE_QUIESCENCE": False})
+        self.assertRaises(ValueError, matchRunner.parseConfig, "SEARCH_HARDER=True")
+        depth = moveFinder.DEPTH
+        table = moveFinder.transpositionTable
+        table.clear()
+        game = matchRunner.playGame((0, "e2e4 e7e5", (config, {"DEPTH": 1}), 0))
+        matchRunner.applyConfig({})
+        # Each side searched with its own tables, the process's own table is back and untouched
+        self.assertIs(moveFinder.transpositionTable, table)
+        self.assertEqual(table.entries.count(None), len(table.entries))
+        self.assertEqual((moveFinder.DEPTH, moveFinder.USE_QUIESCENCE), (depth, True))
+        self.assertIn(game["result"], (0.0, 0.5, 1.0))
+        self.assertEqual(game["stats"][0]["moves"] + game["stats"][1]["moves"], game["plies"])
+
+        self.assertEqual(matchRunner.eloEstimate([0.5, 0.5])[0], 0)
+        self.assertAlmostEqual(matchRunner.eloEstimate([1, 0.5, 0.5, 0.5])[0], -matchRunner.eloEstimate([0, 0.5, 0.5, 0.5])[0])
+        self.assertGreater(matchRunner.eloEstimate([1, 1, 0.5, 0])[0], 0)
+
+    '''
+    A book built from PGN games weights the winner's moves, is found by binary search and is played by findBestMove
+    '''
+    def testOpeningBook(self):
+        directory = tempfile.mkdtemp()
+        pgnPath = os.path.join(directory, "games.pgn")
+        bookPath = os.path.join(directory, "book.bin")
+        with open(pgnPath, "w") as file:
+            file.write('[Result "1-0"]\n\n1. e4 {main line} e5 2. Nf3 (2. f4 exf4) Nc6 $1 1-0\n\n1.d4 d5 2.c4 1/2-1/2\n1. e4 c5 0-1\n')
+        games = buildBook.readPgnGames(pgnPath)
+        self.assertEqual(games[0], (["e4", "e5", "Nf3", "Nc6"], 1.0))
+        weights = {}
+        for moves, result in games:
+            buildBook.addGame(weights, moves, result, 16, ChessEngine.sanToMove)
+        self.assertEqual(openingBook.writeBook(weights, bookPath), 6)
+
+        gs = ChessEngine.GameState()
+        book = openingBook.OpeningBook(bookPath)
+        self.assertEqual([(moveId & 63, moveId >> 6) for moveId, weight in book.lookup(gs.zobristKey)], [(52, 36), (51, 35)])
+        self.assertEqual([weight for moveId, weight in book.lookup(gs.zobristKey)], [2, 1])
+        self.assertEqual(book.lookup(gs.zobristKey ^ 1), [])
+        book.close()
+
+        moveFinder.USE_BOOK = True
+        moveFinder.BOOK_PATH = bookPath
+        gs.make_move(uciEngine.uciToMove(gs, "e2e4"))
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue)
+        self.assertEqual([result.move.getChessNotation() for result in returnQueue], ["c7c5"])
+        openingBook.openBooks.pop(bookPath).close()
+
+    '''
+    A generated KQK table agrees with the engine's own move generation (a win has a move to a loss one ply shorter,
+    a loss only has moves to wins and the longest is one ply shorter), and the search uses it at the root and inside
+    '''
+    def testTablebase(self):
+        tablebase.TABLEBASE_DIR, tablebase.maxTableMaterial = tempfile.mkdtemp(), None
+        tablebase.generateTable("KQK")
+        rng = random.Random(5)
+        checked = 0
+        while checked < 200:
+            squares = rng.sample(range(64), 3)
+            gs = ChessEngine.GameState()
+            gs.board = [["--"] * 8 for row in range(8)]
+            for piece, sq in zip(("wK", "bK", "wQ"), squares):
+                gs.board[sq // 8][sq % 8] = piece
+            gs.whiteToMove, gs.castleRights = rng.random() < 0.5, 0
+            gs = ChessEngine.GameState(ChessEngine.toFen(gs))
+            kingSq = squares[1] if gs.whiteToMove else squares[0]
+            if gs.isSquareAttacked(kingSq // 8, kingSq % 8, "w" if gs.whiteToMove else "b"):
+                # The side not to move is in check
+                continue
+            checked += 1
+            value = tablebase.probe(gs)
+            children = []
+            for move in gs.get_valid_moves():
+                gs.make_move(move)
+                children.append(tablebase.probe(gs))
+                gs.undo_move()
+            if tablebase.isWin(value):
+                self.assertEqual(min(tablebase.distanceToMate(child) for child in children if tablebase.isLoss(child)), value - 1)
+            elif tablebase.isLoss(value):
+                self.assertTrue(all(tablebase.isWin(child) for child in children))
+                self.assertEqual(max(children, default=0), tablebase.distanceToMate(value) - 1 if children else 0)
+            else:
+                self.assertFalse(any(tablebase.isLoss(child) for child in children))
+
+        gs = ChessEngine.GameState("k7/8/1K6/8/8/8/7Q/8 w - - 0 1")
+        self.assertEqual(tablebase.probe(gs), 1)
+        returnQueue = searchBench.ListQueue()
+        moveFinder.findBestMove(gs, gs.get_valid_moves(), returnQueue)
+        self.assertEqual([result.move.getChessNotation() for result in returnQueue], ["h2h8"])
+        self.assertEqual(moveFinder.counter, 0)
+        gs.make_move(returnQueue[0].move)
+        self.assertEqual(tablebase.probe(gs), tablebase.LOSS)
+        gs = ChessEngine.GameState("8/8/8/3k4/8/8/3r4/3QK3 w - - 0 1")
+        score = moveFinder.findMoveNegaMaxAlphaBeta(gs, gs.get_valid_moves(), 2, -moveFinder.CHECKMATE, moveFinder.CHECKMATE, 1)
+        self.assertTrue(moveFinder.TABLEBASE_WIN - tablebase.UNKNOWN < score < moveFinder.TABLEBASE_WIN)
+        # Taking the rook leaves a won KQK
+        self.assertEqual(moveFinder.nextMove.getChessNotation()[2:], "d2")
+        tablebase.tables.clear()
+
+    '''
+    Threefold repetition and the fifty move rule are flagged by get_valid_moves on both backends, the search scores
+    a repeated position as a draw, and a stalemate inside the search is a draw instead of a loss
+    '''
+    def testDrawDetection(self):
+        for backend in (ChessEngine.GameState, bitboardEngine.BitboardGameState):
+            gs = backend()
+            for i, notation in enumerate(["g1f3", "g8f6", "f3g1", "f6g8"] * 2):
+                gs.make_move(next(move for move in gs.get_valid_moves() if move.getChessNotation() == notation))
+                self.assertEqual(gs.repetitionCount(), (i + 1) // 4)
+            gs.get_valid_moves()
+            self.assertTrue(gs.repetitionDraw)
+            gs.undo_move()
+            self.assertFalse(gs.repetitionDraw)
+            gs.get_valid_moves()
+            self.assertFalse(gs.repetitionDraw)
+
+            gs = backend("4k3/8/8/8/8/8/8/R3K3 w - - 99 80")
+            gs.get_valid_moves()
+            self.assertFalse(gs.fiftyMoveDraw)
+            gs.make_move(next(move for move in gs.get_valid_moves() if move.getChessNotation() == "a1a2"))
+            gs.get_valid_moves()
+            self.assertTrue(gs.fiftyMoveDraw)
+            mated = backend("4k3/R7/4K3/8/8/8/8/8 w - - 99 80")
+            mated.make_move(next(move for move in mated.get_valid_moves() if move.getChessNotation() == "a7a8"))
+            mated.get_valid_moves()
+            self.assertTrue(mated.checkMate)
+            self.assertFalse(mated.fiftyMoveDraw)
+
+        moveFinder.USE_TABLEBASES = False
+        gs = ChessEngine.GameState("k7/2Q5/8/8/8/8/8/7K w - - 0 1")
+        score = moveFinder.findMoveNegaMaxAlphaBeta(gs, gs.get_valid_moves(), 2, -moveFinder.CHECKMATE, moveFinder.CHECKMATE, 1)
+        self.assertLess(score, moveFinder.CHECKMATE)
+        gs.make_move(moveFinder.nextMove)
+        gs.get_valid_moves()
+        self.assertFalse(gs.staleMate)
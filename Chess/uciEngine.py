@@ -0,0 +1,258 @@
+'''
+UCI (Universal Chess Interface) front end, so the engine can be played by chess GUIs and tournament managers
+or driven from scripts without opening the pygame window. Commands come in on stdin, replies go out on stdout.
+The search runs on a background thread so stop, isready and quit are answered while it is thinking.
+go ponder searches the position with the expected reply (the ponder move of the last bestmove) already played,
+and on ponderhit that search goes on with the go's time limits instead of starting over
+
+Usage:
+    python uciEngine.py
+    printf "position startpos moves e2e4\\ngo depth 3\\n" | python uciEngine.py
+'''
+import multiprocessing
+import sys
+import threading
+import ChessEngine
+import moveFinder
+
+ENGINE_NAME = "Chess Engine"
+ENGINE_AUTHOR = "mmasenheimer"
+MOVES_TO_GO = 30
+# Moves the remaining clock time is spread over when the GUI doesn't send movestogo
+MOVE_OVERHEAD = 0.05
+# Seconds kept back per move for the GUI and process round trip
+MIN_MOVE_TIME = 0.01
+
+'''
+Seconds to search with timeLeft seconds on the clock, gaining increment seconds per move
+'''
+def allocateTime(timeLeft, increment=0.0, movesToGo=None):
+    budget = timeLeft / (movesToGo or MOVES_TO_GO) + increment * 0.75
+    return max(MIN_MOVE_TIME, min(budget, timeLeft / 2) - MOVE_OVERHEAD)
+
+'''
+Find the legal move for a UCI move string like e2e4 or e7e8q, the engine always promotes to a queen
+so the promotion letter is ignored. Raises ValueError if no legal move matches
+'''
+def uciToMove(gs, text, validMoves=None):
+    if validMoves is None:
+        validMoves = gs.get_valid_moves()
+    for move in validMoves:
+        if move.getChessNotation() == text[:4]:
+            return move
+    raise ValueError("Illegal move " + text)
+
+'''
+Stands in for the returnQueue of moveFinder.findBestMove, turning progress reports into UCI info lines
+and keeping the move of the SearchResult it puts last and the latest principal variation.
+started is set by the first report, by then findBestMove has set up its limits
+'''
+class SearchReporter():
+    def __init__(self, engine):
+        self.engine = engine
+        self.move = None
+        self.pv = []
+        self.started = threading.Event()
+
+    def put(self, item):
+        self.started.set()
+        if isinstance(item, moveFinder.SearchResult):
+            self.move = item.move
+            return
+        self.pv = item["pv"]
+        score = item["score"]
+        if abs(score) >= moveFinder.CHECKMATE:
+            mateIn = (len(item["pv"]) + 1) // 2
+            scoreText = "mate " + str(mateIn if score > 0 else -mateIn)
+        else:
+            scoreText = "cp " + str(int(round(score * 100)))
+        nps = int(item["nodes"] / item["time"]) if item["time"] > 0 else 0
+        self.engine.send("info depth " + str(item["depth"]) + " score " + scoreText + " nodes " + str(item["nodes"]) +
+            " nps " + str(nps) + " time " + str(int(item["time"] * 1000)) + " pv " + " ".join(item["pv"]))
+
+class UciEngine():
+    def __init__(self, output=None):
+        self.output = output
+        self.outputLock = threading.Lock()
+        self.gs = ChessEngine.GameState()
+        self.searchThread = None
+        self.reporter = None
+        self.stopRequested = multiprocessing.Event()
+        # Shared with the search (and its pool workers when moveFinder.WORKERS != 1), which stops once it is set
+        self.bestMoveAllowed = threading.Event()
+        # Cleared while the search may not send bestmove before stop (infinite) or ponderhit
+        self.ponderLimits = None
+        # (timeLimit, nodeLimit, maxDepth) the ponder search takes on at ponderhit
+        self.stopTimer = None
+
+    def send(self, line):
+        with self.outputLock:
+            if self.output is not None:
+                self.output(line)
+            else:
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+
+    '''
+    Handle one line of input, returns False once the GUI sends quit
+    '''
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send("option name Ponder type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            moveFinder.transpositionTable.clear()
+            self.gs = ChessEngine.GameState()
+        elif command == "position":
+            self.stop()
+            self.setPosition(arguments)
+        elif command == "go":
+            self.stop()
+            self.go(arguments)
+        elif command == "ponderhit":
+            self.ponderHit()
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        # Anything else (debug, setoption, register) is ignored as the protocol asks
+        return True
+
+    '''
+    position [startpos | fen <fen>] [moves <move> ...]
+    '''
+    def setPosition(self, arguments):
+        movesIndex = arguments.index("moves") if "moves" in arguments else len(arguments)
+        if arguments and arguments[0] == "fen":
+            gs = ChessEngine.GameState(" ".join(arguments[1:movesIndex]))
+        else:
+            gs = ChessEngine.GameState()
+        for text in arguments[movesIndex + 1:]:
+            try:
+                gs.make_move(uciToMove(gs, text))
+            except ValueError:
+                self.send("info string illegal move " + text + ", ignoring the rest of the line")
+                break
+        self.gs = gs
+
+    '''
+    go [ponder] [depth N] [movetime ms] [wtime ms] [btime ms] [winc ms] [binc ms] [movestogo N] [nodes N] [infinite]
+    '''
+    def go(self, arguments):
+        options = {}
+        infinite = False
+        ponder = False
+        for i, token in enumerate(arguments):
+            if token == "infinite":
+                infinite = True
+            elif token == "ponder":
+                ponder = True
+            elif token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes") and i + 1 < len(arguments):
+                options[token] = int(arguments[i + 1])
+
+        timeLimit = options["movetime"] / 1000 if "movetime" in options else None
+        clock = options.get("wtime" if self.gs.whiteToMove else "btime")
+        if timeLimit is None and clock is not None:
+            increment = options.get("winc" if self.gs.whiteToMove else "binc", 0)
+            timeLimit = allocateTime(clock / 1000, increment / 1000, options.get("movestogo"))
+        nodeLimit = options.get("nodes")
+        maxDepth = options.get("depth")
+        self.ponderLimits = None
+        if infinite:
+            timeLimit, nodeLimit, maxDepth = None, None, moveFinder.MAX_DEPTH
+        elif ponder:
+            self.ponderLimits = (timeLimit, nodeLimit, maxDepth)
+            timeLimit, nodeLimit, maxDepth = None, None, maxDepth or moveFinder.MAX_DEPTH
+
+        self.stopRequested.clear()
+        self.bestMoveAllowed.clear()
+        if not infinite and not ponder:
+            self.bestMoveAllowed.set()
+        # The protocol doesn't allow a bestmove before stop in infinite mode or before ponderhit, even after finding a mate
+        self.reporter = SearchReporter(self)
+        self.searchThread = threading.Thread(target=self.search, args=(self.reporter, timeLimit, nodeLimit, maxDepth), daemon=True)
+        self.searchThread.start()
+
+    '''
+    Runs on the search thread, always finishes with a bestmove line, with the reply the search expects as the ponder move
+    '''
+    def search(self, reporter, timeLimit, nodeLimit, maxDepth):
+        gs = self.gs
+        validMoves = gs.get_valid_moves()
+        if validMoves:
+            moveFinder.findBestMove(gs, validMoves, reporter, timeLimit, nodeLimit, maxDepth, self.stopRequested)
+        reporter.started.set()
+        self.bestMoveAllowed.wait()
+        move = reporter.move
+        if move is None and validMoves:
+            # Stopped before the first iteration finished
+            move = validMoves[0]
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(reporter.pv) > 1 and reporter.pv[0] == move.getUciNotation():
+            self.send("bestmove " + move.getUciNotation() + " ponder " + reporter.pv[1])
+        else:
+            self.send("bestmove " + move.getUciNotation())
+
+    '''
+    The opponent played the expected move, the ponder search becomes the real one with the limits of its go
+    '''
+    def ponderHit(self):
+        if self.ponderLimits is None:
+            return
+        timeLimit, nodeLimit, maxDepth = self.ponderLimits
+        self.ponderLimits = None
+        self.reporter.started.wait()
+        if moveFinder.WORKERS == 1:
+            moveFinder.limitSearch(timeLimit, nodeLimit, maxDepth)
+        elif timeLimit is not None:
+            # The root parallel search doesn't take new limits, the stop event ends it in time instead
+            self.stopTimer = threading.Timer(timeLimit, self.stopRequested.set)
+            self.stopTimer.daemon = True
+            self.stopTimer.start()
+        self.bestMoveAllowed.set()
+
+    '''
+    Stop a running search and wait for it to send its bestmove
+    '''
+    def stop(self):
+        if self.searchThread is None:
+            return
+        self.stopRequested.set()
+        self.bestMoveAllowed.set()
+        self.searchThread.join()
+        self.searchThread = None
+        self.ponderLimits = None
+        if self.stopTimer is not None:
+            self.stopTimer.cancel()
+            self.stopTimer = None
+
+    '''
+    Let a running search finish on its own, unless it is an infinite or ponder one that only ends with stop
+    '''
+    def finish(self):
+        if self.searchThread is not None and self.bestMoveAllowed.is_set():
+            self.searchThread.join()
+        self.stop()
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            return 0
+    # End of input, e.g. commands piped in from a script
+    engine.finish()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())